@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Scryfall bulk JSON parsing
+
+Compares the streaming parser in card_data._parse_bulk_json against the
+previous whole-file orjson.loads path. Each variant runs in its own
+subprocess so peak RSS is measured independently.
+
+Usage:
+    python benchmarks/bench_bulk_parse.py [bulk_json_path] [--cards N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run_whole_file(filepath: str, parsed_path: str) -> None:
+    """Previous implementation: decode the whole array, then filter."""
+    import orjson
+    from decklist_to_pdf import card_data
+
+    card_dict = {}
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = orjson.loads(f.read())
+        for card in data:
+            card_data._parse_card(card, card_dict)
+        with open(parsed_path, 'w', encoding='utf-8') as out:
+            out.write(orjson.dumps(card_dict).decode())
+
+
+def _run_streaming(filepath: str, parsed_path: str) -> None:
+    """Current implementation: stream cards into the binary index."""
+    from decklist_to_pdf import card_data
+
+    card_data._parse_bulk_json(filepath, parsed_path)
+
+
+VARIANTS = {
+    'whole-file': _run_whole_file,
+    'streaming': _run_streaming,
+}
+
+
+def _child(variant: str, filepath: str, parsed_path: str) -> None:
+    """Run one variant and print wall time and peak RSS."""
+    import contextlib
+    from time import perf_counter
+
+    from common import peak_rss_mb
+
+    start = perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        VARIANTS[variant](filepath, parsed_path)
+    elapsed = perf_counter() - start
+    print(f"{elapsed:.3f} {peak_rss_mb():.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('bulk_json', nargs='?', help='Scryfall bulk JSON file (synthetic if omitted)')
+    parser.add_argument('--cards', type=int, default=50000, help='synthetic card count')
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = args.bulk_json
+        if filepath is None:
+            from common import make_bulk_json
+            filepath = make_bulk_json(os.path.join(tmp, 'default-cards.json'), args.cards)
+
+        size_mb = os.path.getsize(filepath) / 1e6
+        print(f"Input: {filepath} ({size_mb:.1f} MB)")
+        print(f"{'variant':<12} {'wall (s)':>10} {'peak RSS (MB)':>14}")
+
+        for variant in VARIANTS:
+            parsed_path = os.path.join(tmp, f"parsed_{variant}")
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', variant, filepath, parsed_path],
+                capture_output=True, text=True, check=True
+            )
+            elapsed, peak_mb = result.stdout.split()
+            print(f"{variant:<12} {float(elapsed):>10.2f} {float(peak_mb):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cache formats for the DPI-sized processed images
+
+Writes the same processed cards in each cache format, then measures the
+warm-run cost of loading them back and pasting them onto a page (what
+rendering does with every card), plus the disk footprint. Raw files are
+memory-mapped, so their load is nearly free and the paste does the only
+pixel work.
+
+Usage:
+    python benchmarks/bench_cache_format.py [--cards N] [--dpi DPI]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+from dataclasses import replace
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from bench_gamma import _synthetic_card
+
+# label: (cache_format, cache_compress_level)
+FORMATS = {
+    'png (level 6)': ('png', 6),
+    'png (level 1)': ('png', 1),
+    'jpg': ('jpg', 6),
+    'webp (level 6)': ('webp', 6),
+    'webp (level 1)': ('webp', 1),
+    'raw': ('raw', 6),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=6, help='distinct card images')
+    parser.add_argument('--dpi', type=int, default=600, help='card resolution')
+    args = parser.parse_args()
+
+    from decklist_to_pdf import Config
+    from decklist_to_pdf.image_files import cache_extension, open_image, save_image
+    from decklist_to_pdf.image_store import DirectoryStore
+
+    rng = random.Random(0)
+    size = (int(63 * args.dpi / 25.4), int(88 * args.dpi / 25.4))
+    cards = [_synthetic_card(size, rng) for _ in range(args.cards)]
+    store = DirectoryStore()
+    page = Image.new('RGB', (size[0] * 3, size[1] * 3), (255, 255, 255))
+
+    print(f"{args.cards} cards at {size[0]}x{size[1]}")
+    print(f"{'format':<15} {'write ms':>9} {'load ms':>8} {'load+paste ms':>14} {'MB/card':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, (cache_format, level) in FORMATS.items():
+            config = replace(Config(), cache_format=cache_format, cache_compress_level=level)
+            extension = cache_extension(config, 'png')
+            paths = [os.path.join(tmp, f"{label.split()[0]}{level}_{i}{extension}") for i in range(len(cards))]
+
+            writes = []
+            for card, path in zip(cards, paths):
+                start = perf_counter()
+                save_image(card, path, config, store)
+                writes.append(perf_counter() - start)
+
+            # Files were just written, so they come from the page cache as
+            # they would on a warm run
+            loads, pastes = [], []
+            for path in paths:
+                start = perf_counter()
+                img = open_image(path, store)
+                loads.append(perf_counter() - start)
+                page.paste(img, (0, 0))
+                pastes.append(perf_counter() - start)
+                del img
+
+            size_mb = statistics.mean(os.path.getsize(path) for path in paths) / 1e6
+            print(f"{label:<15} {statistics.median(writes) * 1000:>9.1f} {statistics.median(loads) * 1000:>8.1f} "
+                  f"{statistics.median(pastes) * 1000:>14.1f} {size_mb:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: finding the processed images of a warm deck
+
+Times the per-card cache lookup on a fully processed cache, previously
+stat calls on file names built from the DPI and a _gc suffix, now one
+probe of the cache manifest and one stat of the file it names, checking
+its size. The manifest load, paid once per run, is reported separately.
+Files are empty; only their names are looked up.
+
+Usage:
+    python benchmarks/bench_cache_lookup.py [--cards N] [--repeat N]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _previous(processor, keys: list[str]) -> None:
+    # _needs_download, then _fetch_image on the cached files
+    for key in keys:
+        base = f"image_cache/{processor.config.dpi}/png/{key}"
+        gc_path = f"{base}_gc.png"
+        if not os.path.exists(gc_path):
+            os.path.exists(f"{base}.png")
+        os.path.exists(gc_path)
+        os.path.exists(f"image_cache/png/{key}.png")
+
+
+def _current(processor, keys: list[str]) -> None:
+    from decklist_to_pdf.models import ImageRequest
+
+    for key in keys:
+        processor._plan(ImageRequest(
+            key, f"https://cards.example/png/{key}.png", f"image_cache/png/{key}.png",
+            f"image_cache/{processor.config.dpi}/png/{key}", correct=True
+        ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=5000, help='cards in the cache')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs')
+    args = parser.parse_args()
+
+    from decklist_to_pdf import Config, ImageProcessor, generate_layout_constants
+    from decklist_to_pdf.image_manifest import DOWNLOAD, PROCESSED, RESIZED, ManifestEntry
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        config = Config(dpi=300, image_type='png')
+        constants = generate_layout_constants(config)
+
+        def processor() -> ImageProcessor:
+            return ImageProcessor(config, constants.card_width_px, constants.card_height_px, 'png')
+
+        warm = processor()
+        warm._ensure_directories()
+        keys = [f"c{i}" for i in range(args.cards)]
+        for key in keys:
+            source = f"https://cards.example/png/{key}.png"
+            base = f"image_cache/300/png/{key}"
+            paths = {
+                DOWNLOAD: f"image_cache/png/{key}.png",
+                RESIZED: f"{base}_{warm.resized_params}.png",
+                PROCESSED: f"{base}_{warm.corrected_params}.png",
+            }
+            for kind, path in paths.items():
+                open(path, 'wb').close()
+                warm.manifest.record(warm._entry_params(kind), source, ManifestEntry(path, 745, kind))
+            # Previous names
+            open(f"{base}.png", 'wb').close()
+            open(f"{base}_gc.png", 'wb').close()
+        warm.manifest.save()
+
+        loads, previous, current = [], [], []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            lookup = processor()
+            loads.append(perf_counter() - start)
+
+            start = perf_counter()
+            _previous(lookup, keys)
+            previous.append(perf_counter() - start)
+
+            start = perf_counter()
+            _current(lookup, keys)
+            current.append(perf_counter() - start)
+
+        previous_us = statistics.median(previous) / args.cards * 1e6
+        current_us = statistics.median(current) / args.cards * 1e6
+        print(f"{args.cards} cards")
+        print(f"previous stat lookup   {previous_us:>7.2f} us/card")
+        print(f"manifest lookup        {current_us:>7.2f} us/card ({previous_us / current_us:.1f}x)")
+        print(f"manifest load          {statistics.median(loads) * 1000:>7.1f} ms per run")
+
+
+if __name__ == '__main__':
+    main()
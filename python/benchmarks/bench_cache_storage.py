@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: directory versus pack storage of the image cache
+
+Stores the same cached files in each store, then times what a warm run
+does per card of a deck: check that the file exists and read it in full.
+The pack store answers both from its memory-mapped index and packs,
+without a stat or open per file. Also reports the files the cache occupies, which
+is its inode count.
+
+The files are filled with random bytes; only their count and size matter.
+Per-file costs grow on network and overlay filesystems, so run this on
+the filesystem that holds the real cache for representative numbers.
+
+Usage:
+    python benchmarks/bench_cache_storage.py [--files N] [--deck N] [--kb KB] [--dir DIR]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _read_all(store, names: list[str]) -> float:
+    start = perf_counter()
+    for name in names:
+        if not store.exists(name):
+            raise FileNotFoundError(name)
+        with store.open(name) as f:
+            f.read()
+    return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20000, help='cached files')
+    parser.add_argument('--deck', type=int, default=300, help='cards read per run')
+    parser.add_argument('--kb', type=int, default=16, help='size of each file in KB')
+    parser.add_argument('--repeat', type=int, default=3, help='timed passes')
+    parser.add_argument('--dir', default=None, help='where to build the caches (default: system temp)')
+    args = parser.parse_args()
+
+    from decklist_to_pdf.image_store import DirectoryStore, PackStore
+
+    rng = random.Random(0)
+    data = rng.randbytes(args.kb * 1024)
+    names = [f"image_cache/{300 + i % 3 * 300}/large/c{i}_0123456789.jpg" for i in range(args.files)]
+    decks = [rng.sample(names, min(args.deck, args.files)) for _ in range(args.repeat)]
+
+    print(f"{args.files} files of {args.kb} KB, {args.deck} random cards read per run")
+    print(f"{'store':<10} {'write s':>8} {'read us/file':>13} {'files on disk':>14}")
+    for label in ('directory', 'pack'):
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            os.chdir(tmp)
+            store = DirectoryStore() if label == 'directory' else PackStore()
+            start = perf_counter()
+            for name in names:
+                with store.create(name) as f:
+                    f.write(data)
+            store.save()
+            write_seconds = perf_counter() - start
+
+            reads = []
+            for deck in decks:
+                if label == 'pack':
+                    # Each run opens the index afresh
+                    store.close()
+                    store = PackStore()
+                reads.append(_read_all(store, deck) / len(deck))
+            if label == 'pack':
+                store.close()
+            files = sum(len(file_names) for _, _, file_names in os.walk('image_cache'))
+            print(f"{label:<10} {write_seconds:>8.2f} {statistics.median(reads) * 1e6:>13.1f} {files:>14}")
+            os.chdir('/')
+
+
+if __name__ == '__main__':
+    main()
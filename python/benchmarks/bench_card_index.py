@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: card data startup
+
+Compares loading the parsed JSON cache into a dict against opening the
+memory-mapped card index, each followed by a decklist-sized batch of
+lookups. Each variant runs in its own subprocess so cold-start time and
+peak RSS are measured independently.
+
+Usage:
+    python benchmarks/bench_card_index.py [bulk_json_path] [--cards N] [--lookups N]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run_parsed_json(path: str, keys: list[str]) -> None:
+    """Previous startup: decode the whole parsed JSON cache."""
+    from decklist_to_pdf.card_data import _load_parsed_json
+
+    card_data = _load_parsed_json(path)
+    for key in keys:
+        card_data[key]
+
+
+def _run_card_index(path: str, keys: list[str]) -> None:
+    """Current startup: mmap the index and decode only looked-up records."""
+    from decklist_to_pdf.card_index import CardIndex
+
+    card_data = CardIndex(path)
+    for key in keys:
+        card_data[key]
+
+
+VARIANTS = {
+    'parsed-json': _run_parsed_json,
+    'card-index': _run_card_index,
+}
+
+
+def _child(variant: str, path: str, keys_path: str) -> None:
+    """Run one variant and print wall time and peak RSS."""
+    import contextlib
+    import importlib
+    from time import perf_counter
+
+    from common import peak_rss_mb
+
+    # Import cost is the same for both variants, keep it out of the timing
+    importlib.import_module('decklist_to_pdf.card_data')
+
+    with open(keys_path, encoding='utf-8') as f:
+        keys = f.read().split()
+
+    start = perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        VARIANTS[variant](path, keys)
+    elapsed = perf_counter() - start
+    print(f"{elapsed:.4f} {peak_rss_mb():.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('bulk_json', nargs='?', help='Scryfall bulk JSON file (synthetic if omitted)')
+    parser.add_argument('--cards', type=int, default=50000, help='synthetic card count')
+    parser.add_argument('--lookups', type=int, default=100, help='keys looked up per run')
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    import orjson
+    from decklist_to_pdf import card_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = args.bulk_json
+        if filepath is None:
+            from common import make_bulk_json
+            filepath = make_bulk_json(os.path.join(tmp, 'default-cards.json'), args.cards)
+
+        index_path = os.path.join(tmp, 'parsed.idx')
+        json_path = os.path.join(tmp, 'parsed.json')
+        index = card_data._parse_bulk_json(filepath, index_path)
+        with open(json_path, 'wb') as f:
+            f.write(orjson.dumps({key: index[key] for key in index}))
+
+        keys_path = os.path.join(tmp, 'keys.txt')
+        with open(keys_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(random.Random(0).sample(list(index), args.lookups)))
+        index.close()
+
+        paths = {'parsed-json': json_path, 'card-index': index_path}
+        print(f"{'variant':<12} {'size (MB)':>10} {'startup (ms)':>13} {'peak RSS (MB)':>14}")
+        for variant, path in paths.items():
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', variant, path, keys_path],
+                capture_output=True, text=True, check=True
+            )
+            elapsed, peak_mb = result.stdout.split()
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{variant:<12} {size_mb:>10.1f} {float(elapsed) * 1000:>13.1f} {float(peak_mb):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: card record encoding
+
+Compares the previous card index records, plain JSON objects with every
+double-faced card face stored a second time under its own _A/_B key,
+against the compact array records with faces stored once. Reports the
+index size, the time to decode every record, and the memory held by a
+dictionary of all decoded records.
+
+Usage:
+    python benchmarks/bench_card_records.py [bulk_json_path] [--cards N]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _previous_records(filepath: str):
+    """Previous implementation: one JSON object per key, faces duplicated."""
+    import orjson
+    from decklist_to_pdf import card_data
+
+    for card in card_data._iter_bulk_cards(filepath):
+        parsed = {}
+        for key in card_data._parse_card(card, parsed):
+            record = parsed[key]
+            for side, face in zip('AB', record.get('faces', ())):
+                yield f"{key}_{side}", orjson.dumps(face)
+            yield key, orjson.dumps(record)
+
+
+def _current_records(filepath: str):
+    """Current implementation: compact array records."""
+    from decklist_to_pdf import card_data
+
+    for card in card_data._iter_bulk_cards(filepath):
+        parsed = {}
+        for key in card_data._parse_card(card, parsed):
+            yield key, card_data._encode_card_record(parsed[key])
+
+
+def _measure(index_path: str, decode) -> tuple[float, float]:
+    """Decode every record into a dict, returning (seconds, MB held)."""
+    from decklist_to_pdf.card_index import CardIndex
+
+    with CardIndex(index_path, decode) as index:
+        start = perf_counter()
+        decoded = dict(index.items())
+        elapsed = perf_counter() - start
+        del decoded
+
+        # Traced separately, tracemalloc slows allocation down several times
+        gc.collect()
+        tracemalloc.start()
+        decoded = dict(index.items())
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del decoded
+    return elapsed, held / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('bulk_json', nargs='?', help='Scryfall bulk JSON file (synthetic if omitted)')
+    parser.add_argument('--cards', type=int, default=50000, help='synthetic card count')
+    args = parser.parse_args()
+
+    from decklist_to_pdf import card_data
+    from decklist_to_pdf.card_index import decode_json_record, write_card_index
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = args.bulk_json
+        if filepath is None:
+            from common import make_bulk_json
+            filepath = make_bulk_json(os.path.join(tmp, 'default-cards.json'), args.cards)
+
+        variants = {
+            'previous': (_previous_records, decode_json_record),
+            'compact': (_current_records, card_data._decode_card_record),
+        }
+
+        print(f"{'variant':<10} {'records':>8} {'index (MB)':>11} {'decode all (s)':>15} {'decoded (MB)':>13}")
+        for variant, (records, decode) in variants.items():
+            index_path = os.path.join(tmp, f"parsed_{variant}.idx")
+            count = write_card_index(index_path, records(filepath))
+            elapsed, held_mb = _measure(index_path, decode)
+            size_mb = os.path.getsize(index_path) / 1e6
+            print(f"{variant:<10} {count:>8} {size_mb:>11.1f} {elapsed:>15.3f} {held_mb:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
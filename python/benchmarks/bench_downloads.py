@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: image download engine
+
+Downloads the same set of images from a local stand-in image server with
+the previous approach (bare requests.get on the image worker pool, rate
+limited by sleeping on the submitting thread) and with the Downloader
+engine (pooled session, shared token bucket, adaptive backoff).
+
+The server adds per-request and per-connection latency to mimic a remote
+CDN with TLS handshakes. In the "limited" scenario it also answers 429
+above the limit, to show how each client behaves against Scryfall's
+published rate.
+
+Usage:
+    python benchmarks/bench_downloads.py [--images N] [--rate R]
+"""
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from PIL import Image
+
+from common import ImageServer
+
+
+def _run_previous(urls: list[str], rate: float, threads: int) -> int:
+    """Previous implementation: requests.get per image, sleep between submissions."""
+    def fetch(url: str) -> bytes:
+        retries = 3
+        while True:
+            try:
+                response = requests.get(url, headers={'User-Agent': 'bench'})
+                response.raise_for_status()
+                return response.content
+            except Exception:
+                retries -= 1
+                if retries == 0:
+                    raise
+                sleep(1)
+
+    failures = 0
+    with ThreadPoolExecutor(4) as executor:
+        futures = []
+        for url in urls:
+            if rate > 0:
+                sleep(1 / rate)
+            futures.append(executor.submit(fetch, url))
+        for future in as_completed(futures):
+            if future.exception():
+                failures += 1
+    return failures
+
+
+def _run_engine(urls: list[str], rate: float, threads: int) -> int:
+    """Current implementation: Downloader with its own threads and limiter."""
+    from decklist_to_pdf.downloader import Downloader
+
+    failures = 0
+    with Downloader({'User-Agent': 'bench'}, threads, rate) as downloader:
+        for future in as_completed([downloader.submit(url) for url in urls]):
+            if future.exception():
+                failures += 1
+    return failures
+
+
+VARIANTS = {
+    'previous': _run_previous,
+    'engine': _run_engine,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=100, help='images per run')
+    parser.add_argument('--rate', type=float, default=10.0, help='request rate limit per second')
+    parser.add_argument('--threads', type=int, default=8, help='download engine threads')
+    parser.add_argument('--latency', type=float, default=0.05, help='server seconds per request')
+    parser.add_argument('--connect-latency', type=float, default=0.1, help='server seconds per new connection')
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    Image.effect_noise((488, 680), 64).convert('RGB').save(buffer, 'JPEG', quality=90)
+    body = buffer.getvalue()
+
+    scenarios = {
+        # Client and server agree on the rate; the server enforces it
+        'limited': (args.rate, args.rate),
+        # No limit anywhere, raw throughput
+        'unlimited': (0.0, 0.0),
+    }
+
+    print(f"{len(body) // 1024} KB images, {args.latency * 1000:.0f} ms per request, "
+          f"{args.connect_latency * 1000:.0f} ms per new connection")
+    print(f"{'scenario':<10} {'variant':<9} {'wall (s)':>9} {'img/s':>7} {'conns':>6} {'peak/s':>7} {'429s':>5} {'failed':>7}")
+    for scenario, (client_rate, server_limit) in scenarios.items():
+        for variant, run in VARIANTS.items():
+            server = ImageServer(body, args.latency, args.connect_latency, server_limit)
+            urls = [f"{server.url}/normal/front/{i}.jpg" for i in range(args.images)]
+            start = perf_counter()
+            failures = run(urls, client_rate, args.threads)
+            elapsed = perf_counter() - start
+            print(
+                f"{scenario:<10} {variant:<9} {elapsed:>9.2f} {args.images / elapsed:>7.1f} "
+                f"{server.connections:>6} {server.peak_rate():>7} {server.throttled:>5} {failures:>7}"
+            )
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: gamma correction of black-bordered cards
+
+Corrects the same cards with the previous implementation (ImageEnhance
+.Contrast over the full image, re-sampling one border pixel until it is
+dark enough) and with the precomputed transfer curve applied in one
+Image.point pass. Reports the time per card and how far the outputs
+differ, both with the previous single-pixel border sample (the curve
+itself) and with the median border strip the correction now uses.
+
+Cards are synthetic 600 DPI images shaped like a scan of a black-bordered
+card: a slightly grey, noisy border with a light text box and noisy art
+inside. Pass a directory of DPI-sized card images to use real ones.
+
+Usage:
+    python benchmarks/bench_gamma.py [image_dir] [--cards N] [--dpi DPI]
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageChops, ImageDraw, ImageEnhance
+
+from decklist_to_pdf.models import BORDER_SAMPLE_OFFSET, GAMMA_THRESHOLD
+
+
+def _previous(img: Image.Image) -> Image.Image:
+    """Previous implementation: iterate Contrast until one pixel is dark."""
+    width, height = img.size
+    sample_y = int(height - height * BORDER_SAMPLE_OFFSET)
+    border_gamma = sum(img.getpixel((width // 2, sample_y))[:3]) / 3
+    while border_gamma > GAMMA_THRESHOLD:
+        img = ImageEnhance.Contrast(img).enhance(1 + border_gamma / 256)
+        border_gamma = sum(img.getpixel((width // 2, sample_y))[:3]) / 3
+    return img
+
+
+def _current(img: Image.Image, border: list = None) -> Image.Image:
+    """Current implementation: one transfer curve from the histogram."""
+    from decklist_to_pdf import image_processor
+
+    if border is None:
+        border = image_processor._sample_border(img)
+    curve = image_processor._contrast_curve(img.histogram(), img.mode, border)
+    return img.point(curve * 3)
+
+
+def _difference(expected: Image.Image, actual: Image.Image) -> tuple[int, float]:
+    """Largest channel difference and the share of pixels that differ."""
+    histogram = ImageChops.difference(expected, actual).convert('L').histogram()
+    largest = max(value for value, count in enumerate(histogram) if count)
+    return largest, 1 - histogram[0] / sum(histogram)
+
+
+def _synthetic_card(size: tuple[int, int], rng: random.Random) -> Image.Image:
+    """A black-bordered card scan: grey border, light frame, noisy art."""
+    width, height = size
+    border = rng.randint(12, 60)
+    card = Image.new('RGB', size, (border, border, border + 2))
+    noise = Image.effect_noise(size, 6).convert('RGB')
+    card = ImageChops.add(card, noise, offset=-128)
+
+    draw = ImageDraw.Draw(card)
+    margin = width // 20
+    draw.rectangle((margin, margin, width - margin, height - margin * 2), fill=(200, 190, 170))
+    art = Image.effect_noise((width - margin * 4, height // 2), rng.randint(30, 90)).convert('RGB')
+    card.paste(art, (margin * 2, margin * 3))
+    return card
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image_dir', nargs='?', help='directory of card images (synthetic if omitted)')
+    parser.add_argument('--cards', type=int, default=12, help='synthetic card count')
+    parser.add_argument('--dpi', type=int, default=600, help='synthetic card resolution')
+    args = parser.parse_args()
+
+    if args.image_dir:
+        paths = sorted(glob.glob(os.path.join(args.image_dir, '*.*')))
+        cards = [Image.open(path).convert('RGB') for path in paths if not path.endswith(('_gc.png', '_gc.jpg'))]
+    else:
+        rng = random.Random(0)
+        size = (int(63 * args.dpi / 25.4), int(88 * args.dpi / 25.4))
+        cards = [_synthetic_card(size, rng) for _ in range(args.cards)]
+
+    times = {'previous': [], 'curve': []}
+    same_sample = []
+    median_sample = []
+    for card in cards:
+        start = perf_counter()
+        expected = _previous(card)
+        times['previous'].append(perf_counter() - start)
+
+        start = perf_counter()
+        actual = _current(card)
+        times['curve'].append(perf_counter() - start)
+
+        pixel = card.getpixel((card.width // 2, int(card.height - card.height * BORDER_SAMPLE_OFFSET)))
+        same_sample.append(_difference(expected, _current(card, list(pixel))))
+        median_sample.append(_difference(expected, actual))
+
+    print(f"{len(cards)} cards at {cards[0].width}x{cards[0].height}")
+    print(f"{'variant':<10} {'ms/card (median)':>17}")
+    for variant, samples in times.items():
+        print(f"{variant:<10} {statistics.median(samples) * 1000:>17.1f}")
+    speedup = statistics.median(times['previous']) / statistics.median(times['curve'])
+    print(f"speedup {speedup:.1f}x")
+    for label, diffs in (('same border pixel', same_sample), ('median border strip', median_sample)):
+        print(f"vs previous, {label}: max channel difference {max(d for d, _ in diffs)}, "
+              f"pixels differing {max(p for _, p in diffs) * 100:.2f}% (worst card)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory held by card images while rendering
+
+Renders decks of increasing size from an already warm DPI cache, once with
+the previous image cache (a dict holding every card decoded up front) and
+once with ImageCache (paths, decoded on demand within a byte budget and
+dropped after each card's last page). Each run happens in a fresh
+interpreter so peak RSS is per run.
+
+Usage:
+    python benchmarks/bench_image_cache.py [--dpi DPI] [--cards N [N ...]]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PYTHON_DIR)
+
+_RUN = """
+import logging, sys
+from time import perf_counter
+sys.path[:0] = [{python_dir!r}, {bench_dir!r}]
+logging.disable(logging.CRITICAL)
+from PIL import Image
+from common import peak_rss_mb
+from decklist_to_pdf import Config, ImageProcessor, generate_layout_constants, render_all_pages
+from dataclasses import replace
+
+config = Config(dpi={dpi}, image_type='png', gamma_correction=False, two_sided=False, image_cache_mb={budget_mb})
+constants = generate_layout_constants(config)
+decklist = [{{'sides': [{{'key': f'c{{i}}', 'image_uris': {{'png': f'https://cards.example/c{{i}}.png'}}}}, {{'key': 'back'}}]}} for i in range({cards})]
+constants = replace(constants, deck_size=len(decklist), total_pages=(len(decklist) + 8) // 9)
+
+start = perf_counter()
+cache = ImageProcessor(config, constants.card_width_px, constants.card_height_px, 'png').create_cache(decklist)
+if {previous}:
+    # Every card decoded up front and held until the end, as before
+    class DecodedImages(dict):
+        def expect(self, keys): pass
+        def release(self, key): pass
+    cache = DecodedImages((key, cache[key]) for key in cache.paths)
+for page in render_all_pages(decklist, cache, constants, config):
+    pass
+print(f"{{perf_counter() - start:.2f}} {{peak_rss_mb():.0f}}")
+"""
+
+
+def _warm_cache(root: str, dpi: int, cards: int) -> None:
+    """Download a card-sized image for every synthetic card and process it once."""
+    from PIL import Image
+
+    from decklist_to_pdf import Config, ImageProcessor, generate_layout_constants
+
+    config = Config(dpi=dpi, image_type='png', gamma_correction=False)
+    constants = generate_layout_constants(config)
+    size = (constants.card_width_px, constants.card_height_px)
+    directory = os.path.join(root, 'image_cache', 'png')
+    os.makedirs(directory, exist_ok=True)
+    card = Image.effect_noise(size, 64).convert('RGB')
+    for i in range(cards):
+        card.save(os.path.join(directory, f"c{i}.png"), compress_level=1)
+
+    decklist = [{'sides': [{'key': f'c{i}', 'image_uris': {'png': f'https://cards.example/c{i}.png'}}]}
+                for i in range(cards)]
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        ImageProcessor(config, size[0], size[1], 'png').create_cache(decklist)
+    finally:
+        os.chdir(cwd)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dpi', type=int, default=300, help='render resolution')
+    parser.add_argument('--cards', type=int, nargs='+', default=[27, 81, 243], help='deck sizes')
+    parser.add_argument('--budget-mb', type=int, default=256, help='ImageCache memory budget')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _warm_cache(tmp, args.dpi, max(args.cards))
+
+        print(f"{'cards':>6} {'variant':<10} {'seconds':>8} {'peak RSS (MB)':>14}")
+        for cards in args.cards:
+            for variant in ('previous', 'lazy'):
+                code = _RUN.format(
+                    python_dir=PYTHON_DIR, bench_dir=os.path.dirname(os.path.abspath(__file__)),
+                    dpi=args.dpi, cards=cards, budget_mb=args.budget_mb, previous=variant == 'previous'
+                )
+                result = subprocess.run(
+                    [sys.executable, '-c', code], cwd=tmp, capture_output=True, text=True, check=True
+                )
+                seconds, rss = result.stdout.split()
+                print(f"{cards:>6} {variant:<10} {seconds:>8} {rss:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: image processing on threads versus worker processes
+
+Processes the same downloaded card images (decode, LANCZOS resize to the
+target DPI, gamma correction, encode) with create_cache on the thread pool
+and on process pools of 1 to N workers, starting from an empty DPI cache
+each time. Downloads are already on disk, so only the CPU work is timed.
+
+Usage:
+    python benchmarks/bench_image_processes.py [--cards N] [--dpi DPI] [--processes P [P ...]]
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+from dataclasses import replace
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_gamma import _synthetic_card
+
+
+def _run(config, decklist: list[dict]) -> float:
+    """Time create_cache from an empty DPI cache, returning seconds."""
+    from decklist_to_pdf import ImageProcessor, generate_layout_constants
+
+    shutil.rmtree(os.path.join('image_cache', str(config.dpi)), ignore_errors=True)
+    if os.path.exists('image_cache/manifest.json'):
+        os.remove('image_cache/manifest.json')
+    constants = generate_layout_constants(config)
+    processor = ImageProcessor(config, constants.card_width_px, constants.card_height_px, constants.image_format)
+    start = perf_counter()
+    cache = processor.create_cache(decklist)
+    elapsed = perf_counter() - start
+    assert len(cache) == len(decklist)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=32, help='distinct card images')
+    parser.add_argument('--dpi', type=int, default=600, help='target resolution')
+    cores = os.cpu_count() or 1
+    parser.add_argument(
+        '--processes', type=int, nargs='+',
+        default=sorted({1, 2, 4, 8, 16, 32, cores} & set(range(1, cores + 1))),
+        help='process pool sizes to compare'
+    )
+    args = parser.parse_args()
+
+    from decklist_to_pdf import Config
+
+    logging.basicConfig(level=logging.WARNING)
+    config = Config(dpi=args.dpi, image_type='png', gamma_correction=True)
+    decklist = [
+        {'sides': [{'key': f"c{i}", 'image_uris': {'png': f"https://cards.example/png/c{i}.png"}, 'black_border': True}, {'key': 'back'}]}
+        for i in range(args.cards)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        # Full-size Scryfall png downloads, as left in the raw cache
+        os.makedirs('image_cache/png')
+        rng = random.Random(0)
+        for i in range(args.cards):
+            _synthetic_card((745, 1040), rng).save(f"image_cache/png/c{i}.png", compress_level=1)
+
+        print(f"{args.cards} cards to {args.dpi} DPI on {cores} cores")
+        print(f"{'mode':<14} {'seconds':>8} {'cards/s':>8} {'speedup':>8}")
+        baseline = _run(replace(config, image_processes=0), decklist)
+        print(f"{'threads':<14} {baseline:>8.2f} {args.cards / baseline:>8.1f} {1:>8.2f}")
+        for processes in args.processes:
+            elapsed = _run(replace(config, image_processes=processes), decklist)
+            print(f"{f'{processes} processes':<14} {elapsed:>8.2f} {args.cards / elapsed:>8.1f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
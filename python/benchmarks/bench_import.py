@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: import time of the package entry points
+
+Runs each entry point in a fresh interpreter with `python -X importtime`
+and reports the median import time, excluding the modules every
+interpreter loads at startup. With --check it also fails when an entry
+point loads a heavy dependency it should not need, to guard the lazy
+import layout against regressions.
+
+Usage:
+    python benchmarks/bench_import.py [--runs N] [--check]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the bare interpreter imports at startup, filled in by main()
+STARTUP_MODULES: set[str] = set()
+
+HEAVY_MODULES = ('requests', 'urllib3', 'PIL', 'img2pdf', 'PyPDF2', 'pikepdf')
+
+# name: (code, heavy modules it is allowed to load)
+ENTRY_POINTS = {
+    'package': ("import decklist_to_pdf", ()),
+    'config': ("from decklist_to_pdf import load_config, Config", ()),
+    'card lookup': ("from decklist_to_pdf import load_card_records, card_data_lookup", ()),
+    'main --help': (
+        "import runpy, sys; sys.argv = ['main.py', '--help']\n"
+        "try:\n    runpy.run_path('main.py', run_name='__main__')\n"
+        "except SystemExit:\n    pass",
+        ()
+    ),
+    'rendering': ("from decklist_to_pdf import ImageProcessor, render_all_pages, write_pages", HEAVY_MODULES),
+}
+
+
+def _import_times(code: str) -> tuple[int, set[str]]:
+    """
+    Run code with -X importtime.
+
+    Returns:
+        (microseconds spent in top-level imports not made at interpreter
+        startup, names of every module imported)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PYTHON_DIR, capture_output=True, text=True, check=True
+    )
+    total = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        module = name.strip()
+        loaded.add(module)
+        # Top-level entries have a single space before the name; nested
+        # imports are already part of their parent's cumulative time
+        if not name.startswith('  ') and module not in STARTUP_MODULES:
+            total += int(cumulative)
+    return total, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='interpreter runs per entry point')
+    parser.add_argument('--check', action='store_true', help='fail if an entry point loads a heavy dependency')
+    args = parser.parse_args()
+
+    STARTUP_MODULES.update(_import_times('pass')[1])
+
+    print(f"{'entry point':<14} {'import (ms)':>12}  heavy modules loaded")
+    failures = []
+    for name, (code, allowed) in ENTRY_POINTS.items():
+        runs = [_import_times(code) for _ in range(args.runs)]
+        loaded = runs[0][1]
+        heavy = [module for module in HEAVY_MODULES if module in loaded]
+        median_ms = statistics.median(total for total, _ in runs) / 1000
+        print(f"{name:<14} {median_ms:>12.1f}  {', '.join(heavy) or '-'}")
+
+        unexpected = [module for module in heavy if module not in allowed]
+        if unexpected:
+            failures.append(f"{name} loads {', '.join(unexpected)}")
+
+    if args.check and failures:
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encoding a rendered page raster into a PDF page
+
+Builds one full page of cards at the given DPI and times each stage of
+turning it into a one-page PDF:
+
+- png + img2pdf: the previous route, PNG encode into a buffer, then
+  img2pdf re-parses the PNG and writes the PDF
+- png passthrough: PNG encode, its compressed data copied into the PDF
+- flate: the raster compressed straight into the PDF image stream, at a
+  few zlib levels, on one thread and with bands deflated in parallel on
+  all cores
+- jpeg: the raster JPEG encoded straight into the PDF image stream
+
+Cards are synthetic and slightly blurred, so they compress roughly like
+scans; use real ones for representative sizes.
+
+Needs img2pdf, from benchmarks/requirements.txt.
+
+Usage:
+    python benchmarks/bench_page_encoding.py [--dpi DPI] [--repeat N]
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+
+from bench_gamma import _synthetic_card
+
+
+# PNG colour types copied into the PDF as they are: (colour space, samples per pixel)
+_PNG_COLOR_TYPES = {
+    0: ('DeviceGray', 1),
+    2: ('DeviceRGB', 3),
+}
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _png_image(data: bytes):
+    """
+    Wrap a PNG file as an image XObject without decoding it.
+
+    PNG compresses its rows with the same deflate and row filters as PDF's
+    FlateDecode with a PNG predictor, so the image data is copied over.
+
+    Raises:
+        ValueError: If data is not a non-interlaced 8-bit greyscale or RGB PNG
+    """
+    from decklist_to_pdf.models import PdfImage
+
+    if not data.startswith(_PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+
+    header = None
+    chunks = []
+    position = len(_PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif chunk_type == b'IDAT':
+            chunks.append(body)
+        elif chunk_type == b'IEND':
+            break
+        position += 12 + length
+
+    if header is None:
+        raise ValueError("PNG file has no header")
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or interlace or color_type not in _PNG_COLOR_TYPES:
+        raise ValueError(f"Unsupported PNG: bit depth {bit_depth}, colour type {color_type}, interlace {interlace}")
+
+    color_space, colors = _PNG_COLOR_TYPES[color_type]
+    return PdfImage(
+        width, height, color_space, 'FlateDecode', b''.join(chunks),
+        f"/Predictor 15 /Colors {colors} /BitsPerComponent 8 /Columns {width}"
+    )
+
+
+def _page_pdf(image, constants, page) -> bytes:
+    from decklist_to_pdf.page_renderer import PAGE_SIZE_PT, pdf_box
+    from decklist_to_pdf.pdf_writer import PdfWriter, place_image
+
+    buffer = io.BytesIO()
+    writer = PdfWriter(buffer, PAGE_SIZE_PT)
+    box = pdf_box(constants, 0, 0, page.width, page.height)
+    writer.add_page(place_image('P', *box), {'P': writer.add_image(image)})
+    writer.close()
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dpi', type=int, default=600, help='page resolution')
+    parser.add_argument('--repeat', type=int, default=3, help='timed passes per route')
+    args = parser.parse_args()
+
+    import img2pdf
+
+    from decklist_to_pdf import PAGE_HEIGHT_MM, PAGE_WIDTH_MM, Config, generate_layout_constants
+    from decklist_to_pdf.pdf_writer import flate_image, jpeg_image
+
+    constants = generate_layout_constants(Config(dpi=args.dpi))
+    a4_layout = img2pdf.get_layout_fun((img2pdf.mm_to_pt(PAGE_WIDTH_MM), img2pdf.mm_to_pt(PAGE_HEIGHT_MM)))
+    rng = random.Random(0)
+    page = Image.new('RGB', (constants.page_width_px, constants.page_height_px), (255, 255, 255))
+    card_size = (constants.card_width_px, constants.card_height_px)
+    for row in constants.card_positions_px:
+        for x, y in row:
+            page.paste(_synthetic_card(card_size, rng).filter(ImageFilter.GaussianBlur(2)), (x, y))
+
+    def png_img2pdf():
+        buffer = io.BytesIO()
+        page.save(buffer, format='PNG')
+        buffer.seek(0)
+        return buffer, lambda buffer: img2pdf.convert(buffer, layout_fun=a4_layout)
+
+    def png_passthrough():
+        buffer = io.BytesIO()
+        page.save(buffer, format='PNG')
+        return _png_image(buffer.getvalue()), lambda image: _page_pdf(image, constants, page)
+
+    def jpeg(quality):
+        def encode():
+            buffer = io.BytesIO()
+            page.save(buffer, 'JPEG', quality=quality)
+            return jpeg_image(buffer.getvalue()), lambda image: _page_pdf(image, constants, page)
+        return encode
+
+    cores = os.cpu_count() or 1
+    pool = ThreadPoolExecutor(max_workers=cores)
+
+    def flate(level, executor):
+        return lambda: (flate_image(page, level, executor), lambda image: _page_pdf(image, constants, page))
+
+    routes = {
+        'png + img2pdf': png_img2pdf,
+        'png passthrough': png_passthrough,
+        'flate 6': flate(6, None),
+        'flate 6 parallel': flate(6, pool),
+        'flate 1': flate(1, None),
+        'flate 1 parallel': flate(1, pool),
+        'jpeg 90': jpeg(90),
+    }
+
+    print(f"{page.width}x{page.height} page at {args.dpi} DPI, {cores} cores")
+    print(f"{'route':<22} {'encode ms':>10} {'pdf ms':>8} {'total ms':>9} {'MB':>7}")
+    for label, route in routes.items():
+        encodes, pdfs = [], []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            encoded, to_pdf = route()
+            encodes.append(perf_counter() - start)
+            start = perf_counter()
+            pdf = to_pdf(encoded)
+            pdfs.append(perf_counter() - start)
+        encode_ms = statistics.median(encodes) * 1000
+        pdf_ms = statistics.median(pdfs) * 1000
+        print(f"{label:<22} {encode_ms:>10.0f} {pdf_ms:>8.0f} {encode_ms + pdf_ms:>9.0f} {len(pdf) / 1e6:>7.1f}")
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: page rasters versus card XObjects in the output PDF
+
+Writes the same deck with pdf_composition page (the cards of every page
+pasted into one raster) and card (every unique card image embedded once
+and placed by the page content streams), for JPEG and PNG cache files. Reports the wall time and the
+output size. Decks repeat a few cards, as basic lands do, so the card
+composition stores far fewer pixels than the deck has card slots.
+
+Usage:
+    python benchmarks/bench_pdf_composition.py [--cards N] [--unique N] [--dpi DPI]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from dataclasses import replace
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_gamma import _synthetic_card
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=60, help='cards in the deck')
+    parser.add_argument('--unique', type=int, default=20, help='distinct card images in the deck')
+    parser.add_argument('--dpi', type=int, default=300, help='print resolution')
+    args = parser.parse_args()
+
+    import logging
+
+    from decklist_to_pdf import Config, DirectoryStore, ImageCache, generate_layout_constants
+    from decklist_to_pdf.page_renderer import render_all_pages
+    from decklist_to_pdf.pdf_generator import write_card_pdf, write_pages
+
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(0)
+    deck = [{'sides': [{'key': f"c{i % args.unique}"}]} for i in range(args.cards)]
+
+    print(f"{args.cards} cards, {args.unique} unique, {args.dpi} DPI, one sided")
+    print(f"{'cache':<6} {'composition':<12} {'seconds':>8} {'MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('output')
+        for image_format in ('jpg', 'png'):
+            config = Config(dpi=args.dpi, two_sided=False, image_type='large' if image_format == 'jpg' else 'png')
+            constants = generate_layout_constants(config)
+            constants = replace(constants, deck_size=len(deck), total_pages=(len(deck) + 8) // 9)
+            paths = []
+            for i in range(args.unique):
+                path = f"c{i}.{image_format}"
+                _synthetic_card((constants.card_width_px, constants.card_height_px), rng).save(path)
+                paths.append(path)
+
+            for composition in ('page', 'card'):
+                # A fresh cache each time, so neither run finds decoded images
+                image_cache = ImageCache(1 << 30, DirectoryStore())
+                for i, path in enumerate(paths):
+                    image_cache.add(f"c{i}", path)
+                name = f"{composition}_{image_format}"
+                start = perf_counter()
+                if composition == 'card':
+                    output_path = write_card_pdf(deck, image_cache, constants, config, name)
+                else:
+                    output_path = write_pages(render_all_pages(deck, image_cache, constants, config), name)
+                seconds = perf_counter() - start
+                print(f"{image_format:<6} {composition:<12} {seconds:>8.2f} {os.path.getsize(output_path) / 1e6:>8.1f}")
+        os.chdir('/')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold cache print run, cache then render versus pipelined
+
+Prints a deck of distinct cards from a local image host into an empty
+image cache twice:
+
+- sequential: create_cache for the whole deck, then render and write
+  every page, as runs did before
+- pipelined: create_cache in the background on the deck in print order,
+  each page rendered as soon as its cards are cached and written in turn
+
+Reports the wall time of each, and for the sequential run how it splits
+between caching and rendering; the pipelined run should take about as
+long as the slower of the two. Downloads are paced by download_rate, as
+against Scryfall.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--cards N] [--dpi DPI] [--rate R] [--latency S]
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_gamma import _synthetic_card
+from common import ImageServer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=60, help='distinct cards in the deck')
+    parser.add_argument('--dpi', type=int, default=300, help='print resolution')
+    parser.add_argument('--rate', type=float, default=10.0, help='download_rate, requests per second')
+    parser.add_argument('--latency', type=float, default=0.05, help='image host latency in seconds')
+    args = parser.parse_args()
+
+    from decklist_to_pdf import Config, ImageProcessor, generate_layout_constants
+    from decklist_to_pdf.page_renderer import print_order_decklist, render_all_pages
+    from decklist_to_pdf.pdf_generator import write_pages
+
+    logging.basicConfig(level=logging.WARNING)
+    body = io.BytesIO()
+    _synthetic_card((745, 1040), random.Random(0)).save(body, 'PNG', compress_level=1)
+    server = ImageServer(body.getvalue(), latency=args.latency)
+    decklist = [{'sides': [{'key': f"c{i}", 'image_uris': {'png': f"{server.url}/c{i}.png"}}]} for i in range(args.cards)]
+    config = Config(dpi=args.dpi, image_type='png', two_sided=False, download_rate=args.rate)
+    constants = generate_layout_constants(config)
+    constants = replace(constants, deck_size=len(decklist), total_pages=(len(decklist) + 8) // 9)
+
+    print(f"{args.cards} cards, {args.dpi} DPI, {args.rate:g} downloads per second, cold cache")
+    print(f"{'run':<12} {'cache s':>8} {'render s':>9} {'total s':>8}")
+    for run in ('sequential', 'pipelined'):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.makedirs('output')
+            processor = ImageProcessor(config, constants.card_width_px, constants.card_height_px, constants.image_format)
+            start = perf_counter()
+            if run == 'sequential':
+                image_cache = processor.create_cache(decklist)
+                cached = perf_counter()
+                write_pages(render_all_pages(decklist, image_cache, constants, config), run)
+                end = perf_counter()
+                print(f"{run:<12} {cached - start:>8.2f} {end - cached:>9.2f} {end - start:>8.2f}")
+            else:
+                with ThreadPoolExecutor(1) as image_loader:
+                    cache_ready = image_loader.submit(processor.create_cache, print_order_decklist(decklist, config))
+                    write_pages(render_all_pages(decklist, processor.image_cache, constants, config, cache_ready), run)
+                    cache_ready.result()
+                end = perf_counter()
+                print(f"{run:<12} {'':>8} {'':>9} {end - start:>8.2f}")
+            processor.close()
+            os.chdir('/')
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
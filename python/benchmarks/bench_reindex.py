@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: daily card index refresh
+
+Builds the index for a synthetic bulk file, then indexes the next day's
+file, where every price changed and a small share of cards were edited,
+once with a full rebuild and once incrementally from the previous index.
+
+Usage:
+    python benchmarks/bench_reindex.py [--cards N] [--edits N]
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import make_bulk_json
+from decklist_to_pdf import card_data
+
+
+def _edit_cards(filepath: str, edits: int) -> None:
+    """Rename a random sample of cards in place."""
+    with open(filepath, 'rb') as f:
+        lines = f.read().split(b'\n')
+    for line_number in random.Random(1).sample(range(1, len(lines) - 2), edits):
+        line = lines[line_number]
+        suffix = b',' if line.endswith(b',') else b''
+        card = orjson.loads(line.rstrip(b','))
+        card['name'] += ' (edited)'
+        lines[line_number] = orjson.dumps(card) + suffix
+    with open(filepath, 'wb') as f:
+        f.write(b'\n'.join(lines))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=50000, help='synthetic card count')
+    parser.add_argument('--edits', type=int, default=200, help='cards edited between the two files')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        previous_bulk = make_bulk_json(os.path.join(tmp, 'default-cards-1.json'), args.cards)
+        next_bulk = make_bulk_json(os.path.join(tmp, 'default-cards-2.json'), args.cards, price_shift=0.5)
+        _edit_cards(next_bulk, args.edits)
+
+        previous_index = os.path.join(tmp, 'parsed_default-cards-1.idx')
+        card_data._parse_bulk_json(previous_bulk, previous_index).close()
+
+        start = perf_counter()
+        card_data._parse_bulk_json(next_bulk, os.path.join(tmp, 'parsed_full.idx')).close()
+        full = perf_counter() - start
+
+        start = perf_counter()
+        update = card_data.update_card_index(next_bulk, previous_index, os.path.join(tmp, 'parsed_incremental.idx'))
+        incremental = perf_counter() - start
+
+    print(f"{'variant':<12} {'wall (s)':>10}")
+    print(f"{'full':<12} {full:>10.2f}")
+    print(f"{'incremental':<12} {incremental:>10.2f}")
+    print(f"{len(update.changed)} records changed, {update.unchanged} card objects reused")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: producing the DPI-sized card image across DPIs
+
+Sweeps the target DPI and times decoding plus LANCZOS resizing of each
+card, previously always from a full decode of the original download, now
+from the closest cached variant decoded in JPEG draft mode. The cache
+holds the original Scryfall "large" JPEG (672x936) plus copies left by
+earlier 150 and 1200 DPI runs. Also reports which source was used and
+the mean absolute difference from the previous output.
+
+The last column removes the original downloads, as a cache cleanup would.
+Previously every card had to be downloaded again; now the cached copies
+are resized instead.
+
+Usage:
+    python benchmarks/bench_resize_source.py [--cards N] [--dpis DPI [DPI ...]]
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageChops, ImageStat
+
+from bench_gamma import _synthetic_card
+from decklist_to_pdf.image_manifest import RESIZED, ManifestEntry
+
+
+def _processor(dpi: int):
+    from decklist_to_pdf import Config, ImageProcessor, generate_layout_constants
+
+    config = Config(dpi=dpi, image_type='large')
+    constants = generate_layout_constants(config)
+    return ImageProcessor(config, constants.card_width_px, constants.card_height_px, constants.image_format)
+
+
+def _source(key: str) -> str:
+    return f"https://cards.example/large/{key}.jpg"
+
+
+def _resize(img: Image.Image, processor) -> Image.Image:
+    return img.resize((processor.card_width_px, processor.card_height_px), Image.Resampling.LANCZOS).convert('RGB')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=8, help='distinct card images')
+    parser.add_argument('--dpis', type=int, nargs='+', default=[100, 150, 300, 600, 900, 1200], help='target DPIs')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        rng = random.Random(0)
+        keys = [f"c{i}" for i in range(args.cards)]
+        _processor(1200)._ensure_directories()
+        for key in keys:
+            raw = f"image_cache/large/{key}.jpg"
+            _synthetic_card((672, 936), rng).save(raw, 'JPEG', quality=90)
+        for dpi in (150, 1200):
+            copy = _processor(dpi)
+            copy._ensure_directories()
+            for key in keys:
+                path = f"image_cache/{dpi}/large/{key}.jpg"
+                resized = copy._resize_image(Image.open(f"image_cache/large/{key}.jpg"), path)
+                copy.manifest.record(copy._entry_params(RESIZED), _source(key), ManifestEntry(path, resized.width, RESIZED))
+            copy.manifest.save()
+
+        print(f"{'dpi':>5} {'previous ms':>12} {'current ms':>11} {'speedup':>8}  {'source':<22} {'mean diff':>9}"
+              f"  {'no download, ms':>15}")
+        rows = []
+        for dpi in args.dpis:
+            processor = _processor(dpi)
+            previous, current, diffs = [], [], []
+            for key in keys:
+                raw = f"image_cache/large/{key}.jpg"
+
+                start = perf_counter()
+                expected = _resize(processor._open_image(raw, 1), processor)
+                previous.append(perf_counter() - start)
+
+                start = perf_counter()
+                source = processor._resize_source(_source(key), raw)
+                actual = _resize(processor._open_image(source, 1, draft=True), processor)
+                current.append(perf_counter() - start)
+
+                diff = ImageStat.Stat(ImageChops.difference(expected, actual)).mean
+                diffs.append(sum(diff) / len(diff))
+
+            rows.append((dpi, statistics.median(previous) * 1000, statistics.median(current) * 1000, source, max(diffs)))
+
+        for key in keys:
+            os.remove(f"image_cache/large/{key}.jpg")
+        for dpi, previous_ms, current_ms, source, diff in rows:
+            # A fresh manifest holds only the copies; the downloads are gone
+            processor = _processor(dpi)
+            evicted = []
+            for key in keys:
+                start = perf_counter()
+                source_copy = processor._resize_source(_source(key), f"image_cache/large/{key}.jpg")
+                _resize(processor._open_image(source_copy, 1, draft=True), processor)
+                evicted.append(perf_counter() - start)
+            print(f"{dpi:>5} {previous_ms:>12.1f} {current_ms:>11.1f} {previous_ms / current_ms:>8.2f}  "
+                  f"{os.path.dirname(source):<22} {diff:>9.2f}  {statistics.median(evicted) * 1000:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
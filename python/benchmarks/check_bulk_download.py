@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Check: Scryfall bulk data download against a local stand-in server
+
+Runs fetch_bulk_json against a local bulk data API in a fresh directory
+for each case and checks the stored bulk file against the served one:
+
+- unchanged metadata costs one 304 and no file transfer
+- gzip transfers are stored compressed or decompressed as bulk_compressed
+  sets, and so are identity transfers
+- a transfer dropped halfway is resumed with a Range request
+- a resume answered in another encoding, or from another offset, starts
+  the file over instead of appending to it
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/check_bulk_download.py [--cards N]
+"""
+import argparse
+import gzip
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import BulkServer, make_bulk_json
+
+
+def _stored(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        data = f.read()
+    return gzip.decompress(data) if path.endswith('.gz') else data
+
+
+def _run_case(body: bytes, gzip_encoding: bool, compressed: bool, fault: str) -> list[str]:
+    """One download in a fresh directory; returns the problems found."""
+    from decklist_to_pdf import Config, card_data
+
+    problems = []
+    server = BulkServer(body, gzip_encoding)
+    card_data.BULK_DATA_URL = f"{server.url}/bulk-data/default-cards"
+    config = Config(bulk_compressed=compressed)
+    if fault:
+        # Halfway through either encoding
+        server.drop_after = len(gzip.compress(body)) // 2
+        server.bad_resume = '' if fault == 'drop' else fault
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            path = card_data.fetch_bulk_json(config, ask=False)
+            if path.endswith('.gz') != compressed:
+                problems.append(f"stored as {path} with bulk_compressed {compressed}")
+            if _stored(path) != body:
+                problems.append("stored bulk file differs from the served one")
+            if any(name.endswith(('.part', '.tmp')) for name in os.listdir(card_data.BULK_JSON_DIR)):
+                problems.append("partial or temporary file left behind")
+
+            if card_data.fetch_bulk_json(config, ask=False) != path:
+                problems.append("second fetch returned another path")
+            if server.statuses('/bulk-data/')[-1] != 304:
+                problems.append("second fetch did not get a 304")
+        except Exception as e:
+            problems.append(f"{type(e).__name__}: {e}")
+        finally:
+            os.chdir('/')
+            server.close()
+
+    transfers = server.statuses('/file/')
+    if not fault and transfers != [200]:
+        problems.append(f"file transfers {transfers}, expected [200]")
+    if fault == 'drop' and transfers != [200, 206]:
+        problems.append(f"file transfers {transfers}, expected a 206 resume")
+    if fault in ('encoding', 'offset') and transfers != [200, 206, 200]:
+        problems.append(f"file transfers {transfers}, expected the bad 206 to start over")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=2000, help='cards in the served bulk file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(make_bulk_json(os.path.join(tmp, 'bulk.json'), args.cards), 'rb') as f:
+            body = f.read()
+
+    cases = [
+        ('gzip transfer, stored plain', True, False, ''),
+        ('gzip transfer, stored gzip', True, True, ''),
+        ('identity transfer, stored gzip', False, True, ''),
+        ('dropped gzip transfer', True, False, 'drop'),
+        ('dropped identity transfer', False, True, 'drop'),
+        ('resume in another encoding', True, False, 'encoding'),
+        ('resume from another offset', False, False, 'offset'),
+    ]
+    print(f"{len(body) / 1e6:.1f} MB bulk file")
+    failed = False
+    for label, gzip_encoding, compressed, fault in cases:
+        problems = _run_case(body, gzip_encoding, compressed, fault)
+        print(f"{label:<34} {'ok' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"  {problem}")
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
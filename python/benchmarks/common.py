@@ -0,0 +1,294 @@
+"""
+Decklist to PDF - Benchmark Helpers
+
+Synthetic Scryfall-shaped data, so benchmarks can run without downloading
+the real multi-hundred-MB default-cards file, local stand-ins for the
+Scryfall image host and bulk data API, and process measurements.
+"""
+import gzip
+import http.server
+import random
+import resource
+import threading
+import time
+from collections import Counter
+
+import orjson
+
+
+_IMAGE_HOST = 'https://cards.scryfall.io'
+_IMAGE_TYPES = ('small', 'normal', 'large', 'png', 'art_crop', 'border_crop')
+_SETS = [f"s{i:02d}" for i in range(60)]
+_FORMATS = (
+    'standard', 'future', 'historic', 'timeless', 'gladiator', 'pioneer', 'explorer', 'modern',
+    'legacy', 'pauper', 'vintage', 'penny', 'commander', 'oathbreaker', 'brawl', 'alchemy',
+    'paupercommander', 'duel', 'oldschool', 'premodern', 'predh',
+)
+
+
+def _image_uris(card_id: str, face: str = 'front') -> dict:
+    """Build an image_uris block in the Scryfall URL layout."""
+    uris = {}
+    for image_type in _IMAGE_TYPES:
+        extension = 'png' if image_type == 'png' else 'jpg'
+        uris[image_type] = f"{_IMAGE_HOST}/{image_type}/{face}/{card_id[0]}/{card_id[1]}/{card_id}.{extension}?1700000000"
+    return uris
+
+
+def make_card(index: int, rng: random.Random, price_shift: float = 0.0) -> dict:
+    """Build one synthetic card object, roughly 1 in 20 double-faced."""
+    card_id = f"{index:08x}-0000-4000-8000-{rng.getrandbits(48):012x}"
+    set_code = _SETS[index % len(_SETS)]
+    card = {
+        'object': 'card',
+        'id': card_id,
+        'oracle_id': f"{rng.getrandbits(128):032x}",
+        'name': f"Card {index}",
+        'lang': 'en',
+        'released_at': f"20{10 + index % 15:02d}-{1 + index % 12:02d}-15",
+        'layout': 'normal',
+        'set': set_code,
+        'set_name': f"Set {set_code}",
+        'collector_number': str(index // len(_SETS) + 1),
+        'border_color': rng.choice(['black', 'black', 'black', 'white', 'borderless']),
+        'frame': rng.choice(['1993', '1997', '2003', '2015']),
+        'oracle_text': 'Lorem ipsum dolor sit amet, {T}: Add {G}. ' * rng.randint(1, 4),
+        'legalities': {fmt: rng.choice(['legal', 'not_legal']) for fmt in _FORMATS},
+        'games': ['paper', 'mtgo'],
+        'artist': f"Artist {index % 400}",
+        'purchase_uris': {shop: f"https://{shop}.example/product/{index}?utm_source=scryfall" for shop in ('tcgplayer', 'cardmarket', 'cardhoarder')},
+        'prices': {'usd': f"{rng.random() * 20 + price_shift:.2f}", 'eur': None, 'tix': None},
+        'related_uris': {'gatherer': f"https://gatherer.wizards.com/{index}"},
+    }
+    if index % 20 == 0:
+        card['layout'] = 'transform'
+        card['name'] = f"Card {index} Front // Card {index} Back"
+        card['card_faces'] = [
+            {'object': 'card_face', 'name': f"Card {index} Front", 'image_uris': _image_uris(card_id, 'front')},
+            {'object': 'card_face', 'name': f"Card {index} Back", 'image_uris': _image_uris(card_id, 'back')},
+        ]
+        card['all_parts'] = [
+            {'object': 'related_card', 'id': card_id, 'component': 'combo_piece', 'name': card['name']},
+            {'object': 'related_card', 'id': card_id, 'component': 'token', 'name': 'Token'},
+        ]
+    else:
+        card['image_uris'] = _image_uris(card_id)
+    return card
+
+
+def make_bulk_json(path: str, count: int, seed: int = 0, price_shift: float = 0.0) -> str:
+    """
+    Write a synthetic bulk JSON array with one card per line, like Scryfall.
+
+    Args:
+        path: Destination file path
+        count: Number of card objects to write
+        seed: Random seed for reproducible output
+        price_shift: Added to every price, to mimic a daily price refresh
+
+    Returns:
+        The destination path
+    """
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        f.write(b'[\n')
+        for index in range(count):
+            if index:
+                f.write(b',\n')
+            f.write(orjson.dumps(make_card(index, rng, price_shift)))
+        f.write(b'\n]\n')
+    return path
+
+
+def peak_rss_mb() -> float:
+    """
+    Return the peak resident set size of this process in MB.
+
+    Prefers VmHWM from /proc, which starts fresh at exec; ru_maxrss can
+    carry over the high-water mark of the parent process that forked us.
+    """
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ImageServer:
+    """
+    Local stand-in for the Scryfall image host.
+
+    Serves the same image body for every path over HTTP/1.1 keep-alive,
+    with optional per-request and per-connection latency to mimic a remote
+    CDN, and answers 429 once more than rate_limit requests arrived within
+    the last second. Records request times, requests per path and
+    connection count.
+    """
+
+    def __init__(self, body: bytes, latency: float = 0.0, connect_latency: float = 0.0, rate_limit: float = 0.0):
+        self.body = body
+        self.request_times: list[float] = []
+        self.paths: Counter = Counter()
+        self.connections = 0
+        self.throttled = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with lock:
+                    server.connections += 1
+                time.sleep(connect_latency)
+
+            def do_GET(self) -> None:
+                time.sleep(latency)
+                now = time.monotonic()
+                with lock:
+                    recent = sum(1 for t in server.request_times[-int(rate_limit) - 1:] if now - t < 1.0) if rate_limit else 0
+                    limited = rate_limit and recent >= rate_limit
+                    if limited:
+                        server.throttled += 1
+                    else:
+                        server.request_times.append(now)
+                        server.paths[self.path] += 1
+                if limited:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def peak_rate(self) -> int:
+        """Most requests served within any one-second window."""
+        times = self.request_times
+        peak = 0
+        start = 0
+        for end, t in enumerate(times):
+            while t - times[start] >= 1.0:
+                start += 1
+            peak = max(peak, end - start + 1)
+        return peak
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class BulkServer:
+    """
+    Local stand-in for the Scryfall bulk data API and its file host.
+
+    /bulk-data/default-cards answers with metadata pointing at /file/,
+    or 304 when If-None-Match matches. The file is sent gzip encoded when
+    the client accepts it, and Range requests are answered with 206 when
+    If-Range matches its ETag. Faults for the next file transfer are set
+    through the attributes. Records (path, status, Range header) of every
+    request.
+    """
+
+    def __init__(self, body: bytes, gzip_encoding: bool = True):
+        self.body = body
+        self.gzip_encoding = gzip_encoding
+        # Bytes sent before the next file transfer drops the connection
+        self.drop_after = 0
+        # How the next 206 goes wrong: '' (it does not), 'encoding' or 'offset'
+        self.bad_resume = ''
+        self.requests: list[tuple[str, int, str]] = []
+        lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.startswith('/bulk-data/'):
+                    self._metadata()
+                else:
+                    self._file()
+
+            def _metadata(self) -> None:
+                etag = f'"meta-{len(server.body)}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(304, {'ETag': etag}, b'')
+                    return
+                body = orjson.dumps({'download_uri': f"{server.url}/file/default-cards-{len(server.body)}.json"})
+                self._send(200, {'ETag': etag, 'Content-Type': 'application/json'}, body)
+
+            def _file(self) -> None:
+                etag = f'"file-{len(server.body)}"'
+                encoded = server.gzip_encoding and 'gzip' in self.headers.get('Accept-Encoding', '')
+                requested = self.headers.get('Range', '')
+                resume = requested.startswith('bytes=') and self.headers.get('If-Range') == etag
+                with lock:
+                    drop_after, server.drop_after = server.drop_after, 0
+                    bad_resume = server.bad_resume if resume else ''
+                    if resume:
+                        server.bad_resume = ''
+
+                if bad_resume == 'encoding':
+                    # The rest of the file in the other encoding
+                    encoded = not encoded
+                data = gzip.compress(server.body, mtime=0) if encoded else server.body
+                headers = {'ETag': etag}
+                if encoded:
+                    headers['Content-Encoding'] = 'gzip'
+                if not resume:
+                    self._send(200, headers, data, drop_after)
+                    return
+
+                start = 0 if bad_resume == 'offset' else int(requested[len('bytes='):].rstrip('-'))
+                headers['Content-Range'] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+                self._send(206, headers, data[start:], drop_after)
+
+            def _send(self, status: int, headers: dict, body: bytes, drop_after: int = 0) -> None:
+                with lock:
+                    server.requests.append((self.path, status, self.headers.get('Range', '')))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if drop_after:
+                    # Cut the transfer short, as a dropped connection does
+                    self.wfile.write(body[:drop_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        # Clients hang up on dropped transfers; nothing to report
+        self._server.handle_error = lambda request, client_address: None
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def statuses(self, prefix: str) -> list[int]:
+        """Statuses of the requests whose path starts with prefix, in order."""
+        return [status for path, status, _ in self.requests if path.startswith(prefix)]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
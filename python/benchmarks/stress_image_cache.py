@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Stress test: several runs filling one cold image cache at the same time
+
+Starts N processes together, each running create_cache for the same deck
+(in its own shuffled order) against one empty cache directory and a local
+image host, once per cache storage. Then checks that:
+
+- every image was downloaded once across all processes
+- every card has one processed file in the manifest, and it decodes
+- no temporary files were left behind
+- every process got an image for every card
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/stress_image_cache.py [--processes N] [--cards N] [--image-processes P]
+"""
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_gamma import _synthetic_card
+from common import ImageServer
+
+
+def _decklist(url: str, cards: int) -> list[dict]:
+    return [
+        {'sides': [{'key': f"c{i}", 'image_uris': {'png': f"{url}/c{i}.png"}, 'black_border': i % 2 == 0}, {'key': 'back'}]}
+        for i in range(cards)
+    ]
+
+
+def _run(directory: str, config, decklist: list[dict], seed: int, start, results) -> None:
+    """One run: fill the shared cache and report how many cards it got."""
+    from decklist_to_pdf import ImageProcessor, generate_layout_constants
+
+    logging.basicConfig(level=logging.WARNING)
+    os.chdir(directory)
+    decklist = list(decklist)
+    random.Random(seed).shuffle(decklist)
+    constants = generate_layout_constants(config)
+    processor = ImageProcessor(config, constants.card_width_px, constants.card_height_px, constants.image_format)
+
+    start.wait()
+    began = perf_counter()
+    cache = processor.create_cache(decklist)
+    results.put((len(cache), perf_counter() - began))
+
+
+def _check(config, sources: list[str]) -> list[str]:
+    """Problems found in the cache left by the runs, in the current directory."""
+    from PIL import Image
+    from decklist_to_pdf import ImageManifest, ImageProcessor, generate_layout_constants
+    from decklist_to_pdf.image_store import open_store
+
+    problems = []
+    constants = generate_layout_constants(config)
+    processor = ImageProcessor(config, constants.card_width_px, constants.card_height_px, constants.image_format)
+    manifest = ImageManifest()
+    store = open_store(config.cache_storage)
+    for index, source in enumerate(sources):
+        params = processor.corrected_params if index % 2 == 0 else processor.resized_params
+        entry = manifest.get(params, source)
+        if entry is None:
+            problems.append(f"{source} has no processed image in the manifest")
+            continue
+        try:
+            with store.open(entry.path) as f, Image.open(f) as img:
+                img.load()
+        except Exception as e:
+            problems.append(f"{entry.path} does not decode: {e}")
+
+    for directory, _, file_names in os.walk('image_cache'):
+        problems.extend(
+            f"Temporary file left: {os.path.join(directory, name)}" for name in file_names if name.endswith('.tmp')
+        )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8, help='simultaneous runs')
+    parser.add_argument('--cards', type=int, default=40, help='distinct card images in the deck')
+    parser.add_argument('--image-processes', type=int, default=0, help='image_processes of each run')
+    parser.add_argument('--latency', type=float, default=0.02, help='image host latency in seconds')
+    args = parser.parse_args()
+
+    from decklist_to_pdf import Config
+
+    body = io.BytesIO()
+    _synthetic_card((745, 1040), random.Random(0)).save(body, 'PNG', compress_level=1)
+    context = multiprocessing.get_context('spawn')
+    failed = False
+
+    print(f"{args.processes} processes, {args.cards} cards, cold cache")
+    print(f"{'storage':<10} {'seconds':>8} {'requests':>9} {'duplicates':>11} {'problems':>9}")
+    for storage in ('directory', 'pack'):
+        server = ImageServer(body.getvalue(), latency=args.latency)
+        config = Config(
+            dpi=300, image_type='png', gamma_correction=True, cache_storage=storage,
+            image_processes=args.image_processes, download_rate=1000
+        )
+        decklist = _decklist(server.url, args.cards)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = context.Event()
+            results = context.Queue()
+            runs = [
+                context.Process(target=_run, args=(tmp, config, decklist, seed, start, results))
+                for seed in range(args.processes)
+            ]
+            for run in runs:
+                run.start()
+            began = perf_counter()
+            start.set()
+            outcomes = [results.get() for _ in runs]
+            elapsed = perf_counter() - began
+            for run in runs:
+                run.join()
+
+            os.chdir(tmp)
+            problems = _check(config, [side['image_uris']['png'] for entry in decklist for side in entry['sides'][:1]])
+            os.chdir('/')
+        server.close()
+
+        problems += [f"A run got {cards} of {args.cards} cards" for cards, _ in outcomes if cards != args.cards]
+        duplicates = sum(count - 1 for count in server.paths.values())
+        if len(server.paths) != args.cards:
+            problems.append(f"{len(server.paths)} of {args.cards} images downloaded")
+        print(f"{storage:<10} {elapsed:>8.2f} {sum(server.paths.values()):>9} {duplicates:>11} {len(problems):>9}")
+        for problem in problems:
+            print(f"  {problem}")
+        failed = failed or bool(problems) or duplicates > 0
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
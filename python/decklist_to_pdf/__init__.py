@@ -3,11 +3,14 @@ Decklist to PDF Package
 
 A tool for converting Magic: The Gathering decklists to printable PDFs.
 """
+import importlib
+
 from .models import (
     Config,
     CardSide,
     DecklistEntry,
     LayoutConstants,
+    IndexUpdate,
     GAMMA_THRESHOLD,
     MAX_GAMMA,
     BORDER_SAMPLE_OFFSET,
@@ -19,10 +22,56 @@ from .models import (
     PAGE_HEIGHT_MM,
 )
 from .config import load_config, write_config
-from .card_data import fetch_bulk_json, load_card_dictionary, card_data_lookup, read_decklist
-from .image_processor import ImageProcessor
-from .page_renderer import generate_layout_constants, render_page, render_all_pages
-from .pdf_generator import merge_pages
+
+# Everything else is imported on first access (PEP 562), so importing the
+# package or its config does not load requests, PIL or img2pdf.
+_LAZY_ATTRIBUTES = {
+    'fetch_bulk_json': 'card_data',
+    'load_card_dictionary': 'card_data',
+    'update_card_index': 'card_data',
+    'prepare_card_data': 'card_data',
+    'collect_decklist_keys': 'card_data',
+    'load_card_records': 'card_data',
+    'check_card_records': 'card_data',
+    'load_name_index': 'card_data',
+    'resolve_card_names': 'card_data',
+    'normalize_card_name': 'card_data',
+    'card_data_lookup': 'card_data',
+    'read_decklist': 'card_data',
+    'decklist_from_keys': 'card_data',
+    'load_set_keys': 'card_data',
+    'CardIndex': 'card_index',
+    'ImageProcessor': 'image_processor',
+    'ImageCache': 'image_cache',
+    'ImageManifest': 'image_manifest',
+    'DirectoryStore': 'image_store',
+    'PackStore': 'image_store',
+    'warm_cache': 'cache_warmer',
+    'warm_profiles': 'cache_warmer',
+    'generate_layout_constants': 'page_renderer',
+    'render_page': 'page_renderer',
+    'render_all_pages': 'page_renderer',
+    'print_order_decklist': 'page_renderer',
+    'write_pages': 'pdf_generator',
+    'merge_pages': 'pdf_generator',
+    'write_card_pdf': 'pdf_generator',
+    'PdfWriter': 'pdf_writer',
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
 
 __version__ = '0.2.0'
 __all__ = [
@@ -31,21 +80,43 @@ __all__ = [
     'CardSide',
     'DecklistEntry',
     'LayoutConstants',
+    'IndexUpdate',
     # Config
     'load_config',
     'write_config',
     # Card data
     'fetch_bulk_json',
     'load_card_dictionary',
+    'update_card_index',
+    'prepare_card_data',
+    'collect_decklist_keys',
+    'load_card_records',
+    'check_card_records',
+    'load_name_index',
+    'resolve_card_names',
+    'normalize_card_name',
     'card_data_lookup',
     'read_decklist',
+    'decklist_from_keys',
+    'load_set_keys',
+    'CardIndex',
     # Image processing
     'ImageProcessor',
+    'ImageCache',
+    'ImageManifest',
+    'DirectoryStore',
+    'PackStore',
+    'warm_cache',
+    'warm_profiles',
     # Page rendering
     'generate_layout_constants',
     'render_page',
     'render_all_pages',
+    'print_order_decklist',
     # PDF generation
+    'write_pages',
     'merge_pages',
+    'write_card_pdf',
+    'PdfWriter',
 ]
 
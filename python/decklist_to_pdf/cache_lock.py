@@ -0,0 +1,172 @@
+"""
+Decklist to PDF - Cross-Process Cache Locks
+
+Locks shared by every process using the same image cache, so runs at the
+same time do not fetch or process an image twice or overwrite each
+other's manifest and pack index. Every lock is one byte of a single lock
+file, image_cache/cache.lock, so a cache of any size needs one file. The
+locks are fcntl record locks on POSIX and msvcrt byte locks on Windows.
+The OS drops them when a process exits, so a crashed run never leaves a
+lock behind.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from time import sleep
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+LOCK_PATH = 'image_cache/cache.lock'
+
+# Lock offsets: whole-file updates first, then packs being appended to,
+# then images by source
+MANIFEST_SLOT = 0
+PACK_INDEX_SLOT = 1
+_PACK_SLOTS = 1 << 32
+_SOURCE_SLOTS = 1 << 40
+
+_locks: dict[str, 'CacheLock'] = {}
+_locks_lock = threading.Lock()
+
+
+def cache_lock(path: str = LOCK_PATH) -> 'CacheLock':
+    """
+    Return this process's handle on a lock file.
+    
+    POSIX drops all of a process's record locks on a file when any of its
+    descriptors for that file is closed, so each process opens the lock
+    file once and shares the handle.
+    """
+    path = os.path.abspath(path)
+    with _locks_lock:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = CacheLock(path)
+        return lock
+
+
+def file_stamp(path: str) -> Optional[tuple[int, int, int]]:
+    """Identity of a file's current contents, to notice another run replacing it; None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def pack_slot(number: int) -> int:
+    """Lock offset held while appending to a pack."""
+    return _PACK_SLOTS + number
+
+
+def source_slot(source: str) -> int:
+    """Lock offset claiming an image source; sources sharing a slot only wait for each other."""
+    return _SOURCE_SLOTS + int.from_bytes(hashlib.sha1(source.encode('utf-8')).digest()[:4], 'little')
+
+
+class CacheLock:
+    """Exclusive locks on single bytes of a lock file, across threads and processes."""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Lock file, created if missing
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        # Record locks do not exclude threads of the same process
+        self._held: set[int] = set()
+        self._condition = threading.Condition()
+        self._seek_lock = threading.Lock()
+    
+    def acquire(self, slot: int, blocking: bool = True) -> bool:
+        """
+        Lock a slot.
+        
+        Args:
+            slot: Lock offset, from the *_SLOT constants or *_slot functions
+            blocking: Wait for the lock instead of giving up at once
+        
+        Returns:
+            Whether the lock was taken
+        """
+        with self._condition:
+            while slot in self._held:
+                if not blocking:
+                    return False
+                self._condition.wait()
+            self._held.add(slot)
+        
+        try:
+            locked = self._lock(slot, blocking)
+        except BaseException:
+            self._forget(slot)
+            raise
+        if not locked:
+            self._forget(slot)
+        return locked
+    
+    def release(self, slot: int) -> None:
+        """Unlock a slot taken with acquire()."""
+        try:
+            self._unlock(slot)
+        finally:
+            self._forget(slot)
+    
+    def wait(self, slot: int) -> None:
+        """Wait until nobody holds a slot, without keeping it."""
+        self.acquire(slot)
+        self.release(slot)
+    
+    @contextmanager
+    def hold(self, slot: int) -> Iterator[None]:
+        """Hold a slot for the duration of a with block."""
+        self.acquire(slot)
+        try:
+            yield
+        finally:
+            self.release(slot)
+    
+    def _forget(self, slot: int) -> None:
+        with self._condition:
+            self._held.discard(slot)
+            self._condition.notify_all()
+    
+    def _lock(self, slot: int, blocking: bool) -> bool:
+        if fcntl is not None:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB), 1, slot, os.SEEK_SET)
+            except (BlockingIOError, PermissionError):
+                if blocking:
+                    raise
+                return False
+            return True
+        
+        # msvcrt locks at the file position and only waits about ten seconds
+        while True:
+            with self._seek_lock:
+                os.lseek(self._fd, slot, os.SEEK_SET)
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                    return True
+                except OSError:
+                    if not blocking:
+                        return False
+            sleep(0.05)
+    
+    def _unlock(self, slot: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot, os.SEEK_SET)
+            return
+        with self._seek_lock:
+            os.lseek(self._fd, slot, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
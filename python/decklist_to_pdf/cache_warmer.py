@@ -0,0 +1,121 @@
+"""
+Decklist to PDF - Image Cache Warming
+
+Downloads and processes card images ahead of the runs that print them, so
+the first print of a new set finds every image already in the cache.
+Cards are prepared for each of the configured warm_profiles, a chunk at a
+time. Every chunk is saved to the cache manifest as it finishes, so an
+interrupted warm resumes where it stopped, and the cache claims let it
+run alongside print runs without fetching an image twice.
+"""
+import logging
+from dataclasses import replace
+from time import perf_counter
+
+from .image_processor import ImageProcessor
+from .models import CacheStats, Config
+from .page_renderer import generate_layout_constants
+
+
+# Cards per create_cache call; a print run waiting on a claimed image
+# waits at most for one chunk
+WARM_CHUNK_SIZE = 50
+
+_GAMMA_SETTINGS = {'gamma': True, 'plain': False}
+_IMAGE_TYPES = ('small', 'normal', 'large', 'png', 'art_crop', 'border_crop')
+
+
+def warm_profiles(config: Config) -> list[Config]:
+    """
+    Read the image settings to warm the cache for from warm_profiles.
+    
+    Each comma separated profile is dpi/image_type, optionally followed by
+    /gamma or /plain; gamma_correction is used when it is left out. An
+    empty setting warms for the configured dpi, image_type and
+    gamma_correction.
+    
+    Args:
+        config: Configuration object
+    
+    Returns:
+        One configuration per profile
+    
+    Raises:
+        ValueError: If a profile is malformed
+    """
+    profiles = []
+    for profile in str(config.warm_profiles).split(','):
+        profile = profile.strip()
+        if not profile:
+            continue
+        parts = profile.split('/')
+        if len(parts) not in (2, 3) or not parts[0].isdigit() or parts[1] not in _IMAGE_TYPES:
+            raise ValueError(f"Invalid warm profile '{profile}', expected dpi/image_type/gamma, e.g. 600/png/gamma")
+        if len(parts) == 3 and parts[2] not in _GAMMA_SETTINGS:
+            raise ValueError(f"Invalid warm profile '{profile}', the last part must be gamma or plain")
+        gamma_correction = _GAMMA_SETTINGS[parts[2]] if len(parts) == 3 else config.gamma_correction
+        profiles.append(replace(config, dpi=int(parts[0]), image_type=parts[1], gamma_correction=gamma_correction))
+    return profiles or [replace(config)]
+
+
+def profile_name(config: Config) -> str:
+    """Name of a profile in the warm_profiles format."""
+    return f"{config.dpi}/{config.image_type}/{'gamma' if config.gamma_correction else 'plain'}"
+
+
+def warm_cache(decklist: list[dict], profiles: list[Config], chunk_size: int = WARM_CHUNK_SIZE) -> list[CacheStats]:
+    """
+    Download and process the images of decklist entries for every profile.
+    
+    Images already in the cache are skipped, so running it again resumes
+    an interrupted warm. Progress is logged after every chunk.
+    
+    Args:
+        decklist: Decklist entries, as from read_decklist or decklist_from_keys
+        profiles: Configurations from warm_profiles
+        chunk_size: Cards per create_cache call
+    
+    Returns:
+        Counters of each profile, in order
+    """
+    decklist = _unique_entries(decklist)
+    results = []
+    
+    for profile in profiles:
+        name = profile_name(profile)
+        start = perf_counter()
+        constants = generate_layout_constants(profile)
+        # Nothing is rendered, so keep no decoded images
+        with ImageProcessor(
+            replace(profile, image_cache_mb=0),
+            constants.card_width_px,
+            constants.card_height_px,
+            constants.image_format
+        ) as processor:
+            for chunk_start in range(0, len(decklist), chunk_size):
+                processor.create_cache(decklist[chunk_start:chunk_start + chunk_size])
+                done = min(len(decklist), chunk_start + chunk_size)
+                stats = processor.stats
+                logging.info(
+                    f"Warming {name}: {done}/{len(decklist)} cards, "
+                    f"{stats.downloaded} downloaded ({processor.downloader.stats.bytes / 1e6:.1f} MB), "
+                    f"{stats.processed} processed ({stats.bytes_written / 1e6:.1f} MB written), "
+                    f"{stats.reused} already cached, {stats.failed} failed"
+                )
+        
+        logging.info(f"Warmed {name} in {perf_counter() - start:.2f} seconds")
+        results.append(processor.stats)
+    
+    return results
+
+
+def _unique_entries(decklist: list[dict]) -> list[dict]:
+    """Drop repeated entries, such as copies of a card, keeping the first."""
+    seen = set()
+    unique = []
+    for entry in decklist:
+        keys = tuple(side.get('key') for side in entry.get('sides') or ())
+        if keys not in seen:
+            seen.add(keys)
+            unique.append(entry)
+    return unique
@@ -3,21 +3,45 @@ Decklist to PDF - Card Data Management
 
 Handles Scryfall bulk data loading, parsing, and card lookups.
 """
+import glob
+import gzip
+import hashlib
 import logging
 import os
-import urllib.request
-from urllib.request import Request
+import re
+import shutil
+import unicodedata
+from collections.abc import Container, Iterable, Iterator, Mapping
+from time import perf_counter
+from typing import BinaryIO, Optional, Union
 
 import orjson
-import requests
 
-from .models import Config, CardSide, DecklistEntry
+from .card_index import CardIndex, write_card_index
+from .models import Config, CardSide, DecklistEntry, IndexUpdate, RETRY_COUNT
+
+
+BULK_DATA_URL = 'https://api.scryfall.com/bulk-data/default-cards'
+BULK_JSON_DIR = 'scryfall_bulk_json'
+
+# Prefix of card data keys that look a card up by name instead of set and number
+NAME_KEY_PREFIX = 'name:'
+
+# Validators of the last metadata response and state of an interrupted download
+_BULK_METADATA_PATH = f"{BULK_JSON_DIR}/bulk_metadata.json"
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+_HTTP_TIMEOUT = 60
 
 
 def fetch_bulk_json(config: Config, ask: bool = True) -> str:
     """
     Download or locate Scryfall bulk JSON file.
     
+    The metadata request is conditional on the validators of the previous
+    response, so an unchanged bulk file costs a single 304. New files are
+    streamed to disk in chunks, resumed with HTTP Range requests after an
+    interruption, and moved into place only once complete.
+    
     Args:
         config: Configuration object
         ask: Whether to prompt user for download confirmation
@@ -31,54 +55,564 @@ def fetch_bulk_json(config: Config, ask: bool = True) -> str:
             logging.info("Skipping Scryfall bulk JSON download.")
             return config.bulk_json_path
     
+    # Only needed when going to the network, keeps card lookups fast to import
+    import requests
+    import urllib3
+    
     headers = {
         'User-Agent': config.user_agent,
-        'Accept': config.accept
+        'Accept': config.accept,
+        'Accept-Encoding': 'gzip'
     }
     
-    response = requests.get('https://api.scryfall.com/bulk-data/default-cards', headers=headers)
+    # Ensure directory exists
+    os.makedirs(BULK_JSON_DIR, exist_ok=True)
+    
+    metadata = _read_bulk_metadata()
+    request_headers = dict(headers)
+    if os.path.exists(metadata.get('bulk_json_path', '')):
+        if 'etag' in metadata:
+            request_headers['If-None-Match'] = metadata['etag']
+        if 'last_modified' in metadata:
+            request_headers['If-Modified-Since'] = metadata['last_modified']
+    
+    response = requests.get(BULK_DATA_URL, headers=request_headers, timeout=_HTTP_TIMEOUT)
+    if response.status_code == 304:
+        logging.info("Scryfall bulk data unchanged.")
+        return metadata['bulk_json_path']
     response.raise_for_status()
     
     json_response = response.json()
     bulk_json_uri = json_response['download_uri']
-    local_filename = f"scryfall_bulk_json/{bulk_json_uri.split('/')[-1]}"
-    
-    # Ensure directory exists
-    os.makedirs('scryfall_bulk_json', exist_ok=True)
+    local_filename = f"{BULK_JSON_DIR}/{bulk_json_uri.split('/')[-1]}"
+    if config.bulk_compressed:
+        local_filename += '.gz'
     
-    if os.path.exists(local_filename):
-        return local_filename
+    if not os.path.exists(local_filename):
+        logging.info('Downloading new Scryfall bulk data...')
+        for attempt in range(RETRY_COUNT):
+            try:
+                _download_bulk_json(bulk_json_uri, local_filename, headers, metadata)
+                break
+            except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+                if attempt == RETRY_COUNT - 1:
+                    raise
+                logging.warning(f"Bulk data download interrupted ({e}), resuming")
     
-    logging.info('Downloading new Scryfall bulk data...')
-    request = Request(bulk_json_uri, headers=headers)
-    with urllib.request.urlopen(request) as http_response, open(local_filename, 'wb') as out_file:
-        out_file.write(http_response.read())
+    metadata.pop('download', None)
+    metadata.update({
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'bulk_json_path': local_filename,
+    })
+    _write_bulk_metadata({key: value for key, value in metadata.items() if value is not None})
     
     return local_filename
 
 
-def load_card_dictionary(config: Config) -> dict:
+def _read_bulk_metadata() -> dict:
+    """Read the saved bulk metadata validators, if any."""
+    try:
+        with open(_BULK_METADATA_PATH, 'rb') as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+
+def _write_bulk_metadata(metadata: dict) -> None:
+    """Save bulk metadata validators and download state."""
+    with open(_BULK_METADATA_PATH, 'wb') as f:
+        f.write(orjson.dumps(metadata))
+
+
+def _download_bulk_json(url: str, destination: str, headers: dict, metadata: dict) -> None:
     """
-    Load and parse Scryfall bulk JSON into a card dictionary.
+    Stream a bulk file to disk, resuming an interrupted download if possible.
+    
+    The body is saved exactly as transferred (gzip when the server agrees)
+    into a .part file, so a Range request can continue it byte for byte.
+    Once complete it is stored compressed or decompressed to match the
+    destination name, then renamed into place.
+    
+    Args:
+        url: Bulk file download URI
+        destination: Final path; a .gz suffix keeps the file compressed
+        headers: Base request headers
+        metadata: Bulk metadata, updated with the download state
+    """
+    import requests
+    
+    part_path = f"{destination}.part"
+    state = metadata.get('download', {})
+    request_headers = dict(headers)
+    
+    resume_from = 0
+    if state.get('uri') == url and state.get('validator') and os.path.exists(part_path):
+        resume_from = os.path.getsize(part_path)
+        request_headers['Range'] = f"bytes={resume_from}-"
+        request_headers['If-Range'] = state['validator']
+    
+    with requests.get(url, headers=request_headers, stream=True, timeout=_HTTP_TIMEOUT) as response:
+        restart = response.status_code == 416
+        if response.status_code == 206:
+            # Appending anything but the rest of the same encoding would
+            # corrupt the file without an error
+            content_range = response.headers.get('Content-Range', '')
+            encoding = response.headers.get('Content-Encoding', 'identity')
+            if not content_range.startswith(f"bytes {resume_from}-") or encoding != state.get('encoding'):
+                logging.warning(
+                    f"Resumed download does not continue the partial file "
+                    f"(range '{content_range}', encoding {encoding}), starting over"
+                )
+                restart = True
+        if restart:
+            # Partial file does not match the server copy, start over
+            os.remove(part_path)
+            metadata.pop('download', None)
+            return _download_bulk_json(url, destination, headers, metadata)
+        response.raise_for_status()
+        
+        if response.status_code == 206:
+            logging.info(f"Resuming download at {resume_from / 1e6:.1f} MB")
+        else:
+            resume_from = 0
+            state = {
+                'uri': url,
+                'validator': response.headers.get('ETag') or response.headers.get('Last-Modified'),
+                'encoding': response.headers.get('Content-Encoding', 'identity'),
+            }
+            metadata['download'] = state
+            _write_bulk_metadata(metadata)
+        
+        with open(part_path, 'ab' if resume_from else 'wb') as out_file:
+            for chunk in response.raw.stream(_DOWNLOAD_CHUNK_SIZE, decode_content=False):
+                out_file.write(chunk)
+    
+    is_gzip = state.get('encoding') == 'gzip'
+    keep_compressed = destination.endswith('.gz')
+    
+    if is_gzip == keep_compressed:
+        os.replace(part_path, destination)
+        return
+    
+    # Convert between the transferred and the stored encoding
+    temp_path = f"{destination}.tmp"
+    try:
+        source = gzip.open(part_path, 'rb') if is_gzip else open(part_path, 'rb')
+        target = gzip.open(temp_path, 'wb') if keep_compressed else open(temp_path, 'wb')
+        with source, target:
+            shutil.copyfileobj(source, target, _DOWNLOAD_CHUNK_SIZE)
+        os.replace(temp_path, destination)
+        os.remove(part_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _open_bulk_json(filepath: str) -> BinaryIO:
+    """Open a bulk JSON file for binary reading, decompressing .gz files."""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, 'rb')
+    return open(filepath, 'rb')
+
+
+def load_card_dictionary(config: Config) -> CardIndex:
+    """
+    Load the card index for the configured Scryfall bulk JSON.
+    
+    The index is built once per bulk file and memory-mapped on later runs,
+    so only the records that are looked up are ever decoded.
     
     Args:
         config: Configuration object with bulk_json_path
         
     Returns:
-        Dictionary mapping card keys to card data
+        Read-only mapping of card keys to card data
     """
     filepath = config.bulk_json_path
-    parts = filepath.split('/')
-    parsed_path = f"{parts[0]}/parsed_{parts[-1]}"
+    index_path = card_index_path(filepath)
     
-    print(parsed_path)
+    print(index_path)
     
-    # Try loading pre-parsed data first
-    if os.path.exists(parsed_path):
-        return _load_parsed_json(parsed_path)
+    # Try opening a pre-built index first
+    if os.path.exists(index_path):
+        return CardIndex(index_path, _decode_card_record)
+    
+    # Convert a parsed JSON cache left by older versions
+    parts = filepath.split('/')
+    legacy_path = f"{parts[0]}/parsed_{parts[-1]}"
+    if os.path.exists(legacy_path):
+        card_dict = _load_parsed_json(legacy_path)
+        write_card_index(index_path, (
+            (key, _encode_card_record(value)) for key, value in card_dict.items()
+            if not key.endswith(('_A', '_B'))
+        ))
+        os.remove(legacy_path)
+        return CardIndex(index_path, _decode_card_record)
+    
+    # Update from the index of an earlier bulk file if there is one
+    previous_path = _find_previous_index(index_path)
+    if previous_path is not None:
+        from .image_processor import remove_cached_images
+        
+        update = update_card_index(filepath, previous_path, index_path)
+        remove_cached_images(update.stale_images)
+        retire_bulk_files(filepath)
+        return CardIndex(index_path, _decode_card_record)
     
     # Parse raw bulk JSON
-    return _parse_bulk_json(filepath, parsed_path)
+    return _parse_bulk_json(filepath, index_path)
+
+
+def card_index_path(bulk_json_path: str) -> str:
+    """Return the card index path belonging to a bulk JSON file."""
+    directory, filename = os.path.split(bulk_json_path)
+    filename = filename.removesuffix('.gz')
+    return os.path.join(directory, f"parsed_{os.path.splitext(filename)[0]}.idx")
+
+
+def _sources_path(index_path: str) -> str:
+    """Return the path of the source fingerprint table kept next to an index."""
+    return f"{os.path.splitext(index_path)[0]}.src"
+
+
+def _names_path(index_path: str) -> str:
+    """Return the path of the card name index kept next to an index."""
+    return f"{os.path.splitext(index_path)[0]}.names"
+
+
+def _find_previous_index(index_path: str) -> Optional[str]:
+    """Find the newest other index in the same directory that can be updated."""
+    directory = os.path.dirname(index_path)
+    candidates = [
+        path for path in glob.glob(os.path.join(glob.escape(directory), 'parsed_*.idx'))
+        if path != index_path and os.path.exists(_sources_path(path))
+    ]
+    return max(candidates, key=os.path.getmtime, default=None)
+
+
+def update_card_index(filepath: str, previous_path: str, index_path: str) -> IndexUpdate:
+    """
+    Build the index for a new bulk file from the index of an earlier one.
+    
+    Each card object in the bulk file is fingerprinted with its volatile
+    fields (prices, rankings) removed. Cards whose fingerprint is already
+    in the previous index reuse its records without being decoded, so only
+    added and changed cards are parsed.
+    
+    Args:
+        filepath: Path to the new bulk JSON file
+        previous_path: Path to the index of an earlier bulk file
+        index_path: Destination index path
+        
+    Returns:
+        IndexUpdate describing added, removed and changed records
+    """
+    update_start = perf_counter()
+    update = IndexUpdate()
+    
+    with open(_sources_path(previous_path), 'rb') as f:
+        previous_sources = {bytes.fromhex(fingerprint): keys for fingerprint, keys in orjson.loads(f.read()).items()}
+    
+    logging.info(f"Updating card index from {previous_path}")
+    
+    with CardIndex(previous_path) as previous:
+        spans = previous.record_spans()
+        
+        def records() -> Iterator[tuple[bytes, str, bytes]]:
+            for fingerprint, card in _iter_bulk_objects(filepath, previous_sources):
+                if card is None:
+                    # Unchanged card object, copy its records
+                    update.unchanged += 1
+                    for key in previous_sources[fingerprint]:
+                        yield fingerprint, key, previous.read_span(spans[key])
+                    continue
+                
+                parsed = {}
+                for key in _parse_card(card, parsed):
+                    record = _encode_card_record(parsed[key])
+                    if key not in spans:
+                        update.added.append(key)
+                    else:
+                        previous_record = previous.read_span(spans[key])
+                        if previous_record != record:
+                            update.changed.append(key)
+                            previous_images = _image_keys(key, _decode_card_record(key, previous_record))
+                            for image_key, image_uris in _image_keys(key, parsed[key]).items():
+                                if previous_images.get(image_key) != image_uris:
+                                    update.stale_images.append(image_key)
+                    yield fingerprint, key, record
+        
+        sources = _SourceTable(records())
+        names = _NameTable(sources)
+        count = write_card_index(index_path, names)
+        sources.write(_sources_path(index_path))
+        names.write(_names_path(index_path))
+        update.removed = [key for key in spans if key not in sources.keys]
+    
+    logging.info(
+        f"Indexed {count} cards in {perf_counter() - update_start:.2f} seconds: "
+        f"{len(update.added)} added, {len(update.changed)} changed, {len(update.removed)} removed, "
+        f"{update.unchanged} card objects unchanged"
+    )
+    if update.stale_images:
+        logging.info(f"Image URIs changed for {len(update.stale_images)} cards: {', '.join(update.stale_images)}")
+    return update
+
+
+def retire_bulk_files(filepath: str) -> list[str]:
+    """
+    Remove bulk JSON files and indexes superseded by the given bulk file.
+    
+    Only files of the same bulk type (e.g. default-cards-*) in the same
+    directory are removed.
+    
+    Args:
+        filepath: Path to the current bulk JSON file
+        
+    Returns:
+        Paths of the removed files
+    """
+    directory, filename = os.path.split(filepath)
+    prefix = filename.rsplit('-', 1)[0]
+    index_path = card_index_path(filepath)
+    keep = {filepath, index_path, _sources_path(index_path), _names_path(index_path)}
+    
+    removed = []
+    for pattern in (f"{prefix}-*", f"parsed_{prefix}-*"):
+        for path in glob.glob(os.path.join(glob.escape(directory), pattern)):
+            if path not in keep and not path.endswith(('.tmp', '.part')):
+                os.remove(path)
+                removed.append(path)
+    
+    if removed:
+        logging.info(f"Retired superseded bulk files: {', '.join(removed)}")
+    return removed
+
+
+def prepare_card_data(config: Config) -> None:
+    """
+    Build, update or open the card and name indexes for a bulk JSON file.
+    
+    Meant to run in the background while the user answers prompts, so the
+    later load_card_records call finds both indexes ready and only reads
+    the records a decklist needs.
+    
+    Args:
+        config: Configuration object with bulk_json_path
+    """
+    prepare_start = perf_counter()
+    load_card_dictionary(config).close()
+    load_name_index(config).close()
+    logging.info(f"Card index for {config.bulk_json_path} ready in {perf_counter() - prepare_start:.2f} seconds")
+
+
+def collect_decklist_keys(filepath: str) -> dict[str, list[int]]:
+    """
+    Pre-scan a decklist for the card keys it needs.
+    
+    Covers normal lines, "||" composite faces and "!"/"!!" forced sides.
+    Custom cards need no card data and are skipped, as are malformed lines,
+    which read_decklist reports with full context.
+    
+    Args:
+        filepath: Path to the decklist file
+        
+    Returns:
+        Dictionary mapping card keys to the line numbers that use them
+    """
+    keys: dict[str, list[int]] = {}
+    
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if line.startswith("#") or line == "" or " " not in line:
+                continue
+            
+            card_line = line[line.index(" ") + 1:].strip()
+            faces = card_line.split("||") if "|" in card_line else [card_line]
+            
+            for face in faces:
+                face = face.strip()
+                if face.startswith("*"):
+                    continue
+                try:
+                    key = _decklist_line_key(face)
+                except ValueError:
+                    continue
+                keys.setdefault(key, []).append(line_number)
+    
+    return keys
+
+
+def load_card_records(config: Config, keys: Iterable[str]) -> dict[str, dict]:
+    """
+    Load only the card records named by a set of keys.
+    
+    Records come from the card index, which is built first if this bulk
+    file has none yet. If the index cannot be written, the raw bulk JSON is
+    scanned instead and only the wanted cards are parsed.
+    
+    Name lookups (keys starting with NAME_KEY_PREFIX) are resolved to a
+    printing with the configured name_preference and stored under both the
+    lookup key and the card key.
+    
+    Args:
+        config: Configuration object with bulk_json_path
+        keys: Card keys to load, as returned by collect_decklist_keys
+        
+    Returns:
+        Dictionary mapping the found keys to card data
+    """
+    wanted = set(keys)
+    names = {key[len(NAME_KEY_PREFIX):] for key in wanted if key.startswith(NAME_KEY_PREFIX)}
+    
+    try:
+        index = load_card_dictionary(config)
+    except FileNotFoundError:
+        raise
+    except OSError as e:
+        logging.warning(f"Card index unavailable ({e}), scanning {config.bulk_json_path} directly")
+        return _scan_bulk_json(config.bulk_json_path, wanted, names, config.name_preference)
+    
+    with index:
+        resolved = resolve_card_names(config, names) if names else {}
+        records = {key: index[key] for key in wanted | set(resolved.values()) if key in index}
+    
+    for name, key in resolved.items():
+        records[f"{NAME_KEY_PREFIX}{name}"] = records[key]
+    return records
+
+
+def resolve_card_names(config: Config, names: Iterable[str]) -> dict[str, str]:
+    """
+    Pick a printing for each card name using the name index.
+    
+    Args:
+        config: Configuration object with bulk_json_path and name_preference
+        names: Card names, normalized with normalize_card_name
+        
+    Returns:
+        Dictionary mapping each found name to the chosen card key
+    """
+    resolved = {}
+    with load_name_index(config) as name_index:
+        for name in names:
+            if name in name_index:
+                resolved[name] = _choose_printing(name_index[name], config.name_preference)
+    return resolved
+
+
+def load_name_index(config: Config) -> CardIndex:
+    """
+    Open the name index for the configured bulk JSON.
+    
+    The name index maps normalized card names, including each face of
+    double-faced and split cards, to their candidate printings. It is
+    written alongside the card index and rebuilt from it if missing.
+    
+    Args:
+        config: Configuration object with bulk_json_path
+        
+    Returns:
+        Read-only mapping of normalized names to [key, released_at,
+        border_color, frame] candidates
+    """
+    names_path = _names_path(card_index_path(config.bulk_json_path))
+    
+    if not os.path.exists(names_path):
+        with load_card_dictionary(config) as index:
+            if not os.path.exists(names_path):
+                logging.info(f"Building name index {names_path}")
+                spans = index.record_spans()
+                names = _NameTable((key, index.read_span(span)) for key, span in spans.items())
+                for _ in names:
+                    pass
+                names.write(names_path)
+    
+    return CardIndex(names_path)
+
+
+def normalize_card_name(name: str) -> str:
+    """Normalize a card name for lookups: case, accents and spacing are ignored."""
+    decomposed = unicodedata.normalize('NFKD', name.replace('Æ', 'Ae').replace('æ', 'ae'))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+# Frame versions from oldest to newest, for the modern_frame preference
+_FRAME_ORDER = {'1993': 0, '1997': 1, 'future': 1, '2003': 2, '2015': 3}
+
+
+def _choose_printing(candidates: list[list[str]], preference: str) -> str:
+    """
+    Choose one printing from name index candidates.
+    
+    Args:
+        candidates: [key, released_at, border_color, frame] entries
+        preference: newest / oldest / black_border / modern_frame
+        
+    Returns:
+        Key of the chosen printing
+    """
+    if preference == 'newest':
+        return max(candidates, key=lambda c: (c[1], c[0]))[0]
+    if preference == 'oldest':
+        return min(candidates, key=lambda c: (c[1], c[0]))[0]
+    if preference == 'black_border':
+        return max(candidates, key=lambda c: (c[2] == 'black', c[1], c[0]))[0]
+    if preference == 'modern_frame':
+        return max(candidates, key=lambda c: (_FRAME_ORDER.get(c[3], 0), c[1], c[0]))[0]
+    raise ValueError(f"Unknown name preference: {preference}")
+
+
+def check_card_records(keys: dict[str, list[int]], card_data: Mapping[str, dict], filepath: str) -> None:
+    """
+    Report every decklist key missing from the card data at once.
+    
+    Args:
+        keys: Card keys and line numbers from collect_decklist_keys
+        card_data: Loaded card records
+        filepath: Decklist path, for the error message
+        
+    Raises:
+        KeyError: If any key is missing
+    """
+    missing = [key for key in keys if key not in card_data]
+    if not missing:
+        return
+    
+    for key in missing:
+        lines = ', '.join(str(number) for number in keys[key])
+        label = key.removeprefix(NAME_KEY_PREFIX)
+        logging.error(f"Card {label} on line {lines} of {filepath} not found in card data")
+    raise KeyError(
+        f"{len(missing)} card(s) in {filepath} not found in card data. "
+        "Please check the decklist format or the card data."
+    )
+
+
+def _scan_bulk_json(filepath: str, wanted: set[str], names: set[str], preference: str) -> dict[str, dict]:
+    """Parse only the wanted cards, and printings of the wanted names, from a raw bulk JSON file."""
+    card_dict = {}
+    candidates = _NameTable(())
+    
+    for card in _iter_bulk_cards(filepath):
+        key = f"{card['set'].lower()}-{card['collector_number']}"
+        card_names = {normalize_card_name(name) for name in (card['name'], *card['name'].split(' // '))}
+        named = not card_names.isdisjoint(names)
+        if key in wanted or named:
+            # Art series and unknown layouts add no record
+            for parsed_key in _parse_card(card, card_dict):
+                if named:
+                    candidates.add(parsed_key, card_dict[parsed_key])
+    
+    for name in names:
+        if name in candidates.names:
+            card_dict[f"{NAME_KEY_PREFIX}{name}"] = card_dict[_choose_printing(candidates.names[name], preference)]
+    
+    logging.info(f"Loaded {len(card_dict)} records from {filepath}")
+    return card_dict
 
 
 def _load_parsed_json(filepath: str) -> dict:
@@ -98,47 +632,244 @@ def _load_parsed_json(filepath: str) -> dict:
         raise
 
 
-def _parse_bulk_json(filepath: str, parsed_path: str) -> dict:
-    """Parse raw Scryfall bulk JSON and cache the result."""
-    card_dict = {}
+def _parse_bulk_json(filepath: str, index_path: str) -> CardIndex:
+    """
+    Parse raw Scryfall bulk JSON into a card index.
     
+    Cards are decoded one at a time from the top-level array and each parsed
+    record is appended to the index as soon as it is produced, so peak memory
+    is bounded by the key table rather than the raw bulk file.
+    """
     print(f"Loading unparsed bulk JSON from {filepath}...")
     
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            print("Parsing JSON...")
-            data = orjson.loads(f.read())
-            
-            for card in data:
-                key = f"{card['set'].lower()}-{card['collector_number']}"
-                
-                if card['layout'] in {'transform', 'modal_dfc', 'double_faced_token', 'reversible_card'}:
-                    _parse_double_faced_card(card, key, card_dict)
-                elif card['layout'] in _SINGLE_FACED_LAYOUTS:
-                    _parse_single_faced_card(card, key, card_dict)
-                elif card['layout'] != 'art_series':
-                    print(f"Unknown layout {card['layout']} for card {card['name']}")
-            
-            # Cache parsed data
-            with open(parsed_path, 'w', encoding='utf-8') as out:
-                out.write(orjson.dumps(card_dict).decode())
-            
-            print(f"Parsed {len(card_dict)} cards from {filepath}")
+        print("Parsing JSON...")
+        sources = _SourceTable(_iter_parsed_records(filepath))
+        names = _NameTable(sources)
+        count = write_card_index(index_path, names)
+        sources.write(_sources_path(index_path))
+        names.write(_names_path(index_path))
+        print(f"Parsed {count} cards from {filepath}")
             
     except orjson.JSONDecodeError:
         logging.error(f"Invalid JSON format in {filepath}")
         raise
     except MemoryError as e:
-        logging.error(f"Out of memory while reading {filepath}. {len(card_dict)} cards loaded.")
+        logging.error(f"Out of memory while reading {filepath}")
         raise
     except FileNotFoundError:
         logging.error(f"File not found at {filepath}")
         raise
     
-    logging.info(f"Loaded {len(card_dict)} cards from {filepath}")
-    return card_dict
+    logging.info(f"Loaded {count} cards from {filepath}")
+    return CardIndex(index_path, _decode_card_record)
+
+
+def _iter_parsed_records(filepath: str) -> Iterator[tuple[bytes, str, bytes]]:
+    """Yield (source fingerprint, key, encoded record) for every card in a bulk JSON file."""
+    for fingerprint, card in _iter_bulk_objects(filepath, frozenset()):
+        parsed = {}
+        for key in _parse_card(card, parsed):
+            yield fingerprint, key, _encode_card_record(parsed[key])
+
+
+class _SourceTable:
+    """
+    Pass (key, record) pairs through to write_card_index while remembering
+    which card object, by source fingerprint, produced each key.
+    """
+    
+    def __init__(self, records: Iterable[tuple[bytes, str, bytes]]):
+        self._records = records
+        self.sources: dict[bytes, list[str]] = {}
+        self.keys: set[str] = set()
+    
+    def __iter__(self) -> Iterator[tuple[str, bytes]]:
+        for fingerprint, key, record in self._records:
+            self.sources.setdefault(fingerprint, []).append(key)
+            self.keys.add(key)
+            yield key, record
+    
+    def write(self, path: str) -> None:
+        """Save the fingerprint table for the next incremental update."""
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps({fingerprint.hex(): keys for fingerprint, keys in self.sources.items()}))
+
+
+class _NameTable:
+    """
+    Pass (key, record) pairs through to write_card_index while collecting
+    the name index: normalized card name -> candidate printings.
+    """
+    
+    def __init__(self, records: Iterable[tuple[str, bytes]]):
+        self._records = records
+        self.names: dict[str, list[list[str]]] = {}
+    
+    def __iter__(self) -> Iterator[tuple[str, bytes]]:
+        for key, record in self._records:
+            # Face records of older indexes are covered by their card's "A // B" name
+            if not key.endswith(('_A', '_B')):
+                self.add(key, _decode_card_record(key, record))
+            yield key, record
+    
+    def add(self, key: str, data: dict) -> None:
+        """Index a card under its full name and each of its face names."""
+        candidate = [key, data.get('released_at', ''), data['border_color'], data.get('frame', '')]
+        names = {data['name'], *data['name'].split(' // ')}
+        for name in names:
+            self.names.setdefault(normalize_card_name(name), []).append(candidate)
+    
+    def write(self, path: str) -> None:
+        """Save the name index as a card index keyed by normalized name."""
+        write_card_index(path, ((name, orjson.dumps(candidates)) for name, candidates in self.names.items()))
+
+
+# Bytes read from the bulk file per iteration of the streaming parser
+_READ_CHUNK_SIZE = 1 << 20
+
+# Candidate end of a top-level card: a closing brace followed by the separator
+# to the next object or the end of the array. Nested objects and braces inside
+# strings can match too, so every candidate is confirmed by decoding it.
+_OBJECT_END = re.compile(rb'}(?=\s*(?:,\s*{|]))')
+
+
+# Prices and rankings change in nearly every bulk file without affecting the
+# parsed record. They are left out of source fingerprints so daily updates
+# do not force a card to be decoded again. Scryfall writes prices as a flat
+# object and ranks as integers.
+_VOLATILE_FIELDS = re.compile(rb'"prices":\{[^}]*\}|"(?:edhrec_rank|penny_rank)":\d+')
+
+
+def _card_fingerprint(raw: bytes) -> bytes:
+    """Fingerprint a raw card object, ignoring its prices and rankings."""
+    digest = hashlib.blake2b(digest_size=16)
+    view = memoryview(raw)
+    
+    position = 0
+    for match in _VOLATILE_FIELDS.finditer(raw):
+        digest.update(view[position:match.start()])
+        position = match.end()
+    digest.update(view[position:])
+    
+    return digest.digest()
+
+
+def _iter_bulk_cards(filepath: str) -> Iterator[dict]:
+    """
+    Yield card objects from a Scryfall bulk JSON array one at a time.
+    
+    Args:
+        filepath: Path to the bulk JSON file
+        
+    Yields:
+        Decoded card dictionaries in file order
+    """
+    for _, card in _iter_bulk_objects(filepath):
+        yield card
+
+
+def _iter_bulk_objects(
+    filepath: str,
+    known: Optional[Container[bytes]] = None
+) -> Iterator[tuple[Optional[bytes], Optional[dict]]]:
+    """
+    Yield card objects from a Scryfall bulk JSON array one at a time.
+    
+    The file is read in binary chunks and only the bytes of the card being
+    decoded are kept, so memory use does not depend on the file size.
+    
+    Args:
+        filepath: Path to the bulk JSON file
+        known: Source fingerprints to skip decoding for. When given, every
+            card is fingerprinted; cards whose fingerprint is known are
+            yielded without being decoded.
+        
+    Yields:
+        (fingerprint, card) pairs in file order. The fingerprint is None
+        when known is None; the card is None when its fingerprint is known.
+        
+    Raises:
+        orjson.JSONDecodeError: If the file ends inside a card object
+    """
+    buffer = bytearray()
+    start = -1
+    search_from = 0
+    
+    with _open_bulk_json(filepath) as f:
+        while True:
+            chunk = f.read(_READ_CHUNK_SIZE)
+            buffer += chunk
+            
+            while True:
+                if start < 0:
+                    start = buffer.find(b'{', search_from)
+                    if start < 0:
+                        search_from = len(buffer)
+                        break
+                    search_from = start
+                
+                match = _OBJECT_END.search(buffer, search_from)
+                if match is None:
+                    break
+                
+                search_from = match.end()
+                raw = bytes(buffer[start:search_from])
+                fingerprint = None
+                card = None
+                
+                if known is not None:
+                    # A known fingerprint can only come from a complete card
+                    fingerprint = _card_fingerprint(raw)
+                if fingerprint is None or fingerprint not in known:
+                    try:
+                        card = orjson.loads(raw)
+                    except orjson.JSONDecodeError:
+                        continue  # Brace of a nested object, keep scanning
+                
+                start = -1
+                yield fingerprint, card
+            
+            if not chunk:
+                break
+            
+            # Drop bytes that belong to already decoded cards
+            consumed = start if start >= 0 else search_from
+            del buffer[:consumed]
+            search_from -= consumed
+            if start >= 0:
+                start = 0
+    
+    if start >= 0:
+        raise orjson.JSONDecodeError(
+            f"Unexpected end of file inside a card object in {filepath}",
+            buffer[:80].decode('utf-8', 'replace'),
+            0
+        )
 
 
+def _parse_card(card: dict, card_dict: dict) -> list[str]:
+    """
+    Parse one Scryfall card object into the dictionary.
+    
+    Returns:
+        Keys added to card_dict, in the order they were added
+    """
+    key = f"{card['set'].lower()}-{card['collector_number']}"
+    
+    if card['layout'] in _DOUBLE_FACED_LAYOUTS:
+        _parse_double_faced_card(card, key, card_dict)
+        return [key]
+    if card['layout'] in _SINGLE_FACED_LAYOUTS:
+        _parse_single_faced_card(card, key, card_dict)
+        return [key]
+    if card['layout'] != 'art_series':
+        print(f"Unknown layout {card['layout']} for card {card['name']}")
+    return []
+
+
+_DOUBLE_FACED_LAYOUTS = {'transform', 'modal_dfc', 'double_faced_token', 'reversible_card'}
+
 _SINGLE_FACED_LAYOUTS = {
     'normal', 'token', 'split', 'layout', 'flip', 'mutate', 'adventure',
     'emblem', 'scheme', 'vanguard', 'planar', 'phenomenon', 'saga',
@@ -148,17 +879,16 @@ _SINGLE_FACED_LAYOUTS = {
 
 def _parse_double_faced_card(card: dict, key: str, card_dict: dict) -> None:
     """Parse a double-faced card into the dictionary."""
-    side = 'A'
-    for face in card['card_faces']:
-        card_dict[f"{key}_{side}"] = {
+    faces = []
+    for side, face in zip('AB', card['card_faces']):
+        faces.append({
             'name': face['name'],
             'image_uris': face['image_uris'],
             'layout': card['layout'],
             'two_sided': True,
             'other_face': f"{key}_{'B' if side == 'A' else 'A'}",
             'border_color': card['border_color']
-        }
-        side = 'B'
+        })
     
     card_dict[key] = {
         'name': card['name'],
@@ -166,8 +896,10 @@ def _parse_double_faced_card(card: dict, key: str, card_dict: dict) -> None:
         'collector_number': card['collector_number'],
         'layout': card['layout'],
         'two_sided': True,
-        'faces': [card_dict[f"{key}_A"], card_dict[f"{key}_B"]],
-        'border_color': card['border_color']
+        'faces': faces,
+        'border_color': card['border_color'],
+        'released_at': card.get('released_at', ''),
+        'frame': card.get('frame', '')
     }
 
 
@@ -180,17 +912,154 @@ def _parse_single_faced_card(card: dict, key: str, card_dict: dict) -> None:
         'image_uris': card['image_uris'],
         'layout': card['layout'],
         'two_sided': False,
-        'border_color': card['border_color']
+        'border_color': card['border_color'],
+        'released_at': card.get('released_at', ''),
+        'frame': card.get('frame', '')
+    }
+
+
+# Codes for repeated record strings. Append only: stored indexes refer to
+# these positions, and values missing here are stored as plain strings.
+_LAYOUT_CODES = (
+    'normal', 'transform', 'modal_dfc', 'double_faced_token', 'reversible_card',
+    'token', 'split', 'layout', 'flip', 'mutate', 'adventure', 'emblem', 'scheme',
+    'vanguard', 'planar', 'phenomenon', 'saga', 'augment', 'leveler', 'prototype',
+    'host', 'case', 'class', 'meld'
+)
+_BORDER_CODES = ('black', 'white', 'borderless', 'silver', 'gold', 'yellow')
+_FRAME_CODES = ('1993', '1997', '2003', '2015', 'future')
+
+_IMAGE_HOST = 'https://cards.scryfall.io/'
+_IMAGE_TYPES = ('small', 'normal', 'large', 'png', 'art_crop', 'border_crop')
+
+
+def _encode_code(value: str, codes: tuple[str, ...]) -> Union[int, str]:
+    """Replace a known string with its position in a code table."""
+    try:
+        return codes.index(value)
+    except ValueError:
+        return value
+
+
+def _encode_image_uris(image_uris: dict) -> Union[str, dict]:
+    """
+    Encode Scryfall image URIs as the path they share.
+    
+    Every image type of one face differs only in the type directory and the
+    file extension, e.g. ".../normal/front/a/b/<id>.jpg?<timestamp>". URIs
+    that do not follow that layout are kept as they are.
+    """
+    normal = image_uris.get('normal', '')
+    if not normal.startswith(f"{_IMAGE_HOST}normal/"):
+        return image_uris
+    
+    path, _, query = normal[len(_IMAGE_HOST) + len('normal/'):].partition('.jpg')
+    encoded = f"{path}{query}"
+    if _decode_image_uris(encoded) != image_uris:
+        return image_uris
+    return encoded
+
+
+def _decode_image_uris(encoded: Union[str, dict]) -> dict:
+    """Rebuild the image URIs written by _encode_image_uris."""
+    if isinstance(encoded, dict):
+        return encoded
+    
+    path, separator, query = encoded.partition('?')
+    return {
+        image_type: f"{_IMAGE_HOST}{image_type}/{path}.{'png' if image_type == 'png' else 'jpg'}{separator}{query}"
+        for image_type in _IMAGE_TYPES
+    }
+
+
+def _encode_card_record(record: dict) -> bytes:
+    """
+    Encode a parsed card record for the card index.
+    
+    Records are stored as arrays instead of objects, with layout, border
+    color and frame replaced by codes and image URIs reduced to the path
+    they share. Set code and collector number are taken from the key, and
+    double-faced cards keep only each face's name and image; the rest of
+    the face record is rebuilt from the card by _decode_card_record.
+    
+    Layout: [name, layout, border_color, released_at, frame, images], where
+    images is the encoded image URIs of a single-faced card or a list of
+    [face name, encoded image URIs] per face.
+    """
+    if 'faces' in record:
+        images = [[face['name'], _encode_image_uris(face['image_uris'])] for face in record['faces']]
+    else:
+        images = _encode_image_uris(record['image_uris'])
+    
+    return orjson.dumps([
+        record['name'],
+        _encode_code(record['layout'], _LAYOUT_CODES),
+        _encode_code(record['border_color'], _BORDER_CODES),
+        record.get('released_at', ''),
+        _encode_code(record.get('frame', ''), _FRAME_CODES),
+        images,
+    ])
+
+
+def _decode_card_record(key: str, encoded: bytes) -> dict:
+    """
+    Decode a card index record into the parsed card dictionary format.
+    
+    Records written as plain JSON objects by earlier versions are returned
+    as they are.
+    """
+    data = orjson.loads(encoded)
+    if isinstance(data, dict):
+        return data
+    
+    name, layout, border_color, released_at, frame, images = data
+    layout = _LAYOUT_CODES[layout] if isinstance(layout, int) else layout
+    border_color = _BORDER_CODES[border_color] if isinstance(border_color, int) else border_color
+    set_code, _, collector_number = key.partition('-')
+    
+    record = {
+        'name': name,
+        'set': set_code,
+        'collector_number': collector_number,
+        'layout': layout,
+        'two_sided': isinstance(images, list),
+        'border_color': border_color,
+        'released_at': released_at,
+        'frame': _FRAME_CODES[frame] if isinstance(frame, int) else frame,
     }
+    
+    if isinstance(images, list):
+        record['faces'] = [
+            {
+                'name': face_name,
+                'image_uris': _decode_image_uris(face_images),
+                'layout': layout,
+                'two_sided': True,
+                'other_face': f"{key}_{'B' if side == 'A' else 'A'}",
+                'border_color': border_color
+            }
+            for side, (face_name, face_images) in zip('AB', images)
+        ]
+    else:
+        record['image_uris'] = _decode_image_uris(images)
+    
+    return record
+
+
+def _image_keys(key: str, record: dict) -> dict[str, dict]:
+    """Map the image cache keys of a card record to their image URIs."""
+    if 'faces' in record:
+        return {f"{key}_{side}": face['image_uris'] for side, face in zip('AB', record['faces'])}
+    return {key: record.get('image_uris')}
 
 
-def card_data_lookup(decklist_line: str, card_data: dict) -> dict:
+def card_data_lookup(decklist_line: str, card_data: Mapping[str, dict]) -> dict:
     """
     Look up card data from a decklist line.
     
     Args:
-        decklist_line: Line from decklist in format "Name (SET) number"
-        card_data: Card dictionary from load_card_dictionary
+        decklist_line: Line from decklist in format "Name (SET) number" or "Name"
+        card_data: Card dictionary from load_card_dictionary or load_card_records
         
     Returns:
         Dictionary with card info including image_uris
@@ -198,9 +1067,7 @@ def card_data_lookup(decklist_line: str, card_data: dict) -> dict:
     Raises:
         KeyError: If card not found in data
     """
-    set_symbol = decklist_line[decklist_line.index("(") + 1:decklist_line.index(")")].lower()
-    set_number = decklist_line[len(decklist_line) - decklist_line[::-1].index(" "):].strip()
-    key = f"{set_symbol}-{set_number}"
+    key = _decklist_line_key(decklist_line)
     
     # Handle forced side markers
     force_side = 0
@@ -219,8 +1086,20 @@ def card_data_lookup(decklist_line: str, card_data: dict) -> dict:
             "Please check the decklist format or the card data."
         )
     
+    if key.startswith(NAME_KEY_PREFIX):
+        # Name-only line, resolved to a printing by load_card_records
+        key = f"{data['set'].lower()}-{data['collector_number']}"
+        name = decklist_line
+    else:
+        name = decklist_line[:decklist_line.index("(") - 1]
+    
+    return _card_entry(key, name, data, force_side)
+
+
+def _card_entry(key: str, name: str, data: dict, force_side: int = 0) -> dict:
+    """Build the decklist entry of a card record, as card_data_lookup returns it."""
     return {
-        'name': decklist_line[:decklist_line.index("(") - 1],
+        'name': name,
         'key': key if force_side == 0 else f"{key}_{'A' if force_side == 1 else 'B'}",
         'black_border': data['border_color'] == "black",
         'force_side': force_side,
@@ -229,7 +1108,25 @@ def card_data_lookup(decklist_line: str, card_data: dict) -> dict:
     }
 
 
-def read_decklist(filepath: str, card_data: dict, config: Config) -> list[dict]:
+def _decklist_line_key(decklist_line: str) -> str:
+    """
+    Build the card key from a decklist line in format "Name (SET) number".
+    
+    Lines without a set code become a name lookup key: NAME_KEY_PREFIX
+    followed by the normalized card name.
+    
+    Raises:
+        ValueError: If the line has a set code but no collector number
+    """
+    if "(" not in decklist_line:
+        return f"{NAME_KEY_PREFIX}{normalize_card_name(decklist_line.lstrip('!'))}"
+    
+    set_symbol = decklist_line[decklist_line.index("(") + 1:decklist_line.index(")")].lower()
+    set_number = decklist_line[len(decklist_line) - decklist_line[::-1].index(" "):].strip()
+    return f"{set_symbol}-{set_number}"
+
+
+def read_decklist(filepath: str, card_data: Mapping[str, dict], config: Config) -> list[dict]:
     """
     Read and parse a decklist file.
     
@@ -279,7 +1176,47 @@ def read_decklist(filepath: str, card_data: dict, config: Config) -> list[dict]:
     return decklist
 
 
-def _parse_composite_card(card_line: str, copies: int, card_data: dict) -> dict:
+def decklist_from_keys(keys: Iterable[str], card_data: Mapping[str, dict], config: Config) -> list[dict]:
+    """
+    Build decklist entries for card keys, as if each were a decklist line
+    with one copy.
+    
+    Args:
+        keys: Card keys such as "m11-149"
+        card_data: Records of those keys, from load_card_records
+        config: Configuration object
+        
+    Returns:
+        List of decklist entries
+        
+    Raises:
+        KeyError: If a key has no record
+    """
+    decklist = []
+    for key in keys:
+        data = card_data[key]
+        entry = _card_entry(key, data['name'], data)
+        entry.update({'copies': 1, 'composite': False, 'two_sided': False, 'custom': False})
+        _add_to_decklist(entry, decklist, config)
+    return decklist
+
+
+def load_set_keys(config: Config, set_codes: Iterable[str]) -> dict[str, list[str]]:
+    """
+    List the card keys of whole sets from the card index.
+    
+    Args:
+        config: Configuration object with bulk_json_path
+        set_codes: Scryfall set codes, in any case
+        
+    Returns:
+        Dictionary mapping each set code, lowercased, to its card keys
+    """
+    with load_card_dictionary(config) as index:
+        return {code.lower(): list(index.keys_with_prefix(f"{code.lower()}-")) for code in set_codes}
+
+
+def _parse_composite_card(card_line: str, copies: int, card_data: Mapping[str, dict]) -> dict:
     """Parse a composite card with multiple faces."""
     faces = []
     for face in card_line.split("||"):
@@ -313,7 +1250,7 @@ def _parse_custom_card(card_line: str, copies: int) -> dict:
     }
 
 
-def _parse_normal_card(card_line: str, copies: int, card_data: dict, config: Config) -> dict:
+def _parse_normal_card(card_line: str, copies: int, card_data: Mapping[str, dict], config: Config) -> dict:
     """Parse a normal card entry."""
     entry = card_data_lookup(card_line, card_data)
     entry.update({
@@ -354,6 +1291,7 @@ def _add_to_decklist(card_data: dict, decklist: list, config: Config) -> None:
                     'key': f"{card_data['key']}{suffix}",
                     'name': side.get('name', card_data.get('name', '')),
                     'image_uris': side.get('image_uris', {}),
+                    'border_color': side.get('border_color', ''),
                     'custom': False,
                     'two_sided': False,
                 }
@@ -367,6 +1305,7 @@ def _add_to_decklist(card_data: dict, decklist: list, config: Config) -> None:
                     'key': f"{card_data['key']}{suffix}",
                     'name': side.get('name', ''),
                     'image_uris': side.get('image_uris', {}),
+                    'border_color': side.get('border_color', ''),
                     'custom': False,
                     'two_sided': False,
                 }
@@ -0,0 +1,202 @@
+"""
+Decklist to PDF - Binary Card Index
+
+Compact on-disk index over parsed Scryfall card records. The file is opened
+with mmap so startup costs a header read, lookups decode only the records
+they touch, and concurrent processes share the pages through the OS cache.
+
+File layout (little-endian):
+    header       magic, entry count, key blob offset, entry table offset
+    record blob  orjson-encoded card records, in parse order
+    key blob     UTF-8 card keys, in sorted order
+    entry table  (key offset, key length, record offset, record length)
+                 per card, sorted by key for binary search
+"""
+import mmap
+import os
+import struct
+from collections.abc import Callable, Iterable, Iterator, Mapping
+
+import orjson
+
+
+INDEX_MAGIC = b'D2PCIDX1'
+_HEADER = struct.Struct('<8sIQQ')
+_ENTRY = struct.Struct('<IIQI')
+
+
+def decode_json_record(key: str, record: bytes) -> object:
+    """Default record decoder: plain orjson."""
+    return orjson.loads(record)
+
+
+def write_card_index(path: str, records: Iterable[tuple[str, bytes]]) -> int:
+    """
+    Write a card index from a stream of encoded records.
+    
+    Records are appended to the file as they arrive, so only the keys and
+    offsets are held in memory. The index is written to a temporary file and
+    renamed into place once complete.
+    
+    Args:
+        path: Destination index path
+        records: Iterable of (card key, encoded record) pairs
+    
+    Returns:
+        Number of records written
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    entries = []
+    
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(bytes(_HEADER.size))
+            offset = 0
+            for key, record in records:
+                f.write(record)
+                entries.append((key.encode('utf-8'), offset, len(record)))
+                offset += len(record)
+            
+            # Later duplicates replace earlier ones, like dict assignment
+            unique = {key: (rec_offset, rec_length) for key, rec_offset, rec_length in entries}
+            sorted_keys = sorted(unique)
+            
+            key_blob_offset = _HEADER.size + offset
+            key_offset = 0
+            table = bytearray()
+            for key in sorted_keys:
+                rec_offset, rec_length = unique[key]
+                table += _ENTRY.pack(key_offset, len(key), _HEADER.size + rec_offset, rec_length)
+                key_offset += len(key)
+            
+            f.write(b''.join(sorted_keys))
+            f.write(table)
+            
+            f.seek(0)
+            f.write(_HEADER.pack(INDEX_MAGIC, len(sorted_keys), key_blob_offset, key_blob_offset + key_offset))
+        
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    return len(sorted_keys)
+
+
+class CardIndex(Mapping):
+    """Read-only, dict-like view of a card index file."""
+    
+    def __init__(self, path: str, decode: Callable[[str, bytes], object] = decode_json_record):
+        """
+        Open a card index.
+        
+        Args:
+            path: Path to an index written by write_card_index
+            decode: Turns (key, encoded record) into the value returned by
+                lookups, for records stored in a compact encoding
+        
+        Raises:
+            ValueError: If the file is not a card index
+        """
+        self.path = path
+        self._decode = decode
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, self._count, self._key_blob, self._table = _HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a card index")
+    
+    def _entry(self, position: int) -> tuple[int, int, int, int]:
+        """Read the entry table row at a sorted position."""
+        return _ENTRY.unpack_from(self._map, self._table + position * _ENTRY.size)
+    
+    def _key_at(self, position: int) -> bytes:
+        """Read the encoded key at a sorted position."""
+        key_offset, key_length, _, _ = self._entry(position)
+        start = self._key_blob + key_offset
+        return self._map[start:start + key_length]
+    
+    def _lower_bound(self, target: bytes) -> int:
+        """Binary search for the first position whose key is not below target."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def _find(self, key: str) -> int:
+        """Binary search for a key, returning its position or -1."""
+        target = key.encode('utf-8')
+        low = self._lower_bound(target)
+        if low < self._count and self._key_at(low) == target:
+            return low
+        return -1
+    
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        """Iterate in order over the keys starting with prefix, such as every card of a set."""
+        target = prefix.encode('utf-8')
+        for position in range(self._lower_bound(target), self._count):
+            key = self._key_at(position)
+            if not key.startswith(target):
+                return
+            yield key.decode('utf-8')
+    
+    def record_bytes(self, key: str) -> bytes:
+        """
+        Return the encoded record for a key without decoding it.
+        
+        Raises:
+            KeyError: If the key is not in the index
+        """
+        position = self._find(key) if isinstance(key, str) else -1
+        if position < 0:
+            raise KeyError(key)
+        _, _, rec_offset, rec_length = self._entry(position)
+        return self._map[rec_offset:rec_offset + rec_length]
+    
+    def record_spans(self) -> dict[str, tuple[int, int]]:
+        """
+        Read the whole entry table into a dict of key -> (offset, length).
+        
+        One sequential pass is far cheaper than a binary search per key when
+        most of the index is about to be visited, as in an incremental update.
+        """
+        spans = {}
+        for position in range(self._count):
+            key_offset, key_length, rec_offset, rec_length = self._entry(position)
+            start = self._key_blob + key_offset
+            spans[self._map[start:start + key_length].decode('utf-8')] = (rec_offset, rec_length)
+        return spans
+    
+    def read_span(self, span: tuple[int, int]) -> bytes:
+        """Return the encoded record at an (offset, length) from record_spans."""
+        rec_offset, rec_length = span
+        return self._map[rec_offset:rec_offset + rec_length]
+    
+    def __getitem__(self, key: str) -> dict:
+        return self._decode(key, self.record_bytes(key))
+    
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self._count):
+            yield self._key_at(position).decode('utf-8')
+    
+    def close(self) -> None:
+        """Release the memory map."""
+        self._map.close()
+    
+    def __enter__(self) -> 'CardIndex':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
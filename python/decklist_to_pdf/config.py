@@ -127,10 +127,13 @@ def write_config(config: Config, keys: list[str], config_path: str = 'decklist_t
     
     config_comments = {
         'bulk_json_path': '# relative path to scryfall bulk json file',
+        'bulk_compressed': '# keep the downloaded scryfall bulk json gzip compressed on disk True/False',
+        'name_preference': '# printing used for decklist lines without a set code: newest / oldest / black_border / modern_frame',
         'decklist_path': '''# relative path to decklist listing unique cards one per line in of the formats:
 # copies name (SET) collector_number
 # copies name (SET) collector_number | backside.jpg/*.png
-# copies name (SET) collector_number | (SET) collector_number''',
+# copies name (SET) collector_number | (SET) collector_number
+# copies name''',
         'two_sided': '# two sided printing',
         'split_double_faced': '# print both faces of double-faced cards as separate cards (when two_sided is False)',
         'custom_backside': '# has custom backside',
@@ -148,7 +151,19 @@ def write_config(config: Config, keys: list[str], config_path: str = 'decklist_t
         'user_agent': '# user agent for scryfall bulk json download',
         'accept': '# accept header for scryfall bulk json download',
         'worker_threads': '# number of threads to use for rendering pages and image processing',
+        'image_processes': '# processes for resizing and gamma correction, 0 keeps them on worker_threads',
+        'download_threads': '# number of concurrent image downloads, separate from worker_threads',
+        'download_rate': '# maximum image requests per second across all downloads (scryfall asks for at most 10)',
+        'image_cache_mb': '# memory budget in MB for decoded card images while rendering',
+        'cache_format': '# format of resized images in image_cache/<dpi>: auto (same as downloads), png, jpg, webp (lossless) or raw (largest, loads without decoding)',
+        'cache_compress_level': '# png and webp compression level for resized images, 0 (fastest, largest) to 9',
+        'cache_storage': '# where cached images are kept: directory (a file each) or pack (a few large pack files, for huge or network caches). Switch with main.py --migrate-cache',
         'dpi': '# pixel density for printing',
+        'pdf_composition': '# page (each page rendered into one image) or card (each unique card image embedded once and placed on its pages, far smaller and faster PDFs)',
+        'pdf_compression': '# how rendered pages (and decoded card images) are stored in the pdf: flate (lossless) or jpeg (smaller, lossy)',
+        'pdf_compress_level': '# flate compression level, 0 (fastest, largest) to 9',
+        'pdf_jpeg_quality': '# jpeg quality of pdf_compression jpeg, 1 to 95',
+        'warm_profiles': '# image settings main.py --warm-* prepares the cache for, comma separated dpi/image_type/gamma or dpi/image_type/plain, e.g. 600/png/gamma, 300/large/plain. Empty uses dpi, image_type and gamma_correction',
     }
     
     keys_to_write = set(keys) & set(config_dict.keys())
@@ -0,0 +1,206 @@
+"""
+Decklist to PDF - Image Download Engine
+
+Pooled, rate-limited HTTP downloads. One requests Session keeps connections
+to the image host alive across all download threads, and a shared token
+bucket bounds how often requests start, however many threads are running.
+"""
+import logging
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep, time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .models import DownloadStats, RETRY_COUNT
+
+
+# First retry delay in seconds, doubled on every further attempt
+BACKOFF_BASE = 0.5
+# Longest single wait on a retry, whatever the server asks for
+BACKOFF_MAX = 30.0
+_HTTP_TIMEOUT = 30
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the start rate of requests.
+    
+    The rate drops by half whenever the server throttles us and climbs
+    back towards the configured rate as requests succeed again. Callers
+    get tokens in the order they asked, so requests start in the order
+    they were queued.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Requests per second; 0 or less disables the limit
+            burst: Requests that may start back to back after an idle period
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        # Callers wait for their ticket to be served, first come first served
+        self._turn = threading.Condition(self._lock)
+        self._next_ticket = 0
+        self._serving = 0
+    
+    def acquire(self) -> float:
+        """
+        Block until a request may start.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        if self.max_rate <= 0:
+            return 0.0
+        
+        start = monotonic()
+        with self._lock:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving:
+                self._turn.wait()
+        
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self._serving += 1
+                    self._turn.notify_all()
+                    return now - start
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            sleep(delay)
+    
+    def throttle(self, pause: float) -> None:
+        """Hold back every caller for pause seconds and halve the rate."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, monotonic() + pause)
+            self._tokens = 0.0
+            self.rate = max(self.rate / 2, self.max_rate / 16)
+    
+    def recover(self) -> None:
+        """Step the rate back up after a successful request."""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+
+
+class Downloader:
+    """Download engine with its own thread pool, connection pool and rate limit."""
+    
+    def __init__(self, headers: dict, threads: int, rate: float, retries: int = RETRY_COUNT):
+        """
+        Args:
+            headers: Headers sent with every request
+            threads: Concurrent downloads, independent of the CPU worker pool
+            rate: Requests per second across all threads; 0 or less for no limit
+            retries: Attempts per URL before giving up
+        """
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=threads)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        self.limiter = TokenBucket(rate)
+        self.retries = retries
+        self.stats = DownloadStats()
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix='download')
+    
+    def submit(self, url: str) -> Future:
+        """Queue a download, returning a future for the response body."""
+        return self._executor.submit(self.fetch, url)
+    
+    def fetch(self, url: str) -> bytes:
+        """
+        Download a URL, retrying connection errors, 429 and 5xx responses.
+        
+        429 responses pause and slow down every thread through the shared
+        limiter, honoring Retry-After. Other failures back off
+        exponentially with jitter.
+        
+        Raises:
+            requests.RequestException: If every attempt failed
+        """
+        for attempt in range(self.retries):
+            waited = self.limiter.acquire()
+            self._count(requests=1, wait_seconds=waited)
+            
+            try:
+                response = self.session.get(url, timeout=_HTTP_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                delay = _backoff(attempt)
+            else:
+                if response.status_code == 429:
+                    error = requests.HTTPError(f"429 Too Many Requests for {url}", response=response)
+                    delay = _retry_after(response) or _backoff(attempt)
+                    self.limiter.throttle(delay)
+                    self._count(throttled=1)
+                elif response.status_code >= 500:
+                    error = requests.HTTPError(f"{response.status_code} Server Error for {url}", response=response)
+                    delay = _retry_after(response) or _backoff(attempt)
+                else:
+                    response.raise_for_status()
+                    self.limiter.recover()
+                    self._count(bytes=len(response.content))
+                    return response.content
+            
+            if attempt < self.retries - 1:
+                logging.warning(f"{error}, retrying in {delay:.1f} seconds")
+                self._count(retries=1)
+                sleep(delay)
+        
+        logging.error(f"Error downloading {url}: {error}")
+        raise error
+    
+    def _count(self, **increments) -> None:
+        """Add to the download statistics."""
+        with self._stats_lock:
+            for name, value in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+    
+    def close(self) -> None:
+        """Wait for queued downloads and release the connections."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+    
+    def __enter__(self) -> 'Downloader':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Read a Retry-After header in seconds or HTTP-date form."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time()
+        except (TypeError, ValueError):
+            return None
+    return min(BACKOFF_MAX, max(0.0, seconds))
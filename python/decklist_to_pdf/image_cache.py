@@ -0,0 +1,197 @@
+"""
+Decklist to PDF - In-Memory Image Cache
+
+Holds the path of every processed card image and decodes images on demand.
+Decoded images are kept in an LRU bounded by a byte budget, and an image is
+dropped as soon as the last page that uses it has been rendered, so memory
+follows the pages in flight rather than the size of the deck.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from time import sleep
+from typing import Callable, Iterable, Optional
+
+from PIL import Image
+
+from .image_files import open_image
+from .image_store import ImageStore
+from .models import RETRY_COUNT
+
+
+class ImageCache:
+    """Card images by key, decoded lazily from their processed cache files."""
+    
+    def __init__(self, budget_bytes: int, store: ImageStore):
+        """
+        Args:
+            budget_bytes: Most bytes of decoded pixels kept in memory
+            store: Image store holding the processed files
+        """
+        self.budget_bytes = budget_bytes
+        self.store = store
+        self.paths: dict[str, str] = {}
+        # Why an image could not be cached, by key
+        self.failures: dict[str, str] = {}
+        self._decoded: OrderedDict[str, Image.Image] = OrderedDict()
+        self._decoded_bytes = 0
+        self._pending_uses: dict[str, int] = {}
+        self._listeners: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+    
+    def add(self, key: str, path: str, image: Optional[Image.Image] = None) -> None:
+        """
+        Register the processed image file of a card.
+        
+        Args:
+            key: Card key
+            path: Processed image at target DPI
+            image: Image already decoded while processing, kept if it fits
+        """
+        with self._lock:
+            self.paths[key] = path
+            self.failures.pop(key, None)
+            if image is not None:
+                self._store(key, image)
+            listeners = list(self._listeners)
+        
+        for listener in listeners:
+            listener(key)
+    
+    def fail(self, key: str, reason: str) -> None:
+        """
+        Record that the image of a card could not be cached.
+        
+        Pages showing the card fail with the reason, other pages still
+        render.
+        """
+        with self._lock:
+            self.failures[key] = reason
+            listeners = list(self._listeners)
+        
+        for listener in listeners:
+            listener(key)
+    
+    def resolved(self, key: str) -> bool:
+        """Whether a card has its image or its caching failed."""
+        return key in self.paths or key in self.failures
+    
+    def missing(self, key: str) -> KeyError:
+        """The error for a card without an image, with the reason if caching failed."""
+        reason = self.failures.get(key)
+        return KeyError(f"Missing image: {key} ({reason})" if reason else f"Missing image: {key}")
+    
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        Call listener with the key of every image added from now on.
+        
+        Lets pages be rendered while create_cache is still adding images.
+        The listener runs on the thread that adds the image and must not
+        block.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[str], None]) -> None:
+        """Stop calling a listener passed to add_listener."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+    
+    def expect(self, keys: Iterable[str]) -> None:
+        """
+        Announce upcoming uses, one per key occurrence, in page order.
+        
+        A key is evicted once release() has been called as often as it was
+        expected.
+        """
+        with self._lock:
+            for key in keys:
+                self._pending_uses[key] = self._pending_uses.get(key, 0) + 1
+    
+    def release(self, key: str) -> None:
+        """Mark one expected use of a key as done."""
+        with self._lock:
+            remaining = self._pending_uses.get(key, 0) - 1
+            if remaining > 0:
+                self._pending_uses[key] = remaining
+                return
+            self._pending_uses.pop(key, None)
+            self._evict(key)
+    
+    def get(self, key: str) -> Optional[Image.Image]:
+        """
+        Return the decoded image of a card, or None for an unknown key.
+        
+        Raises:
+            OSError: If the cache file could not be read
+        """
+        with self._lock:
+            image = self._decoded.get(key)
+            if image is not None:
+                self._decoded.move_to_end(key)
+                return image
+            path = self.paths.get(key)
+        
+        if path is None:
+            return None
+        
+        # Decoded outside the lock so other pages keep rendering
+        image = _open_image(path, self.store)
+        with self._lock:
+            if key in self._decoded:
+                return self._decoded[key]
+            self._store(key, image)
+        return image
+    
+    def __getitem__(self, key: str) -> Image.Image:
+        image = self.get(key)
+        if image is None:
+            raise KeyError(key)
+        return image
+    
+    def __contains__(self, key: object) -> bool:
+        return key in self.paths
+    
+    def __len__(self) -> int:
+        return len(self.paths)
+    
+    @property
+    def decoded_bytes(self) -> int:
+        """Bytes of decoded pixels currently held."""
+        return self._decoded_bytes
+    
+    def _store(self, key: str, image: Image.Image) -> None:
+        """Keep a decoded image, evicting least recently used ones over budget."""
+        self._evict(key)
+        self._decoded[key] = image
+        self._decoded_bytes += _image_bytes(image)
+        # The newest image stays even on its own over budget, it is in use
+        while self._decoded_bytes > self.budget_bytes and len(self._decoded) > 1:
+            oldest = next(iter(self._decoded))
+            self._evict(oldest)
+    
+    def _evict(self, key: str) -> None:
+        """Drop a decoded image, keeping its path."""
+        image = self._decoded.pop(key, None)
+        if image is not None:
+            self._decoded_bytes -= _image_bytes(image)
+
+
+def _image_bytes(image: Image.Image) -> int:
+    """Approximate memory held by a decoded image."""
+    return image.width * image.height * len(image.getbands())
+
+
+def _open_image(path: str, store: ImageStore) -> Image.Image:
+    """Decode an image file fully, retrying briefly on read errors."""
+    for attempt in range(RETRY_COUNT):
+        try:
+            return open_image(path, store)
+        except OSError as e:
+            logging.error(f"Error opening {path}: {e}")
+            if attempt == RETRY_COUNT - 1:
+                raise
+            sleep(0.1)
+    
+    raise RuntimeError(f"Failed to open {path}")
@@ -0,0 +1,117 @@
+"""
+Decklist to PDF - Processed Image Files
+
+Reads and writes the DPI-sized card images in image_cache/<dpi>/ in the
+configured cache format: the download's own format, PNG at a chosen
+compression level, lossless WebP, or raw pixels that are memory-mapped
+straight into an image without decoding. Files are read and written
+through the configured image store.
+"""
+import os
+import struct
+
+from PIL import Image
+
+from .image_store import ImageStore
+from .models import Config
+
+
+# File extension per cache format; 'auto' keeps the download's format
+CACHE_EXTENSIONS = {
+    'png': '.png',
+    'jpg': '.jpg',
+    'webp': '.webp',
+    'raw': '.rgbx',
+}
+
+# Raw files: magic, width, height, mode, then width * height RGBX pixels.
+# RGBX has the layout Pillow uses in memory, so the pixels map without a copy.
+_RAW_MAGIC = b'DTPRAW01'
+_RAW_HEADER = struct.Struct('<8sII4s')
+
+
+def cache_extension(config: Config, image_format: str) -> str:
+    """
+    Return the file extension of processed images.
+    
+    Args:
+        config: Configuration object
+        image_format: Format of the downloaded images (png or jpg)
+    
+    Raises:
+        ValueError: If cache_format is not a known format
+    """
+    cache_format = image_format if config.cache_format == 'auto' else config.cache_format
+    if cache_format not in CACHE_EXTENSIONS:
+        raise ValueError(
+            f"Unknown cache_format '{config.cache_format}', expected auto, {', '.join(CACHE_EXTENSIONS)}"
+        )
+    return CACHE_EXTENSIONS[cache_format]
+
+
+def save_image(img: Image.Image, path: str, config: Config, store: ImageStore) -> None:
+    """
+    Write a processed image in the format its extension names.
+    
+    Args:
+        img: Image to save
+        path: Destination, with an extension from CACHE_EXTENSIONS
+        config: Configuration object, for the PNG and WebP compression level
+        store: Image store to write to
+    """
+    extension = os.path.splitext(path)[1]
+    with store.create(path) as f:
+        if extension == CACHE_EXTENSIONS['raw']:
+            rgbx = img.convert('RGBX')
+            f.write(_RAW_HEADER.pack(_RAW_MAGIC, rgbx.width, rgbx.height, b'RGBX'))
+            f.write(rgbx.tobytes())
+        elif extension == CACHE_EXTENSIONS['png']:
+            img.save(f, 'PNG', compress_level=config.cache_compress_level)
+        elif extension == CACHE_EXTENSIONS['webp']:
+            # Lossless WebP has no levels; scale its effort settings instead
+            level = config.cache_compress_level
+            img.save(f, 'WEBP', lossless=True, quality=level * 100 // 9, method=level * 6 // 9)
+        else:
+            img.save(f, 'JPEG')
+
+
+def open_image(path: str, store: ImageStore) -> Image.Image:
+    """
+    Load a processed image fully.
+    
+    Raw files are memory-mapped and returned as a read-only RGBX image
+    over the mapping; other formats are decoded.
+    """
+    if os.path.splitext(path)[1] == CACHE_EXTENSIONS['raw']:
+        mapped = store.buffer(path)
+        width, height, mode = _read_raw_header(mapped[:_RAW_HEADER.size], path)
+        if len(mapped) != _RAW_HEADER.size + width * height * 4:
+            raise OSError(f"Truncated raw image {path}")
+        pixels = mapped[_RAW_HEADER.size:]
+        return Image.frombuffer(mode, (width, height), pixels, 'raw', mode, 0, 1)
+    
+    with store.open(path) as f:
+        img = Image.open(f)
+        img.load()
+    return img
+
+
+def image_width(path: str, store: ImageStore) -> int:
+    """Read the width of a processed or downloaded image from its header."""
+    if os.path.splitext(path)[1] == CACHE_EXTENSIONS['raw']:
+        with store.open(path) as f:
+            width, _, _ = _read_raw_header(f.read(_RAW_HEADER.size), path)
+        return width
+    
+    with store.open(path) as f, Image.open(f) as img:
+        return img.width
+
+
+def _read_raw_header(header: bytes | memoryview, path: str) -> tuple[int, int, str]:
+    """Parse a raw image header into (width, height, mode)."""
+    if len(header) != _RAW_HEADER.size:
+        raise OSError(f"Truncated raw image {path}")
+    magic, width, height, mode = _RAW_HEADER.unpack(header)
+    if magic != _RAW_MAGIC:
+        raise OSError(f"Not a raw image: {path}")
+    return width, height, mode.rstrip(b'\0').decode('ascii')
@@ -0,0 +1,178 @@
+"""
+Decklist to PDF - Image Cache Manifest
+
+Records every file in the image cache under its source (the image URL, or
+a custom image file and its modification time) and a hash of the
+processing parameters that produced it. Finding a processed card is one
+dictionary probe instead of several stat calls, and changing any
+processing parameter or source URL selects a different entry, so stale
+files are never reused.
+"""
+import hashlib
+import logging
+import os
+import threading
+from typing import NamedTuple, Optional
+
+import orjson
+
+from .cache_lock import MANIFEST_SLOT, cache_lock, file_stamp
+
+
+MANIFEST_PATH = 'image_cache/manifest.json'
+
+# Entry kinds. Downloads and resized copies are uncorrected, so they can
+# be resized again for another DPI; processed entries are final images.
+DOWNLOAD = 'download'
+RESIZED = 'resized'
+PROCESSED = 'processed'
+
+
+class ManifestEntry(NamedTuple):
+    """One cached file."""
+    path: str
+    width: int
+    kind: str
+    # File size in bytes, to detect truncated files; -1 if not recorded
+    size: int = -1
+
+
+def params_hash(params: dict) -> str:
+    """Short stable hash of processing parameters, for entries and file names."""
+    return hashlib.sha1(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()[:10]
+
+
+class ImageManifest:
+    """
+    Index of the image cache by source and processing parameters.
+    
+    Several runs may share the cache, so saving merges this run's changes
+    into the file as it is on disk, under the cache lock, instead of
+    overwriting what other runs recorded meanwhile.
+    """
+    
+    def __init__(self, path: str = MANIFEST_PATH):
+        """
+        Load the manifest, starting empty if it is missing or unreadable.
+        
+        Args:
+            path: Manifest file
+        """
+        self.path = path
+        self._entries: dict[str, ManifestEntry] = {}
+        self._copies: dict[str, list[str]] = {}
+        # Source of each recorded download, by path
+        self._download_sources: dict[str, str] = {}
+        # Changes not saved yet
+        self._changes: dict[str, ManifestEntry] = {}
+        self._dropped: set[str] = set()
+        self._stamp = None
+        self._lock = threading.Lock()
+        
+        self._load()
+    
+    def get(self, params: str, source: str) -> Optional[ManifestEntry]:
+        """Return the file made from source with the given parameter hash."""
+        return self._entries.get(f"{params} {source}")
+    
+    def copies(self, source: str) -> list[ManifestEntry]:
+        """Return the uncorrected downloads and resized copies of a source."""
+        with self._lock:
+            entry_keys = list(self._copies.get(source, ()))
+        entries = [self._entries.get(entry_key) for entry_key in entry_keys]
+        return [entry for entry in entries if entry is not None and entry.kind != PROCESSED]
+    
+    def download_source(self, path: str) -> Optional[str]:
+        """Return the source whose download is recorded at path, or None."""
+        with self._lock:
+            source = self._download_sources.get(path)
+        if source is None:
+            return None
+        # The source may have been recorded at another path since
+        entry = self._entries.get(f"{DOWNLOAD} {source}")
+        return source if entry is not None and entry.path == path else None
+    
+    def record(self, params: str, source: str, entry: ManifestEntry) -> None:
+        """Add or replace the file made from source with the given parameter hash."""
+        entry_key = f"{params} {source}"
+        with self._lock:
+            self._add(entry_key, entry)
+            self._changes[entry_key] = entry
+            self._dropped.discard(entry_key)
+    
+    def remove_paths(self, paths: list[str]) -> None:
+        """Forget the entries of deleted files."""
+        removed = set(paths)
+        with self._lock:
+            for entry_key, entry in list(self._entries.items()):
+                if entry.path in removed:
+                    del self._entries[entry_key]
+                    self._changes.pop(entry_key, None)
+                    self._dropped.add(entry_key)
+    
+    def refresh(self) -> bool:
+        """
+        Reload the manifest if another run saved it since, keeping unsaved changes.
+        
+        Returns:
+            Whether it was reloaded
+        """
+        with self._lock:
+            if file_stamp(self.path) == self._stamp:
+                return False
+            self._load()
+            return True
+    
+    def save(self) -> None:
+        """Merge the changes into the manifest file, replacing it in one step."""
+        with self._lock:
+            if not self._changes and not self._dropped:
+                return
+            
+            with cache_lock(os.path.join(os.path.dirname(self.path), 'cache.lock')).hold(MANIFEST_SLOT):
+                self._load()
+                stored = {entry_key: list(entry) for entry_key, entry in self._entries.items()}
+                
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(orjson.dumps(stored))
+                os.replace(temp_path, self.path)
+                self._stamp = file_stamp(self.path)
+            
+            self._changes.clear()
+            self._dropped.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _load(self) -> None:
+        """Read the file, then apply the unsaved changes on top, with the lock held."""
+        self._entries.clear()
+        self._copies.clear()
+        self._download_sources.clear()
+        self._stamp = file_stamp(self.path)
+        
+        try:
+            with open(self.path, 'rb') as f:
+                stored = orjson.loads(f.read())
+        except FileNotFoundError:
+            stored = {}
+        except (OSError, orjson.JSONDecodeError) as e:
+            logging.warning(f"Could not read {self.path} ({e}), rebuilding the image cache manifest")
+            stored = {}
+        
+        for entry_key, fields in stored.items():
+            if entry_key not in self._dropped:
+                self._add(entry_key, ManifestEntry(*fields))
+        for entry_key, entry in self._changes.items():
+            self._add(entry_key, entry)
+    
+    def _add(self, entry_key: str, entry: ManifestEntry) -> None:
+        """Store an entry and index it by source."""
+        source = entry_key.split(' ', 1)[1]
+        if entry_key not in self._entries:
+            self._copies.setdefault(source, []).append(entry_key)
+        if entry.kind == DOWNLOAD:
+            self._download_sources[entry.path] = source
+        self._entries[entry_key] = entry
+
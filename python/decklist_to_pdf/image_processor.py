@@ -3,25 +3,41 @@ Decklist to PDF - Image Processing
 
 Handles image downloading, caching, resizing, and gamma correction.
 """
+import glob
 import io
 import logging
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import struct
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from time import sleep, perf_counter
+from typing import Optional
 
-import requests
-from PIL import Image, ImageEnhance
+from PIL import Image, ImageStat
 
+from .cache_lock import cache_lock, source_slot
+from .downloader import Downloader
+from .image_cache import ImageCache
+from .image_files import CACHE_EXTENSIONS, cache_extension, image_width, open_image, save_image
+from .image_store import PackStore, open_store
+from .image_manifest import DOWNLOAD, PROCESSED, RESIZED, ImageManifest, ManifestEntry, params_hash
 from .models import (
+    CacheStats,
     Config,
+    ImageJob,
+    ImageRequest,
     GAMMA_THRESHOLD,
     MAX_GAMMA,
     BORDER_SAMPLE_OFFSET,
     RETRY_COUNT,
-    RATE_LIMIT_DELAY,
 )
 
 
+# Bump when resizing or gamma correction changes its output, so cached
+# images are processed again
+PROCESSING_VERSION = 1
+
+
 class ImageProcessor:
     """Handles all image operations: downloading, caching, resizing, and gamma correction."""
     
@@ -39,83 +55,255 @@ class ImageProcessor:
         self.card_width_px = card_width_px
         self.card_height_px = card_height_px
         self.image_format = image_format
+        self.cache_extension = cache_extension(config, image_format)
+        # Manifest keys of uncorrected and gamma corrected images
+        self.resized_params = self._params_hash(correct=False)
+        self.corrected_params = self._params_hash(correct=True)
         self.headers = {
             'User-Agent': config.user_agent,
             'Accept': config.accept
         }
-        self.image_cache: dict[str, Image.Image] = {}
+        self.store = open_store(config.cache_storage)
+        self.image_cache = ImageCache(config.image_cache_mb * 1024 * 1024, self.store)
+        self.manifest = ImageManifest()
+        # Claims on the images this run fetches, shared with other runs
+        self.claims = cache_lock()
+        self.stats = CacheStats()
+        self.downloader = Downloader(self.headers, config.download_threads, config.download_rate)
     
-    def create_cache(self, decklist: list[dict]) -> dict[str, Image.Image]:
+    def create_cache(self, decklist: list[dict]) -> ImageCache:
         """
         Download and cache all images needed for the decklist.
         
+        Every image is processed to its DPI-sized cache file; the returned
+        cache decodes those files on demand while pages render. Cached
+        files are found through the manifest, by source and processing
+        parameters, so only images whose inputs changed are processed.
+        
+        Runs sharing the cache claim each image before fetching it, so an
+        image is downloaded and processed once on the host. Images another
+        run has claimed are waited for and then read from the cache.
+        
         Args:
             decklist: List of decklist entries
             
         Returns:
-            Dictionary mapping card keys to PIL Image objects
+            ImageCache mapping card keys to their processed images
         """
         self._ensure_directories()
         
         timer_start = perf_counter()
-        futures = []
-        download_count = 0
+        counts = CacheStats()
+        requests = self._image_requests(decklist)
+        
+        with self._create_executor() as executor:
+            while requests:
+                requests = self._cache_images(executor, requests, counts)
+                if requests:
+                    logging.info(f"Waiting for another run processing {len(requests)} images")
+                    for request in requests:
+                        self.claims.wait(source_slot(request.source))
+                    self.store.refresh()
+                    self.manifest.refresh()
+        
+        timer_end = perf_counter()
+        self.stats.downloaded += counts.downloaded
+        self.stats.processed += counts.processed
+        self.stats.reused += counts.reused
+        self.stats.bytes_written += counts.bytes_written
+        self.stats.failed += counts.failed
+        stats = self.downloader.stats
+        logging.info(
+            f"Downloaded {counts.downloaded} new images "
+            f"({stats.retries} retries, {stats.throttled} throttled, {stats.wait_seconds:.1f}s rate limited)"
+        )
+        logging.info(f"Processed {counts.processed} images, reused {counts.reused} cached images")
+        if counts.failed:
+            logging.error(f"Failed to cache {counts.failed} images, the pages showing them are not rendered")
+        logging.info(f"Image cache created in {timer_end - timer_start:.2f} seconds")
+        
+        return self.image_cache
+    
+    def _image_requests(self, decklist: list[dict]) -> list[ImageRequest]:
+        """List the images of the decklist's cards and card back, once each."""
+        requests = []
         processed_keys = set()
         
-        with ThreadPoolExecutor(self.config.worker_threads) as executor:
-            for entry in decklist:
-                if 'sides' not in entry or entry['sides'] is None:
-                    continue
+        for entry in decklist:
+            if 'sides' not in entry or entry['sides'] is None:
+                continue
                     
-                for side in entry['sides']:
-                    key = side.get('key')
-                    if key == 'back' or key in processed_keys:
-                        continue
+            for side in entry['sides']:
+                key = side.get('key')
+                if key == 'back' or key in processed_keys:
+                    continue
                     
-                    processed_keys.add(key)
+                processed_keys.add(key)
                     
-                    if side.get('custom', False):
-                        # Custom card
-                        source = f"custom_cards/{side['name']}.png"
-                        dest = f"custom_cards/{side['name']}.{self.image_format}"
-                        futures.append(executor.submit(
-                            self._fetch_image, source, dest, key, is_custom=True, black_bordered=False
-                        ))
-                    else:
-                        # Scryfall card
-                        image_uri = side['image_uris'][self.config.image_type]
-                        dest = f"image_cache/{self.config.image_type}/{key}.{self.image_format}"
-                        
-                        if not os.path.exists(dest):
-                            download_count += 1
-                            sleep(RATE_LIMIT_DELAY)
+                if side.get('custom', False):
+                    # Custom card
+                    requests.append(self._file_request(key, f"custom_cards/{side['name']}.png"))
+                else:
+                    # Scryfall card; faces of double-faced cards carry
+                    # only their border colour
+                    black_border = side.get('black_border', side.get('border_color') == 'black')
+                    requests.append(ImageRequest(
+                        key,
+                        side['image_uris'][self.config.image_type],
+                        f"image_cache/{self.config.image_type}/{key}.{self.image_format}",
+                        f"image_cache/{self.config.dpi}/{self.config.image_type}/{key}",
+                        correct=self.config.gamma_correction and black_border
+                    ))
                         
-                        futures.append(executor.submit(
-                            self._fetch_image, image_uri, dest, key, is_custom=False, black_bordered=side.get('black_bordered', False)
-                        ))
+        # Handle custom backside, first as every back page needs it
+        if self.config.custom_backside and self.config.two_sided:
+            backside_path = f"cardbacks/{self.config.backside}"
+            if os.path.exists(backside_path):
+                requests.insert(0, self._file_request("back", backside_path))
+        
+        return requests
+    
+    def _cache_images(self, executor: Executor, requests: list[ImageRequest], counts: CacheStats) -> list[ImageRequest]:
+        """
+        Bring images into the cache, skipping those another run is processing.
+        
+        Args:
+            executor: Pool from _create_executor
+            requests: Images to cache
+            counts: Totals of this create_cache call to add to
             
-            # Handle custom backside
-            if self.config.custom_backside and self.config.two_sided:
-                backside_path = f"cardbacks/{self.config.backside}"
-                if os.path.exists(backside_path):
-                    futures.append(executor.submit(
-                        self._fetch_image, backside_path, backside_path, "back", is_custom=True, black_bordered=False
-                    ))
+        Returns:
+            Requests claimed by another run, to retry once it is done
+        """
+        futures = {}
+        downloads = {}
+        planned = []
+        deferred = []
+        claimed = []
+        
+        try:
+            for request in requests:
+                job = self._plan(request)
+                if job is None:
+                    counts.reused += 1
+                elif self.claims.acquire(source_slot(request.source), blocking=False):
+                    claimed.append(source_slot(request.source))
+                    planned.append((request, job))
+                else:
+                    deferred.append(request)
             
-            # Wait for all downloads to complete
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    logging.error(f"Error in image processing: {e}")
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    raise
+            # Another run may have finished some of them since the cache was read
+            refreshed = self.store.refresh()
+            if self.manifest.refresh() or refreshed:
+                jobs = [self._plan(request) for request, _ in planned]
+                counts.reused += jobs.count(None)
+            else:
+                jobs = [job for _, job in planned]
+            
+            for job in jobs:
+                if job is None:
+                    continue
+                if job.input_path is None:
+                    # Downloads run on the download engine's own
+                    # threads and rate limit
+                    logging.info(f"Downloading image {job.download_path}")
+                    downloads[self.downloader.submit(job.source)] = job
+                else:
+                    self._submit(executor, futures, job)
+            
+            # Process each download on the worker pool as soon as it arrives,
+            # and add each processed image to the cache as soon as it is
+            # done, so pages can render while later images still download
+            pending = set(downloads) | set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = downloads[future] if future in downloads else futures[future]
+                    try:
+                        result = future.result()
+                    except BrokenExecutor:
+                        raise
+                    except Exception as e:
+                        # A bad image fails only the pages that show it
+                        logging.error(f"Error caching image {job.key} from {job.source}: {e}")
+                        counts.failed += 1
+                        self.image_cache.fail(job.key, str(e))
+                        continue
+                    
+                    if future in downloads:
+                        job.downloaded = result
+                        job.input_path = job.download_path
+                        pending.add(self._submit(executor, futures, job))
+                        continue
+                
+                    created, img, written = result
+                    self.store.adopt(written)
+                    for created_entry in created:
+                        self.manifest.record(self._entry_params(created_entry.kind), job.source, created_entry)
+                    # A skipped correction records the resized file twice
+                    counts.bytes_written += sum(size for size in {entry.path: entry.size for entry in created}.values() if size > 0)
+                    self.image_cache.add(job.key, created[-1].path, img)
+        except Exception as e:
+            logging.error(f"Error in image processing: {e}")
+            for download in downloads:
+                download.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            # Index first, so the manifest never names an unindexed image,
+            # and both before other runs waiting on the claims look again
+            self.store.save()
+            self.manifest.save()
+            for slot in claimed:
+                self.claims.release(slot)
         
-        timer_end = perf_counter()
-        logging.info(f"Downloaded {download_count} new images")
-        logging.info(f"Image cache created in {timer_end - timer_start:.2f} seconds")
+        counts.downloaded += len(downloads)
+        counts.processed += len(futures)
+        return deferred
+    
+    def __getstate__(self) -> dict:
+        # Worker processes get the settings only; downloads, the manifest,
+        # the claims and the in-memory cache stay in the parent
+        state = self.__dict__.copy()
+        del state['downloader'], state['image_cache'], state['manifest'], state['claims']
+        return state
+    
+    def close(self) -> None:
+        """Wait for queued downloads and release the download threads and connections."""
+        self.downloader.close()
+    
+    def __enter__(self) -> 'ImageProcessor':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def _create_executor(self) -> Executor:
+        """
+        Create the pool that decodes, resizes, corrects and encodes images.
         
-        return self.image_cache
+        With image_processes set, a process pool spreads this CPU work over
+        that many cores. Workers write their results to the DPI cache and
+        return only the path, so no pixel data is pickled back.
+        """
+        if self.config.image_processes > 0:
+            return ProcessPoolExecutor(
+                self.config.image_processes,
+                # Not forked, the download threads may hold locks
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(logging.getLogger().getEffectiveLevel(),)
+            )
+        return ThreadPoolExecutor(self.config.worker_threads)
+    
+    def _submit(self, executor: Executor, futures: dict, job: ImageJob) -> Future:
+        """Queue an image for processing, recording its job by future."""
+        if isinstance(executor, ProcessPoolExecutor):
+            future = executor.submit(self._process_job_file, job)
+        else:
+            future = executor.submit(self._process_job, job)
+        futures[future] = job
+        return future
     
     def _ensure_directories(self) -> None:
         """Create necessary cache directories."""
@@ -127,95 +315,189 @@ class ImageProcessor:
         os.makedirs(f"custom_cards/{dpi}", exist_ok=True)
         os.makedirs(f"cardbacks/{dpi}", exist_ok=True)
     
-    def _fetch_image(self, source: str, destination: str, key: str, is_custom: bool, black_bordered: bool) -> None:
+    def _params_hash(self, correct: bool) -> str:
+        """Hash every setting that changes the pixels or format of a processed image."""
+        params = {
+            'version': PROCESSING_VERSION,
+            'size': [self.card_width_px, self.card_height_px],
+            'resample': 'lanczos',
+            'format': self.cache_extension,
+        }
+        if correct:
+            params['gamma'] = [GAMMA_THRESHOLD, MAX_GAMMA, BORDER_SAMPLE_OFFSET]
+        return params_hash(params)
+    
+    def _entry_params(self, kind: str) -> str:
+        """Manifest parameter key of a file a job created."""
+        if kind == DOWNLOAD:
+            return DOWNLOAD
+        return self.corrected_params if kind == PROCESSED else self.resized_params
+    
+    def _plan(self, request: ImageRequest) -> Optional[ImageJob]:
         """
-        Fetch, process, and cache an image.
+        Look up a card image in the manifest and plan the work it still needs.
+        
+        Cached files that are missing or not the size recorded, such as
+        files cut short by a crash before writes were atomic, are dropped
+        and made again.
         
         Args:
-            source: URL or local path to source image
-            destination: Path to save the image
-            key: Cache key for the image
-            is_custom: Whether this is a custom card
+            request: The image and how to process it
+            
+        Returns:
+            None if the processed image is cached (it is added to the image
+            cache), otherwise the job; its input_path is None if the image
+            must be downloaded first
         """
-        retries = RETRY_COUNT
-        img = Image.new('RGB', (1, 1), color=(255, 255, 255))
+        source = request.source
+        params = self.corrected_params if request.correct else self.resized_params
+        processed = self._intact(self.manifest.get(params, source), source)
+        if processed is not None:
+            self.image_cache.add(request.key, processed.path)
+            return None
         
-        # Calculate DPI-scaled paths
-        if is_custom:
-            parts = destination.split('/')
-            dpi_destination = f"{parts[0]}/{self.config.dpi}/{parts[1]}"
+        job = ImageJob(request.key, source, download_path=request.download_path)
+        resized = self._intact(self.manifest.get(self.resized_params, source), source) if request.correct else None
+        if resized is not None:
+            job.input_path = resized.path
         else:
-            parts = destination.split('/')
-            dpi_destination = f"{parts[0]}/{self.config.dpi}/{parts[1]}/{parts[2]}"
-        
-        gc_path = dpi_destination[:-4] + f"_gc{os.path.splitext(dpi_destination)[1]}"
-        
-        # Custom cards: simpler path without gamma correction
-        if is_custom:
-            img = self._process_custom_image(source, dpi_destination, retries)
-            self.image_cache[key] = img
-            return
-        
-        # Standard cards: check cache hierarchy
-        if os.path.exists(gc_path) and self.config.gamma_correction and black_bordered:
-            img = self._open_image(gc_path, retries)
-        elif os.path.exists(dpi_destination):
-            img = self._open_image(dpi_destination, retries)
-            if self.config.gamma_correction and black_bordered:
-                img = self._apply_gamma_correction(img, gc_path, retries)
-        elif os.path.exists(destination):
-            img = self._open_image(destination, retries)
-            img = self._resize_image(img, dpi_destination)
-            if self.config.gamma_correction:
-                img = self._apply_gamma_correction(img, gc_path, retries)
-        else:
-            img = self._download_image(source, destination, retries)
-            img = self._resize_image(img, dpi_destination)
-            if self.config.gamma_correction and black_bordered:
-                img = self._apply_gamma_correction(img, gc_path, retries)
+            job.input_path = self._resize_source(source, request.download_path)
+            job.resized_path = f"{request.output_base}_{self.resized_params}{self.cache_extension}"
+        if request.correct:
+            job.corrected_path = f"{request.output_base}_{self.corrected_params}{self.cache_extension}"
+        return job
         
-        self.image_cache[key] = img
+    def _file_request(self, key: str, path: str) -> ImageRequest:
+        """Request a custom card or card back from a local image, without gamma correction."""
+        # The modification time is part of the source, so edited files are processed again
+        stat = os.stat(path)
+        source = f"file:{path}:{stat.st_mtime_ns}:{stat.st_size}"
+        directory, name = os.path.split(path)
+        output_base = f"{directory}/{self.config.dpi}/{os.path.splitext(name)[0]}"
+        return ImageRequest(key, source, path, output_base)
     
-    def _process_custom_image(self, source: str, dpi_destination: str, retries: int) -> Image.Image:
-        """Process a custom card image."""
-        if os.path.exists(dpi_destination):
-            return self._open_image(dpi_destination, retries)
+    def _intact(self, entry: Optional[ManifestEntry], source: str) -> Optional[ManifestEntry]:
+        """
+        Return a manifest entry if its file is whole, dropping it otherwise.
+        
+        Entries recorded before sizes were kept only need the file to exist.
+        """
+        if entry is None:
+            return None
+        size = self.store.size(entry.path)
+        if size is not None and (entry.size < 0 or size == entry.size):
+            return entry
         
-        img = self._open_image(source, retries)
-        return self._resize_image(img, dpi_destination)
+        logging.warning(f"Cached image {entry.path} is missing or truncated, making it again")
+        self.manifest.remove_paths([entry.path])
+        # Custom images are the user's own files
+        if not source.startswith('file:'):
+            self.store.remove([entry.path])
+        return None
     
-    def _download_image(self, url: str, destination: str, retries: int) -> Image.Image:
-        """Download an image from URL."""
-        if url is None:
-            raise ValueError(f"Image URL is None for destination {destination}")
+    def _resize_source(self, source: str, download_path: str) -> Optional[str]:
+        """
+        Choose the cached image to resize to the target DPI from.
         
-        while retries > 0:
-            try:
-                logging.info(f"Downloading image {destination}")
-                response = requests.get(url, headers=self.headers)
-                response.raise_for_status()
-                
-                img = Image.open(io.BytesIO(response.content))
-                img.save(destination, self.image_format)
-                img.load()
-                return img
-                
-            except Exception as e:
-                retries -= 1
-                logging.error(f"Error downloading {url}: {e}")
-                if retries > 0:
-                    logging.info(f"Retrying ({retries} left)")
-                    sleep(1)
-                else:
-                    raise
+        Candidates are the original download and the resized copies made
+        for other DPIs, as recorded in the manifest. Copies larger than the
+        original were upscaled from it and add no detail, so they only
+        count once it is gone. The smallest candidate at least as large as
+        the target is read, decoding the fewest pixels without upscaling;
+        if all are smaller, the original download.
         
-        raise RuntimeError(f"Failed to download {url}")
+        Returns:
+            Path of the chosen image, or None if it should be downloaded
+        """
+        copies = [
+            entry for entry in self.manifest.copies(source) if self._intact(entry, source) is not None
+        ]
+        download = next((entry for entry in copies if entry.kind == DOWNLOAD), None)
+        # A file recorded for another source is an older image of the card,
+        # from before its image URL changed, and is downloaded again
+        owner = self.manifest.download_source(download_path) if download is None else None
+        if download is None and owner in (None, source) and self.store.exists(download_path):
+            # Downloaded before the manifest recorded it, or a local image
+            download = ManifestEntry(
+                download_path, image_width(download_path, self.store), DOWNLOAD, self.store.size(download_path)
+            )
+            self.manifest.record(DOWNLOAD, source, download)
+            copies.append(download)
+        
+        if download is not None:
+            copies = [entry for entry in copies if entry.width <= download.width]
+        
+        large_enough = [entry for entry in copies if entry.width >= self.card_width_px]
+        if large_enough:
+            return min(large_enough, key=lambda entry: entry.width).path
+        # Upscaling a smaller copy loses detail a fresh download keeps
+        return download.path if download is not None else None
+        
+    def _process_job_file(self, job: ImageJob) -> tuple[list[ManifestEntry], None, dict]:
+        """Process an image in a worker process, returning only the files made."""
+        created, _, written = self._process_job(job)
+        return created, None, written
     
-    def _open_image(self, path: str, retries: int) -> Image.Image:
-        """Open an image from disk."""
+    def _process_job(self, job: ImageJob) -> tuple[list[ManifestEntry], Optional[Image.Image], dict]:
+        """
+        Save, resize and gamma correct an image as planned.
+        
+        Args:
+            job: Planned work from _plan
+            
+        Returns:
+            (files written, the last one being the image to print;
+            that image decoded; where a worker process stored the files,
+            for ImageStore.adopt)
+        """
+        retries = RETRY_COUNT
+        created = []
+        
+        if job.downloaded is not None:
+            self._save_download(job.downloaded, job.download_path)
+            created.append(ManifestEntry(
+                job.download_path, image_width(job.download_path, self.store), DOWNLOAD, len(job.downloaded)
+            ))
+        
+        img = self._open_image(job.input_path, retries, draft=job.resized_path is not None)
+        path = job.input_path
+        if job.resized_path is not None:
+            img = self._resize_image(img, job.resized_path)
+            path = job.resized_path
+            created.append(ManifestEntry(path, img.width, RESIZED, self.store.size(path)))
+        
+        if job.corrected_path is not None:
+            corrected = self._apply_gamma_correction(img, job.corrected_path, retries)
+            # A skipped or failed correction returns the image unchanged
+            if corrected is not img:
+                img, path = corrected, job.corrected_path
+            created.append(ManifestEntry(path, img.width, PROCESSED, self.store.size(path)))
+        
+        return created, img, self.store.take_written()
+    
+    def _save_download(self, downloaded: bytes, destination: str) -> None:
+        """Save a downloaded image as received."""
+        # Scryfall serves the format the cache file is named after, so the
+        # bytes are kept as they are instead of decoded and encoded again
+        Image.open(io.BytesIO(downloaded)).verify()
+        with self.store.create(destination) as f:
+            f.write(downloaded)
+    
+    def _open_image(self, path: str, retries: int, draft: bool = False) -> Image.Image:
+        """
+        Open an image from disk.
+        
+        With draft, a JPEG larger than twice the card size is decoded at a
+        reduced scale (1/2, 1/4 or 1/8) in the DCT domain, never below the
+        card size, so resizing it afterwards reads fewer pixels.
+        """
         while retries > 0:
             try:
-                with Image.open(path) as opened_img:
+                if os.path.splitext(path)[1] == CACHE_EXTENSIONS['raw']:
+                    return open_image(path, self.store)
+                with self.store.open(path) as f, Image.open(f) as opened_img:
+                    if draft and opened_img.format == 'JPEG':
+                        opened_img.draft('RGB', (self.card_width_px, self.card_height_px))
                     opened_img.load()
                     return opened_img.copy()
             except Exception as e:
@@ -235,8 +517,7 @@ class ImageProcessor:
             Image.Resampling.LANCZOS
         ).convert("RGB")
         
-        resized.save(destination, self.image_format)
-        resized.load()
+        save_image(resized, destination, self.config, self.store)
         return resized
     
     def _apply_gamma_correction(self, img: Image.Image, gc_path: str, retries: int) -> Image.Image:
@@ -244,54 +525,33 @@ class ImageProcessor:
         Apply gamma correction to make dark borders truly black.
         
         This improves print quality by adjusting the contrast so that
-        card borders are pure black rather than dark gray.
+        card borders are pure black rather than dark gray. The transfer
+        curve is computed once from the image histogram and applied in a
+        single pass.
         """
         try:
             width, height = img.size
             if width == 0 or height == 0:
                 raise ValueError("Image has zero dimensions")
             
-            # Sample border color from bottom edge
-            sample_y = int(height - height * BORDER_SAMPLE_OFFSET)
-            border_color = img.getpixel((width // 2, sample_y))
-            
-            if border_color is None:
-                raise ValueError("Could not sample border color")
+            source = img if img.mode in ('RGB', 'L') else img.convert('RGB')
             
-            # Calculate average brightness
-            if isinstance(border_color, (tuple, list)):
-                border_gamma = sum(border_color[:3]) / 3
-            elif isinstance(border_color, (int, float)):
-                border_gamma = border_color
-            else:
-                raise ValueError(f"Unknown color format: {type(border_color)}")
+            # Median of a strip along the bottom border, so stray text or
+            # noise under a single pixel does not decide the correction
+            border_color = _sample_border(source)
+            border_gamma = sum(border_color[:3]) / len(border_color[:3])
             
             # Skip if border is too bright (likely not a black border card)
             if border_gamma > MAX_GAMMA:
                 logging.warning(f"Border too bright ({border_gamma}), skipping gamma correction")
                 return img
             
-            # Iteratively increase contrast until border is black
-            while border_gamma > GAMMA_THRESHOLD:
-                enhancer = ImageEnhance.Contrast(img)
-                img = enhancer.enhance(1 + border_gamma / 256)
-                
-                try:
-                    border_color = img.getpixel((width // 2, sample_y))
-                except IndexError:
-                    break
-                
-                if isinstance(border_color, (tuple, list)):
-                    border_gamma = sum(border_color[:3]) / 3 if len(border_color) >= 3 else border_color[0]
-                elif isinstance(border_color, (int, float)):
-                    border_gamma = border_color
-                else:
-                    break
+            curve = _contrast_curve(source.histogram(), source.mode, border_color)
+            corrected = source.point(curve * len(source.getbands()))
             
-            img.save(gc_path)
-            img.load()
+            save_image(corrected, gc_path, self.config, self.store)
             logging.info(f"Gamma correction applied, saved to {gc_path}")
-            return img
+            return corrected
             
         except Exception as e:
             logging.error(f"Error applying gamma correction: {e}")
@@ -300,6 +560,82 @@ class ImageProcessor:
             raise
 
 
+def _init_worker(log_level: int) -> None:
+    """Set up logging in an image worker process."""
+    logging.basicConfig(level=log_level)
+
+
+def _sample_border(img: Image.Image) -> list[float]:
+    """Per-band median of a strip across the bottom border of a card image."""
+    width, height = img.size
+    sample_y = min(height - 1, int(height - height * BORDER_SAMPLE_OFFSET))
+    box = (width // 4, max(0, sample_y - 2), max(width // 4 + 1, width * 3 // 4), min(height, sample_y + 3))
+    return ImageStat.Stat(img.crop(box)).median
+
+
+def _contrast_curve(histogram: list[int], mode: str, border_color: list[float]) -> list[int]:
+    """
+    Compute the transfer curve of the iterative contrast correction.
+    
+    Equivalent to running ImageEnhance.Contrast over the image with a
+    factor of 1 + border / 256 until the border brightness falls to
+    GAMMA_THRESHOLD. Each step maps every channel value x to
+    mean + factor * (x - mean), where mean is the image's mean luminance,
+    so the steps compose into one 256-entry curve. The mean of each step
+    is derived from the histogram through the curve so far, and the blend
+    arithmetic mirrors Pillow's float32 Image.blend, so no step touches
+    the pixels.
+    
+    Args:
+        histogram: Image.histogram() of the uncorrected image
+        mode: Image mode, 'RGB' or 'L'
+        border_color: Sampled border value per band
+        
+    Returns:
+        Curve mapping each original channel value to its corrected value
+    """
+    bands = [histogram[i:i + 256] for i in range(0, len(histogram), 256)]
+    # Luminance weights of Pillow's RGB to L conversion, in 1/65536
+    weights = (19595, 38470, 7471) if mode == 'RGB' else (65536,)
+    pixels = sum(bands[0])
+    
+    curve = list(range(256))
+    border = [int(value) for value in border_color[:len(weights)]]
+    border_gamma = sum(border_color[:len(weights)]) / len(weights)
+    while border_gamma > GAMMA_THRESHOLD:
+        luminance = sum(
+            weight * sum(count * curve[value] for value, count in enumerate(band) if count)
+            for weight, band in zip(weights, bands)
+        ) / 65536 / pixels
+        mean = int(luminance + 0.5)
+        alpha = _float32(1 + border_gamma / 256)
+        step = [_blend(mean, value, alpha) for value in range(256)]
+        
+        curve = [step[value] for value in curve]
+        previous = border_gamma
+        border_gamma = sum(curve[value] for value in border) / len(border)
+        # A border brighter than the image mean only gets brighter
+        if border_gamma >= previous:
+            break
+    
+    return curve
+
+
+def _float32(value: float) -> float:
+    """Round a float to single precision."""
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+
+def _blend(mean: int, value: int, alpha: float) -> int:
+    """One channel value of Image.blend(mean, value, alpha), as Pillow computes it."""
+    blended = _float32(mean + _float32(alpha * (value - mean)))
+    if blended <= 0:
+        return 0
+    if blended >= 255:
+        return 255
+    return int(blended)
+
+
 def resize_image_to_card_size(image: Image.Image, card_width_px: int, card_height_px: int) -> Image.Image:
     """
     Resize an image to the target card size.
@@ -316,3 +652,52 @@ def resize_image_to_card_size(image: Image.Image, card_width_px: int, card_heigh
         (card_width_px, card_height_px),
         Image.Resampling.LANCZOS
     ).convert("RGB")
+
+
+def remove_cached_images(keys: list[str], cache_dir: str = 'image_cache') -> list[str]:
+    """
+    Delete every cached variant of the given card images.
+    
+    Covers downloads in {cache_dir}/{type}/ and processed images in
+    {cache_dir}/{dpi}/{type}/, named by key and parameter hash, as files
+    and in the pack store, and drops them from the cache manifest.
+    
+    Args:
+        keys: Card keys whose images are stale
+        cache_dir: Root of the image cache
+        
+    Returns:
+        Paths of the removed files
+    """
+    removed = []
+    root = glob.escape(cache_dir)
+    for key in keys:
+        name = glob.escape(key)
+        for pattern in (f"{root}/*/{name}.*", f"{root}/*/*/{name}.*", f"{root}/*/*/{name}_*.*"):
+            for path in glob.glob(pattern):
+                os.remove(path)
+                removed.append(path)
+    
+    pack_directory = os.path.join(cache_dir, 'packs')
+    if os.path.exists(pack_directory):
+        store = PackStore(pack_directory)
+        stale = set(keys)
+        removed += store.remove([name for name in store.names() if _cached_image_key(name, cache_dir) in stale])
+        store.save()
+        store.close()
+    
+    if removed:
+        manifest = ImageManifest(os.path.join(cache_dir, 'manifest.json'))
+        manifest.remove_paths(removed)
+        manifest.save()
+        logging.info(f"Removed {len(removed)} stale cached images")
+    return removed
+
+
+def _cached_image_key(name: str, cache_dir: str) -> Optional[str]:
+    """Card key of an image named {cache_dir}/[{dpi}/]{type}/{key}[_{hash}].{ext}."""
+    parts = name[len(cache_dir) + 1:].split('/') if name.startswith(f"{cache_dir}/") else []
+    if len(parts) not in (2, 3):
+        return None
+    stem = os.path.splitext(parts[-1])[0]
+    return stem if len(parts) == 2 else stem.rsplit('_', 1)[0]
@@ -0,0 +1,677 @@
+"""
+Decklist to PDF - Image Cache Storage
+
+Where cached image files are kept. The directory store, the default, keeps
+each image as a file. The pack store appends images to a few large pack
+files, with an index from each name to its pack, offset and length. It is
+meant for caches large enough that per-file stat and open calls dominate,
+as on network and overlay filesystems, or that run short of inodes.
+
+Images are named by the path the directory store uses, for example
+image_cache/300/png/<key>_<hash>.png, so the manifest and image processor
+work the same with either store. The pack store reads names it does not
+hold from disk, which covers custom card images and files not yet
+migrated.
+
+Pack file layout, records appended in write order:
+    header  magic, name length, data length
+    name    UTF-8
+    data    file contents
+The index is a card index file (card_index.py) mapping each name to its
+pack number, data offset and data length.
+"""
+import io
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO, Optional
+
+from .cache_lock import PACK_INDEX_SLOT, cache_lock, file_stamp, pack_slot
+from .card_index import CardIndex, write_card_index
+
+
+CACHE_STORAGES = ('directory', 'pack')
+PACK_DIRECTORY = 'image_cache/packs'
+# Directories holding cache files; custom_cards and cardbacks only in
+# their DPI subdirectories, the rest are user images
+CACHE_DIRECTORIES = ('image_cache', 'custom_cards', 'cardbacks')
+# A new pack is started once the current one passes this size
+PACK_SIZE_LIMIT = 1 << 30
+
+_RECORD_MAGIC = b'DTPK'
+_RECORD = struct.Struct('<4sHI')
+_LOCATION = struct.Struct('<IQI')
+_PACK_FILE = re.compile(r'pack-(\d+)\.pack$')
+
+# Pack store of each worker process, shared by the jobs it runs
+_worker_stores: dict[str, 'PackStore'] = {}
+
+
+def open_store(storage: str) -> 'ImageStore':
+    """
+    Create the image store named by the cache_storage setting.
+    
+    Raises:
+        ValueError: If storage is not a known store
+    """
+    if storage == 'directory':
+        return DirectoryStore()
+    if storage == 'pack':
+        return PackStore()
+    raise ValueError(f"Unknown cache_storage '{storage}', expected {' or '.join(CACHE_STORAGES)}")
+
+
+class ImageStore:
+    """Storage of cached image files by name."""
+    
+    def create(self, name: str) -> BinaryIO:
+        """Open a new file for writing; it is stored when closed."""
+        raise NotImplementedError
+    
+    def open(self, name: str) -> BinaryIO:
+        """Open a stored file for reading."""
+        raise NotImplementedError
+    
+    def buffer(self, name: str) -> memoryview:
+        """Map a stored file into memory without copying it."""
+        raise NotImplementedError
+    
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+    
+    def size(self, name: str) -> Optional[int]:
+        """Size of a stored file in bytes, None if it is missing."""
+        raise NotImplementedError
+    
+    def remove(self, names: Iterable[str]) -> list[str]:
+        """Delete stored files, returning the names that existed."""
+        raise NotImplementedError
+    
+    def save(self) -> None:
+        """Persist anything written since the last save."""
+    
+    def refresh(self) -> bool:
+        """Pick up what other runs stored since, returning whether anything may have changed."""
+        return False
+    
+    def take_written(self) -> dict:
+        """Return and forget what a worker process copy has written, for adopt()."""
+        return {}
+    
+    def adopt(self, written: dict) -> None:
+        """Take over files a worker process wrote, from its take_written()."""
+
+
+class DirectoryStore(ImageStore):
+    """
+    One file per image, at its name.
+    
+    Files are written under a temporary name and renamed into place when
+    closed, so other runs sharing the cache never see a partial file.
+    """
+    
+    def create(self, name: str) -> BinaryIO:
+        os.makedirs(os.path.dirname(name) or '.', exist_ok=True)
+        return _AtomicWriter(name)
+    
+    def open(self, name: str) -> BinaryIO:
+        return open(name, 'rb')
+    
+    def buffer(self, name: str) -> memoryview:
+        with open(name, 'rb') as f:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    
+    def exists(self, name: str) -> bool:
+        return os.path.exists(name)
+    
+    def size(self, name: str) -> Optional[int]:
+        try:
+            return os.path.getsize(name)
+        except OSError:
+            return None
+    
+    def remove(self, names: Iterable[str]) -> list[str]:
+        removed = []
+        for name in names:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                continue
+            removed.append(name)
+        return removed
+
+
+class PackStore(ImageStore):
+    """
+    Images appended to pack files, found through an index.
+    
+    Writes go to the newest pack until it passes PACK_SIZE_LIMIT. Each
+    worker process appends to a pack of its own, and its writes reach the
+    index through take_written() and adopt() in the parent. Replaced and
+    removed images stay in their packs as dead space until compact().
+    
+    Runs sharing the cache never append to the same pack: a pack is
+    written only while holding its lock in image_cache/cache.lock. Saving
+    merges into the index on disk under the index lock.
+    """
+    
+    def __init__(self, directory: str = PACK_DIRECTORY, own_pack: bool = False):
+        """
+        Open the pack store, rebuilding the index from the packs if it is
+        missing or unreadable.
+        
+        Args:
+            directory: Directory of the pack files and index
+            own_pack: Always start a new pack instead of appending to the
+                newest, for worker processes writing alongside the parent
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index')
+        self._own_pack = own_pack
+        self._index: Optional[CardIndex] = None
+        # Changes since the index was written
+        self._added: dict[str, tuple[int, int, int]] = {}
+        self._removed: set[str] = set()
+        self._written: dict[str, tuple[int, int, int]] = {}
+        # Index lookups so far; a card is usually checked and then read
+        self._found: dict[str, tuple[int, int, int]] = {}
+        self._maps: dict[int, mmap.mmap] = {}
+        self._pack: Optional[BinaryIO] = None
+        self._pack_number = -1
+        self._index_stamp = None
+        self._lock = threading.Lock()
+        self._locks = cache_lock(os.path.join(os.path.dirname(directory) or '.', 'cache.lock'))
+        
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, self._locks.hold(PACK_INDEX_SLOT):
+            self._open_index()
+    
+    def __reduce__(self):
+        # Worker processes share one store per process, with packs of their own
+        return _worker_store, (self.directory,)
+    
+    def create(self, name: str) -> BinaryIO:
+        return _PackWriter(self, name)
+    
+    def open(self, name: str) -> BinaryIO:
+        buffer = self._stored_buffer(name)
+        if buffer is None:
+            return open(name, 'rb')
+        return _BufferReader(buffer)
+    
+    def buffer(self, name: str) -> memoryview:
+        buffer = self._stored_buffer(name)
+        if buffer is None:
+            return DirectoryStore().buffer(name)
+        return buffer
+    
+    def exists(self, name: str) -> bool:
+        return self._location(name) is not None or os.path.exists(name)
+    
+    def size(self, name: str) -> Optional[int]:
+        location = self._location(name)
+        if location is None:
+            return DirectoryStore().size(name)
+        return location[2]
+    
+    def remove(self, names: Iterable[str]) -> list[str]:
+        removed = []
+        with self._lock:
+            for name in names:
+                if self._location(name) is None:
+                    continue
+                self._added.pop(name, None)
+                self._removed.add(name)
+                removed.append(name)
+        return removed
+    
+    def names(self) -> Iterator[str]:
+        """Iterate over the names of all stored images."""
+        with self._lock:
+            added = list(self._added)
+            removed = self._removed | set(added)
+        if self._index is not None:
+            for name in self._index:
+                if name not in removed:
+                    yield name
+        yield from added
+    
+    def save(self) -> None:
+        """Merge the added and removed images into the index on disk."""
+        with self._lock:
+            if not self._added and not self._removed:
+                return
+            with self._locks.hold(PACK_INDEX_SLOT):
+                self._open_index()
+                self._write_index(self._live_locations())
+    
+    def refresh(self) -> bool:
+        """Reopen the index if another run saved it since."""
+        with self._lock:
+            if file_stamp(self.index_path) == self._index_stamp:
+                return False
+            with self._locks.hold(PACK_INDEX_SLOT):
+                self._open_index()
+            return True
+    
+    def take_written(self) -> dict:
+        with self._lock:
+            written, self._written = self._written, {}
+        return written
+    
+    def adopt(self, written: dict) -> None:
+        with self._lock:
+            self._added.update(written)
+            self._removed.difference_update(written)
+    
+    def close(self) -> None:
+        """Close the pack being written and the index."""
+        with self._lock:
+            self._close_pack()
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            self._maps.clear()
+    
+    def compact(self) -> int:
+        """
+        Copy the live images into new packs and delete the old ones.
+        
+        Returns:
+            Bytes of dead space reclaimed
+        """
+        with self._lock, self._locks.hold(PACK_INDEX_SLOT):
+            self._close_pack()
+            self._open_index()
+            locations = self._live_locations()
+            # Packs another run is appending to are left as they are
+            old_numbers = [number for number in self._pack_numbers() if self._locks.acquire(pack_slot(number), blocking=False)]
+            try:
+                before = sum(os.path.getsize(self._pack_path(number)) for number in old_numbers)
+            
+                moving = {name: location for name, location in locations.items() if location[0] in old_numbers}
+                self._added = {name: location for name, location in locations.items() if name not in moving}
+                # Pack order keeps the reads sequential
+                for name, location in sorted(moving.items(), key=lambda item: item[1]):
+                    self._write_record(name, self._buffer_at(location, locked=True), fresh=True)
+                self._close_pack()
+                new_numbers = {self._added[name][0] for name in moving}
+                self._write_index(dict(self._added))
+            
+                for number in old_numbers:
+                    self._maps.pop(number, None)
+                    try:
+                        os.remove(self._pack_path(number))
+                    except OSError as e:
+                        # Still mapped on Windows; it holds no live images and
+                        # is removed by the next compaction
+                        logging.warning(f"Could not remove {self._pack_path(number)}: {e}")
+                after = sum(os.path.getsize(self._pack_path(number)) for number in new_numbers)
+            finally:
+                for number in old_numbers:
+                    self._locks.release(pack_slot(number))
+        
+        logging.info(f"Compacted {len(moving)} images into {len(self._pack_numbers())} packs")
+        return max(0, before - after)
+    
+    def _location(self, name: str) -> Optional[tuple[int, int, int]]:
+        """Pack number, data offset and data length of a stored image."""
+        location = self._added.get(name)
+        if location is not None:
+            return location
+        if name in self._removed or self._index is None:
+            return None
+        location = self._found.get(name)
+        if location is None:
+            try:
+                location = self._found[name] = self._index[name]
+            except KeyError:
+                return None
+        return location
+    
+    def _stored_buffer(self, name: str) -> Optional[memoryview]:
+        """View of a stored image, None if the store does not hold it."""
+        location = self._location(name)
+        if location is None:
+            return None
+        try:
+            return self._buffer_at(location)
+        except FileNotFoundError:
+            # Its pack was compacted away by another run
+            if not self.refresh():
+                raise
+        location = self._location(name)
+        return None if location is None else self._buffer_at(location)
+    
+    def _open_index(self) -> None:
+        """
+        Open the index as it is on disk, rebuilding it from the packs if it
+        is missing or unreadable, with the lock and index lock held.
+        """
+        # A replaced index is left to lookups still reading it
+        self._index = None
+        self._found.clear()
+        self._index_stamp = file_stamp(self.index_path)
+        try:
+            self._index = CardIndex(self.index_path, _decode_location)
+        except FileNotFoundError:
+            if self._pack_numbers():
+                self._rebuild_index()
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read {self.index_path} ({e}), rebuilding the pack index")
+            self._rebuild_index()
+    
+    def _live_locations(self) -> dict[str, tuple[int, int, int]]:
+        """Locations of every stored image, with the lock held."""
+        locations = {}
+        if self._index is not None:
+            for name, span in self._index.record_spans().items():
+                if name not in self._removed:
+                    locations[name] = _LOCATION.unpack(self._index.read_span(span))
+        locations.update(self._added)
+        return locations
+    
+    def _write_index(self, locations: dict[str, tuple[int, int, int]]) -> None:
+        """Replace the index with the given locations, with the lock held."""
+        write_card_index(self.index_path, (
+            (name, _LOCATION.pack(*location)) for name, location in locations.items()
+        ))
+        self._index = CardIndex(self.index_path, _decode_location)
+        self._index_stamp = file_stamp(self.index_path)
+        self._added.clear()
+        self._removed.clear()
+        self._found.clear()
+    
+    def _rebuild_index(self) -> None:
+        """Recover the index by scanning every pack, later records winning, with the locks held."""
+        for number in self._pack_numbers():
+            for name, offset, length in _scan_pack(self._pack_path(number)):
+                self._added[name] = (number, offset, length)
+        self._write_index(dict(self._added))
+    
+    def _append(self, name: str, data: bytes) -> None:
+        with self._lock:
+            self._write_record(name, data)
+    
+    def _write_record(self, name: str, data: bytes, fresh: bool = False) -> None:
+        """Append an image to the current pack, with the lock held."""
+        encoded = name.encode('utf-8')
+        pack = self._writable_pack(fresh)
+        offset = pack.tell() + _RECORD.size + len(encoded)
+        pack.write(_RECORD.pack(_RECORD_MAGIC, len(encoded), len(data)) + encoded)
+        pack.write(data)
+        # Readers map the pack file, so data must not sit in the buffer
+        pack.flush()
+        
+        location = (self._pack_number, offset, len(data))
+        self._added[name] = location
+        self._removed.discard(name)
+        if self._own_pack:
+            self._written[name] = location
+    
+    def _writable_pack(self, fresh: bool) -> BinaryIO:
+        """Return the pack to append to, opening or starting one as needed."""
+        if self._pack is not None and self._pack.tell() < PACK_SIZE_LIMIT:
+            return self._pack
+        self._close_pack()
+        
+        numbers = self._pack_numbers()
+        if numbers and not fresh and not self._own_pack:
+            # Unless another run is appending to it
+            newest = numbers[-1]
+            if self._locks.acquire(pack_slot(newest), blocking=False):
+                if os.path.exists(self._pack_path(newest)) and os.path.getsize(self._pack_path(newest)) < PACK_SIZE_LIMIT:
+                    self._pack_number = newest
+                    self._pack = open(self._pack_path(newest), 'ab')
+                    return self._pack
+                self._locks.release(pack_slot(newest))
+        
+        number = numbers[-1] + 1 if numbers else 0
+        while True:
+            if self._locks.acquire(pack_slot(number), blocking=False):
+                try:
+                    self._pack = open(self._pack_path(number), 'xb')
+                except FileExistsError:
+                    self._locks.release(pack_slot(number))
+                else:
+                    self._pack_number = number
+                    return self._pack
+            # Taken by another run or worker process
+            number += 1
+    
+    def _close_pack(self) -> None:
+        if self._pack is not None:
+            self._pack.close()
+            self._pack = None
+            self._locks.release(pack_slot(self._pack_number))
+    
+    def _buffer_at(self, location: tuple[int, int, int], locked: bool = False) -> memoryview:
+        """View of an image's bytes in its memory-mapped pack."""
+        number, offset, length = location
+        if locked:
+            mapped = self._map(number, offset + length)
+        else:
+            with self._lock:
+                mapped = self._map(number, offset + length)
+        return memoryview(mapped)[offset:offset + length]
+    
+    def _map(self, number: int, end: int) -> mmap.mmap:
+        """Map a pack, mapping it again if it has grown past the old mapping."""
+        mapped = self._maps.get(number)
+        if mapped is None or len(mapped) < end:
+            # An outgrown mapping is left to images still viewing it
+            with open(self._pack_path(number), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[number] = mapped
+        return mapped
+    
+    def _pack_numbers(self) -> list[int]:
+        numbers = []
+        for file_name in os.listdir(self.directory):
+            match = _PACK_FILE.match(file_name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+    
+    def _pack_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"pack-{number:05d}.pack")
+
+
+class _AtomicWriter(io.BufferedWriter):
+    """Writes a file under a temporary name and renames it into place when closed."""
+    
+    def __init__(self, name: str):
+        self._final_name = name
+        self._temp_name = f"{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        super().__init__(io.FileIO(self._temp_name, 'wb'))
+    
+    def close(self) -> None:
+        if not self.closed:
+            super().close()
+            os.replace(self._temp_name, self._final_name)
+    
+    def discard(self) -> None:
+        """Close and delete the temporary file without storing it."""
+        if not self.closed:
+            super().close()
+        try:
+            os.remove(self._temp_name)
+        except FileNotFoundError:
+            pass
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+class _PackWriter(io.BytesIO):
+    """Buffers one image and appends it to the pack store when closed."""
+    
+    def __init__(self, store: PackStore, name: str):
+        super().__init__()
+        self._store = store
+        self._name = name
+    
+    def close(self) -> None:
+        if not self.closed:
+            data = self.getvalue()
+            super().close()
+            self._store._append(self._name, data)
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            # Never store a partly written image
+            super().close()
+        else:
+            self.close()
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable file over a memory-mapped image, so decoders read it in place."""
+    
+    def __init__(self, buffer: memoryview):
+        super().__init__()
+        self._buffer = buffer
+        self._position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._buffer) if size is None or size < 0 else min(len(self._buffer), self._position + size)
+        data = self._buffer[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return data
+    
+    def readall(self) -> bytes:
+        return self.read()
+    
+    def readinto(self, target) -> int:
+        count = max(0, min(len(target), len(self._buffer) - self._position))
+        target[:count] = self._buffer[self._position:self._position + count]
+        self._position += count
+        return count
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._position = max(0, offset)
+        return self._position
+    
+    def tell(self) -> int:
+        return self._position
+
+
+def _decode_location(name: str, record: bytes) -> tuple[int, int, int]:
+    return _LOCATION.unpack(record)
+
+
+def _scan_pack(path: str) -> Iterator[tuple[str, int, int]]:
+    """Yield (name, data offset, data length) of each complete record in a pack."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            magic, name_length, data_length = _RECORD.unpack(header)
+            if magic != _RECORD_MAGIC:
+                logging.warning(f"Corrupt record at {offset} in {path}, ignoring the rest of the pack")
+                return
+            name = f.read(name_length).decode('utf-8')
+            data_offset = offset + _RECORD.size + name_length
+            offset = data_offset + data_length
+            if f.seek(offset) > size:
+                # Cut off by a crash while appending
+                return
+            yield name, data_offset, data_length
+
+
+def _worker_store(directory: str) -> PackStore:
+    """The pack store of this worker process."""
+    store = _worker_stores.get(directory)
+    if store is None:
+        store = _worker_stores[directory] = PackStore(directory, own_pack=True)
+    return store
+
+
+def migrate_cache(storage: str) -> int:
+    """
+    Move the cached images into the layout of another store.
+    
+    Moving to packs appends every file of the directory layout to the
+    pack store and deletes the files once the index is saved. Moving to
+    directories writes every packed image to its file and deletes the
+    packs. The manifest is unchanged, since names are the same in both.
+    
+    Args:
+        storage: Target store, 'directory' or 'pack'
+    
+    Returns:
+        Number of images moved
+    
+    Raises:
+        ValueError: If storage is not a known store
+    """
+    if storage not in CACHE_STORAGES:
+        raise ValueError(f"Unknown cache_storage '{storage}', expected {' or '.join(CACHE_STORAGES)}")
+    
+    if storage == 'pack':
+        store = PackStore()
+        names = list(_directory_files())
+        for name in names:
+            with open(name, 'rb') as source, store.create(name) as target:
+                target.write(source.read())
+        store.save()
+        DirectoryStore().remove(names)
+        logging.info(f"Moved {len(names)} cached images into {PACK_DIRECTORY}")
+        return len(names)
+    
+    if not os.path.exists(PACK_DIRECTORY):
+        return 0
+    store = PackStore()
+    names = list(store.names())
+    directory_store = DirectoryStore()
+    for name in names:
+        with store.open(name) as source, directory_store.create(name) as target:
+            target.write(source.read())
+    store.close()
+    for file_name in os.listdir(PACK_DIRECTORY):
+        os.remove(os.path.join(PACK_DIRECTORY, file_name))
+    os.rmdir(PACK_DIRECTORY)
+    logging.info(f"Moved {len(names)} cached images out of {PACK_DIRECTORY}")
+    return len(names)
+
+
+def _directory_files() -> Iterator[str]:
+    """Names of the cache files kept in the directory layout."""
+    for root_directory in CACHE_DIRECTORIES:
+        if not os.path.isdir(root_directory):
+            continue
+        for directory, subdirectories, file_names in os.walk(root_directory):
+            parts = directory.replace(os.sep, '/').split('/')
+            if directory == root_directory:
+                # Skip the packs themselves, and the user images of
+                # custom_cards and cardbacks outside their DPI folders
+                subdirectories[:] = [
+                    sub for sub in subdirectories
+                    if sub != os.path.basename(PACK_DIRECTORY) and (root_directory == 'image_cache' or sub.isdigit())
+                ]
+                if root_directory != 'image_cache':
+                    continue
+            for file_name in file_names:
+                if file_name in ('manifest.json', 'cache.lock') or file_name.endswith('.tmp'):
+                    continue
+                yield '/'.join(parts + [file_name])
@@ -27,8 +27,22 @@ class Config:
     user_agent: str = 'decklist_to_pdf/0.1'
     accept: str = 'application/json;q=0.9,*/*;q=0.8'
     worker_threads: int = 4
+    image_processes: int = 0
+    download_threads: int = 8
+    download_rate: float = 10.0
+    image_cache_mb: int = 1024
+    cache_format: str = 'auto'
+    cache_compress_level: int = 6
+    cache_storage: str = 'directory'
     dpi: int = 600
     bulk_json_path: str = ''
+    bulk_compressed: bool = False
+    name_preference: str = 'newest'
+    warm_profiles: str = ''
+    pdf_composition: str = 'page'
+    pdf_compression: str = 'flate'
+    pdf_compress_level: int = 6
+    pdf_jpeg_quality: int = 90
 
 
 @dataclass
@@ -47,6 +61,104 @@ class DecklistEntry:
     sides: list[CardSide] = field(default_factory=list)
 
 
+@dataclass
+class IndexUpdate:
+    """Differences found while updating the card index to a new bulk file."""
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    # Changed cards whose image_uris differ, so their cached images are stale
+    stale_images: list[str] = field(default_factory=list)
+    # Card objects reused from the previous index without decoding
+    unchanged: int = 0
+
+
+@dataclass(frozen=True)
+class ImageRequest:
+    """One card image the decklist needs, before it is looked up in the cache."""
+    key: str
+    # Image URL, or custom image file with its modification time
+    source: str
+    # Where the original image is or will be saved
+    download_path: str
+    # Processed file path without parameter hash and extension
+    output_base: str
+    # Whether the image gets gamma correction
+    correct: bool = False
+
+
+@dataclass
+class ImageJob:
+    """Work planned to bring one card image into the processed image cache."""
+    key: str
+    # Image URL, or custom image file with its modification time
+    source: str
+    # File to decode; None until the image is downloaded
+    input_path: Optional[str] = None
+    # Where the download is saved
+    download_path: Optional[str] = None
+    # Resized copy to write, None when input_path is already resized
+    resized_path: Optional[str] = None
+    # Gamma corrected copy to write, None without correction
+    corrected_path: Optional[str] = None
+    downloaded: Optional[bytes] = None
+
+
+@dataclass
+class DownloadStats:
+    """Counters kept by the image download engine."""
+    requests: int = 0
+    retries: int = 0
+    # 429 responses, each of which slowed the shared rate limit down
+    throttled: int = 0
+    bytes: int = 0
+    # Total time download threads waited on the rate limit
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class CacheStats:
+    """Counters kept by the image processor across create_cache calls."""
+    downloaded: int = 0
+    processed: int = 0
+    # Images found already processed in the cache
+    reused: int = 0
+    # Bytes of cache files written
+    bytes_written: int = 0
+    # Images that could not be downloaded or processed
+    failed: int = 0
+
+
+@dataclass
+class PdfImage:
+    """Image XObject ready to be written to a PDF."""
+    width: int
+    height: int
+    # PDF colour space name, e.g. DeviceRGB
+    color_space: str
+    # PDF stream filter name, e.g. DCTDecode or FlateDecode
+    filter: str
+    # Encoded image stream
+    data: bytes
+    # Entries of the DecodeParms dictionary, empty for none
+    decode_parms: str = ''
+    # Deflated 1-bit stencil of the same size, from stencil_mask; pixels
+    # with a 1 are not painted. Empty to paint the whole image
+    mask: bytes = b''
+
+
+@dataclass
+class RenderedPage:
+    """A page ready to be written to the PDF."""
+    page_index: int
+    # 0 for front, 1 for back
+    side: int
+    # Content stream drawing the page
+    content: bytes
+    # Images the content draws, by the name it uses
+    images: dict[str, PdfImage] = field(default_factory=dict)
+
+
 @dataclass
 class LayoutConstants:
     """Pre-calculated layout constants for page rendering."""
@@ -73,9 +185,6 @@ class LayoutConstants:
     # DPI setting
     dpi: int = 600
     
-    # img2pdf layout function
-    a4_layout: Optional[object] = None
-    
     # Deck info
     deck_size: int = 0
     total_pages: int = 0
@@ -86,7 +195,9 @@ GAMMA_THRESHOLD = 3  # Target brightness for black borders
 MAX_GAMMA = 100  # Maximum allowed border brightness (skip if brighter)
 BORDER_SAMPLE_OFFSET = 0.02  # Sample 2% from bottom edge
 RETRY_COUNT = 3  # Number of retries for image operations
-RATE_LIMIT_DELAY = 0.1  # Seconds between API calls
+# Deprecated and unused: downloads are paced by Config.download_rate. Kept
+# so scripts importing it from the package still load.
+RATE_LIMIT_DELAY = 0.1
 
 # Card dimensions in mm (MTG standard)
 CARD_WIDTH_MM = 63
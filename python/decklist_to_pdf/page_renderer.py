@@ -1,19 +1,30 @@
 """
 Decklist to PDF - Page Rendering
 
-Handles page layout calculation and rendering cards onto pages.
+Handles page layout calculation and rendering cards onto pages. Pages
+are rasterized only where cards are; the background box and reference
+markers are drawn as PDF vector rectangles around the raster. Pages are
+rendered in print order, a few ahead of the one being written, each as
+soon as its card images are in the cache.
 """
 import io
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
 
-import img2pdf
 from PIL import Image, ImageDraw
 
+from .image_cache import ImageCache
+from .pdf_writer import fill_rectangles, flate_image, jpeg_image, place_image, stencil_mask
 from .models import (
     Config,
     LayoutConstants,
+    PdfImage,
+    RenderedPage,
     CARD_WIDTH_MM,
     CARD_HEIGHT_MM,
     PAGE_WIDTH_MM,
@@ -21,9 +32,30 @@ from .models import (
     BG_BOX_MARGIN_MM,
     GRID_ROWS,
     GRID_COLS,
+    CARDS_PER_PAGE,
 )
 
 
+# A4 in PDF points
+PAGE_SIZE_PT = (PAGE_WIDTH_MM * 72 / 25.4, PAGE_HEIGHT_MM * 72 / 25.4)
+
+# How rendered images are compressed in the PDF
+PDF_COMPRESSIONS = ('flate', 'jpeg')
+
+# Page ordering patterns for different printing modes
+PAGE_PATTERNS = {
+    'two_sided_stagger': [[0, 0], [1, 0], [0, 1], [1, 1]],  # F1, F2, B1, B2
+    'two_sided_normal': [[0, 0], [0, 1], [1, 0], [1, 1]],   # F1, B1, F2, B2
+    'one_sided': [[0, 0], [1, 0]],                          # F1, F2
+}
+
+# Finished pages waiting to be written, per worker thread; bounds the
+# memory held by rendered pages
+PAGES_AHEAD_PER_WORKER = 2
+
+T = TypeVar('T')
+
+
 def generate_layout_constants(config: Config) -> LayoutConstants:
     """
     Calculate all layout constants based on configuration.
@@ -87,10 +119,6 @@ def generate_layout_constants(config: Config) -> LayoutConstants:
             row_positions.append([int(x), int(y)])
         card_positions_px.append(row_positions)
     
-    # img2pdf A4 layout
-    a4_points = (img2pdf.mm_to_pt(PAGE_WIDTH_MM), img2pdf.mm_to_pt(PAGE_HEIGHT_MM))
-    a4_layout = img2pdf.get_layout_fun(a4_points)
-    
     # Determine image format
     image_type = config.image_type
     if image_type in {'small', 'normal', 'large', 'art_crop', 'border_crop'}:
@@ -110,7 +138,6 @@ def generate_layout_constants(config: Config) -> LayoutConstants:
         card_positions_px=card_positions_px,
         image_format=image_format,
         dpi=dpi,
-        a4_layout=a4_layout,
     )
 
 
@@ -133,133 +160,339 @@ def _calculate_marker_rects(center_x: float, center_y: float, mm_to_px) -> list:
     return marker_rects
 
 
+def page_order(config: Config, total_pages: int) -> list[tuple[int, int]]:
+    """
+    Return the (page_index, side) of every output page, in print order.
+    
+    Args:
+        config: Configuration object, for two_sided and stagger
+        total_pages: Pages per side
+    """
+    if config.two_sided and config.stagger:
+        pattern = PAGE_PATTERNS['two_sided_stagger']
+    elif config.two_sided:
+        pattern = PAGE_PATTERNS['two_sided_normal']
+    else:
+        pattern = PAGE_PATTERNS['one_sided']
+    
+    order = []
+    for page_index in range(0, total_pages, 2):
+        for page_offset, side in pattern:
+            if page_index + page_offset < total_pages:
+                order.append((page_index + page_offset, side))
+    return order
+
+
+def print_order_decklist(decklist: list[dict], config: Config) -> list[dict]:
+    """
+    Reorder the card sides of a decklist into the order their pages print.
+    
+    Passed to create_cache, images are fetched in the order pages need
+    them, so the first pages can render while the rest still download.
+    
+    Args:
+        decklist: List of decklist entries
+        config: Configuration object, for two_sided and stagger
+    
+    Returns:
+        One entry per printed card side in page order, then the decklist
+        itself for any side no page prints
+    """
+    total_pages = (len(decklist) + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
+    entries = []
+    for page_index, side in page_order(config, total_pages):
+        for entry in decklist[page_index * CARDS_PER_PAGE:(page_index + 1) * CARDS_PER_PAGE]:
+            sides = entry.get('sides') or []
+            if side < len(sides):
+                entries.append({'sides': [sides[side]]})
+    return entries + decklist
+
+
+def run_when_ready(
+    tasks: Iterable[tuple[list[str], Callable[[], T]]],
+    executor: Executor,
+    window: int,
+    image_cache: ImageCache,
+    cache_ready: Optional[Future] = None
+) -> Iterator[T]:
+    """
+    Run tasks on an executor once their card images are cached, in order.
+    
+    Each task starts as soon as every key it names is in image_cache, at
+    most window tasks ahead of the result the caller is on. Without
+    cache_ready every image is taken to be cached already.
+    
+    Args:
+        tasks: Card keys each task reads, and the task
+        executor: Pool to run the tasks on
+        window: Most tasks started but not yet taken by the caller
+        image_cache: Card images, filling while cache_ready runs
+        cache_ready: create_cache running in the background
+    
+    Yields:
+        Task results, in task order
+    
+    Raises:
+        Exception: Whatever a task or create_cache raised
+    """
+    changed = threading.Event()
+    
+    def notify(*_) -> None:
+        changed.set()
+    
+    def ready(keys: list[str]) -> bool:
+        if cache_ready is None or all(image_cache.resolved(key) for key in keys):
+            return True
+        if cache_ready.done():
+            # Raises if caching failed; otherwise the task reports the missing image
+            cache_ready.result()
+            return True
+        return False
+    
+    waiting = deque(tasks)
+    pending = deque()
+    if cache_ready is not None:
+        image_cache.add_listener(notify)
+        cache_ready.add_done_callback(notify)
+    try:
+        while waiting or pending:
+            # Cleared before looking, so a change while looking wakes the wait below
+            changed.clear()
+            if pending and pending[0].done():
+                yield pending.popleft().result()
+            elif waiting and len(pending) < window and ready(waiting[0][0]):
+                future = executor.submit(waiting.popleft()[1])
+                future.add_done_callback(notify)
+                pending.append(future)
+            else:
+                changed.wait()
+    finally:
+        image_cache.remove_listener(notify)
+        # After a failure, or when the caller stops early, skip tasks not started yet
+        for future in pending:
+            future.cancel()
+
+
+def pdf_box(constants: LayoutConstants, x0: float, y0: float, x1: float, y1: float) -> tuple[float, float, float, float]:
+    """
+    Convert a page pixel box to PDF page coordinates.
+    
+    Page pixels are scaled to fill A4, the width and height each on their own.
+    
+    Args:
+        constants: Layout constants
+        x0, y0, x1, y1: Box in pixels, from the top left, x1 and y1 exclusive
+    
+    Returns:
+        (x, y, width, height) in points, from the bottom left
+    """
+    scale_x = PAGE_SIZE_PT[0] / constants.page_width_px
+    scale_y = PAGE_SIZE_PT[1] / constants.page_height_px
+    return x0 * scale_x, PAGE_SIZE_PT[1] - y1 * scale_y, (x1 - x0) * scale_x, (y1 - y0) * scale_y
+
+
+def background_content(constants: LayoutConstants) -> bytes:
+    """Content stream operators drawing the black background box."""
+    x0, y0, x1, y1 = constants.bg_box
+    # Pixel fills include their last row and column
+    return fill_rectangles([pdf_box(constants, x0, y0, x1 + 1, y1 + 1)])
+
+
+def reference_points_content(constants: LayoutConstants) -> bytes:
+    """Content stream operators drawing the reference markers."""
+    return fill_rectangles([pdf_box(constants, x0, y0, x1 + 1, y1 + 1) for x0, y0, x1, y1 in constants.marker_rects])
+
+
+def card_placements(page_index: int, side: int, decklist: list[dict], constants: LayoutConstants) -> list[tuple[str, int, int]]:
+    """
+    Return the card key and top left pixel position of every card on a page.
+    
+    Back sides have their columns flipped, so they line up with their fronts
+    when printed two-sided.
+    """
+    placements = []
+    card_index_start = page_index * CARDS_PER_PAGE
+    for card_index in range(card_index_start, min(card_index_start + CARDS_PER_PAGE, constants.deck_size)):
+        row_index, col_index = divmod(card_index - card_index_start, GRID_COLS)
+        x_index = GRID_COLS - 1 - col_index if side == 1 else col_index
+        x, y = constants.card_positions_px[row_index][x_index]
+        placements.append((decklist[card_index]['sides'][side]['key'], x, y))
+    return placements
+
+
+def encode_image(img: Image.Image, config: Config, executor: Optional[Executor] = None) -> PdfImage:
+    """
+    Compress a rendered image for the PDF as pdf_compression sets.
+    
+    Args:
+        img: Decoded image
+        config: Configuration object
+        executor: Pool to deflate bands of the image on in parallel
+    
+    Raises:
+        ValueError: If pdf_compression is not a known compression
+    """
+    if config.pdf_compression == 'flate':
+        return flate_image(img, config.pdf_compress_level, executor)
+    if config.pdf_compression == 'jpeg':
+        buffer = io.BytesIO()
+        img.convert('RGB').save(buffer, 'JPEG', quality=config.pdf_jpeg_quality)
+        return jpeg_image(buffer.getvalue())
+    raise ValueError(f"Unknown pdf_compression '{config.pdf_compression}', expected {' or '.join(PDF_COMPRESSIONS)}")
+
+
 def render_page(
     page_index: int,
     side: int,
     decklist: list[dict],
-    image_cache: dict[str, Image.Image],
+    image_cache: ImageCache,
     constants: LayoutConstants,
     config: Config,
-    pages: dict[str, io.BytesIO]
-) -> None:
+    compressor: Optional[Executor] = None
+) -> Optional[RenderedPage]:
     """
     Render a single page with up to 9 cards.
     
+    Only the box around the cards is rasterized. The background box and
+    reference markers are vector rectangles, drawn under and over it; with
+    the background box, the raster is masked to its cards so the box shows
+    through between them and in empty slots. The raster is compressed
+    straight into the PDF image stream, without an intermediate image file.
+    
     Args:
         page_index: Index of the page (0-based)
         side: 0 for front, 1 for back
         decklist: List of decklist entries
-        image_cache: Dictionary of cached card images
+        image_cache: Card images; each placed card releases one expected use
         constants: Layout constants
         config: Configuration object
-        pages: Output dictionary for page buffers
-    """
-    card_index_start = page_index * 9
-    deck_size = constants.deck_size
+        compressor: Pool to compress bands of the raster on in parallel
     
-    if card_index_start >= deck_size:
-        return
+    Returns:
+        The page, or None if the deck has no cards for it
+    """
+    placements = card_placements(page_index, side, decklist, constants)
+    if not placements:
+        return None
     
-    # Create blank A4 page
-    page_image = Image.new(
-        'RGB',
-        (constants.page_width_px, constants.page_height_px),
-        color=(255, 255, 255)
-    )
-    draw = ImageDraw.Draw(page_image)
+    # Raster of the box around the cards
+    left = min(x for _, x, _ in placements)
+    top = min(y for _, _, y in placements)
+    right = max(x for _, x, _ in placements) + constants.card_width_px
+    bottom = max(y for _, _, y in placements) + constants.card_height_px
+    side_name = 'front' if side == 0 else 'back'
     
-    # Draw background rectangle (if enabled)
-    if config.background_box:
-        draw.rectangle(constants.bg_box, fill=(0, 0, 0), width=0)
+    compose_start = perf_counter()
+    page_image = Image.new('RGB', (right - left, bottom - top), color=(255, 255, 255))
     
     # Place cards on page
-    card_index = card_index_start
-    placement_times = []
-    
-    for row_index in range(GRID_ROWS):
-        for col_index in range(GRID_COLS):
-            if card_index >= deck_size:
-                break
-            
-            timer_start = perf_counter()
-            card = decklist[card_index]
-            
-            # Get image from cache
-            key = card['sides'][side]['key']
-            img = image_cache.get(key)
-            
-            if img is None:
-                logging.error(f"Image not found in cache for key: {key}")
-                raise KeyError(f"Missing image: {key}")
-            
-            # For back side, flip column position for alignment
-            x_index = 2 - col_index if side == 1 else col_index
-            
-            draw_x = constants.card_positions_px[row_index][x_index][0]
-            draw_y = constants.card_positions_px[row_index][x_index][1]
+    for key, x, y in placements:
+        img = image_cache.get(key)
             
-            page_image.paste(img, (draw_x, draw_y))
+        if img is None:
+            logging.error(f"Image not found in cache for key: {key}")
+            raise image_cache.missing(key)
             
-            card_index += 1
-            placement_times.append(perf_counter() - timer_start)
-    
-    # Draw reference points
-    if config.reference_points:
-        for rect in constants.marker_rects:
-            draw.rectangle(rect, fill=(0, 0, 0), width=0)
+        page_image.paste(img, (x - left, y - top))
+        image_cache.release(key)
+    logging.info(f"Composed page {page_index} {side_name} in {(perf_counter() - compose_start) * 1000:.0f}ms")
     
     # Convert to PDF page
-    side_name = 'front' if side == 0 else 'back'
+    encode_start = perf_counter()
+    image = encode_image(page_image, config, compressor)
+    logging.info(
+        f"Compressed page {page_index} {side_name} in {(perf_counter() - encode_start) * 1000:.0f}ms "
+        f"({len(image.data) / 1e6:.1f} MB {config.pdf_compression})"
+    )
     
-    buffer_start = perf_counter()
-    buffer = io.BytesIO()
-    page_image.save(buffer, format='PNG')
-    buffer.seek(0)
-    logging.info(f"Buffered page {page_index} {side_name} in {(perf_counter() - buffer_start) * 1000:.0f}ms")
+    # The background box is drawn once, under the raster, and shows
+    # between cards and in empty slots
+    if config.background_box:
+        image.mask = _cards_mask(placements, left, top, page_image.size, constants)
     
-    pdf_start = perf_counter()
-    pdf_bytes = img2pdf.convert(buffer, layout_fun=constants.a4_layout)
-    if pdf_bytes is None:
-        raise ValueError(f"img2pdf.convert returned None for page {page_index}, side {side}")
+    content = [
+        background_content(constants) if config.background_box else b'',
+        place_image('P', *pdf_box(constants, left, top, right, bottom)),
+        reference_points_content(constants) if config.reference_points else b'',
+    ]
+    return RenderedPage(page_index, side, b''.join(content), {'P': image})
+
+
+def _cards_mask(
+    placements: list[tuple[str, int, int]],
+    left: int,
+    top: int,
+    size: tuple[int, int],
+    constants: LayoutConstants
+) -> bytes:
+    """
+    Stencil mask of a page raster that paints only its cards.
     
-    pages[f"{page_index},{side}"] = io.BytesIO(pdf_bytes)
-    logging.info(f"PDF for page {page_index} {side_name} in {(perf_counter() - pdf_start) * 1000:.0f}ms")
+    Returns:
+        Mask for PdfImage.mask, empty if the cards fill the raster
+    """
+    mask = Image.new('1', size, 1)
+    draw = ImageDraw.Draw(mask)
+    for _, x, y in placements:
+        draw.rectangle((x - left, y - top, x - left + constants.card_width_px - 1, y - top + constants.card_height_px - 1), fill=0)
+    if mask.getextrema() == (0, 0):
+        return b''
+    return stencil_mask(mask)
 
 
 def render_all_pages(
     decklist: list[dict],
-    image_cache: dict[str, Image.Image],
+    image_cache: ImageCache,
     constants: LayoutConstants,
-    config: Config
-) -> dict[str, io.BytesIO]:
+    config: Config,
+    cache_ready: Optional[Future] = None
+) -> Iterator[RenderedPage]:
     """
-    Render all pages for the decklist.
+    Render all pages for the decklist, in print order.
+    
+    Pages are rendered on worker_threads in the order of page_order, at
+    most PAGES_AHEAD_PER_WORKER per thread ahead of the page the caller is
+    on, so finished pages wait only in that small window until the caller
+    takes them. With create_cache still running, each page starts as soon
+    as its card images are in the cache.
     
     Args:
         decklist: List of decklist entries
-        image_cache: Dictionary of cached card images
+        image_cache: Card images, evicted from memory after their last page
         constants: Layout constants
         config: Configuration object
+        cache_ready: create_cache running in the background, None if the
+            cache is complete
         
-    Returns:
-        Dictionary mapping "page_index,side" to PDF BytesIO buffers
+    Yields:
+        Rendered pages, in the order they are printed
+        
+    Raises:
+        KeyError: If a card has no image in the cache
     """
     logging.info("Rendering pages as images...")
-    pages: dict[str, io.BytesIO] = {}
+    order = page_order(config, constants.total_pages)
+    placements = [card_placements(page_index, side, decklist, constants) for page_index, side in order]
     
-    with ThreadPoolExecutor(max_workers=config.worker_threads) as executor:
-        # Submit front pages
-        for i in range(constants.total_pages):
-            logging.info(f'Submitting render page {i} front')
-            executor.submit(render_page, i, 0, decklist, image_cache, constants, config, pages)
-        
-        # Submit back pages if two-sided
-        if config.two_sided:
-            for i in range(constants.total_pages):
-                logging.info(f'Submitting render page {i} back')
-                executor.submit(render_page, i, 1, decklist, image_cache, constants, config, pages)
-        
-        executor.shutdown(wait=True)
+    # Announce the card uses in render order, so each image leaves memory
+    # after its last page
+    image_cache.expect(key for page in placements for key, _, _ in page)
+    
+    def task(page_index: int, side: int) -> Callable[[], Optional[RenderedPage]]:
+        def render() -> Optional[RenderedPage]:
+            logging.info(f"Rendering page {page_index} {'front' if side == 0 else 'back'}")
+            return render_page(page_index, side, decklist, image_cache, constants, config, compressor)
+        return render
+    
+    # Deflating bands of a raster releases the GIL, so its own pool keeps
+    # every core busy even when fewer pages than cores are left
+    window = PAGES_AHEAD_PER_WORKER * config.worker_threads
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as compressor, \
+            ThreadPoolExecutor(max_workers=config.worker_threads) as executor:
+        tasks = [
+            ([key for key, _, _ in page], task(page_index, side))
+            for (page_index, side), page in zip(order, placements)
+        ]
+        yield from run_when_ready(tasks, executor, window, image_cache, cache_ready)
     
     logging.info("Finished rendering pages as images.")
-    return pages
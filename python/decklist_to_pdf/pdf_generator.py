@@ -1,81 +1,226 @@
 """
 Decklist to PDF - PDF Generation
 
-Handles merging rendered pages into final PDF output.
+Writes rendered pages into the final PDF as they arrive, or composes the
+PDF directly from card images when pdf_composition is card. Either way
+the output file is written in one pass, with no merge afterwards.
 """
-import io
 import logging
+import warnings
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import Iterable, Optional, Union
 
-from PyPDF2 import PdfMerger
+from .image_cache import ImageCache
+from .image_files import CACHE_EXTENSIONS
+from .models import Config, LayoutConstants, PdfImage, RenderedPage
+from .page_renderer import (
+    PAGE_SIZE_PT,
+    PAGES_AHEAD_PER_WORKER,
+    background_content,
+    card_placements,
+    encode_image,
+    page_order,
+    pdf_box,
+    reference_points_content,
+    run_when_ready,
+)
+from .pdf_writer import PdfWriter, jpeg_image, place_image
 
-from .models import Config, LayoutConstants
 
+# How pages are composed: whole page rasters, or card images placed on pages
+PDF_COMPOSITIONS = ('page', 'card')
 
-# Page ordering patterns for different printing modes
-PAGE_PATTERNS = {
-    'two_sided_stagger': [[0, 0], [1, 0], [0, 1], [1, 1]],  # F1, F2, B1, B2
-    'two_sided_normal': [[0, 0], [0, 1], [1, 0], [1, 1]],   # F1, B1, F2, B2
-    'one_sided': [[0, 0], [1, 0]],                          # F1, F2
-}
+
+def write_pages(pages: Iterable[RenderedPage], output_name: str) -> str:
+    """
+    Write rendered pages into a PDF file as they arrive.
+    
+    Each page is appended to the file and dropped before the next one is
+    taken, so memory holds one page however long the deck is. The page
+    tree and cross-reference table are written at the end.
+    
+    Args:
+        pages: Rendered pages in print order, e.g. from render_all_pages
+        output_name: Name for the output file (without extension)
+        
+    Returns:
+        Path to the generated PDF file
+    """
+    output_path = f"output/{output_name}.pdf"
+    logging.info(f"Writing pages into {output_name} PDF...")
+    
+    try:
+        with open(output_path, 'wb') as f:
+            writer = PdfWriter(f, PAGE_SIZE_PT)
+            for page in pages:
+                images = {name: writer.add_image(image) for name, image in page.images.items()}
+                writer.add_page(page.content, images)
+            writer.close()
+        logging.info(f"PDF created successfully at {output_path} with {writer.page_count} pages")
+        return output_path
+        
+    except Exception as e:
+        logging.error(f"Error writing PDF: {e}")
+        raise
 
 
 def merge_pages(
-    pages: dict[str, io.BytesIO],
+    pages: Union[Mapping[str, RenderedPage], Iterable[RenderedPage]],
     config: Config,
     constants: LayoutConstants,
     output_name: str
 ) -> str:
     """
-    Merge rendered page buffers into a single PDF file.
+    Write rendered pages into a PDF file.
+    
+    Deprecated: use write_pages, which takes the pages of render_all_pages
+    as they finish. Kept so callers of the earlier API keep working; the
+    pages are written through PdfWriter the same way.
     
     Args:
-        pages: Dictionary mapping "page_index,side" to PDF BytesIO buffers
-        config: Configuration object
-        constants: Layout constants
+        pages: Rendered pages in print order, or a dictionary of them keyed
+            "page_index,side"
+        config: Configuration object, for the page order of a dictionary
+        constants: Layout constants, with total_pages set
         output_name: Name for the output file (without extension)
         
     Returns:
         Path to the generated PDF file
+        
+    Raises:
+        TypeError: If a page is not a RenderedPage, such as the one-page PDF
+            buffers render_all_pages used to return
     """
-    merger = PdfMerger()
-    output_path = f"output/{output_name}.pdf"
-    
-    logging.info(f"Merging {len(pages)} page images into {output_name} PDF...")
+    warnings.warn(
+        "merge_pages is deprecated, use write_pages(render_all_pages(...), output_name)",
+        DeprecationWarning,
+        stacklevel=2
+    )
+    if isinstance(pages, Mapping):
+        order = (f"{page_index},{side}" for page_index, side in page_order(config, constants.total_pages))
+        pages = [pages[key] for key in order if key in pages]
+    pages = list(pages)
+    for page in pages:
+        if not isinstance(page, RenderedPage):
+            raise TypeError(f"merge_pages takes RenderedPage objects from render_all_pages, not {type(page).__name__}")
+    return write_pages(pages, output_name)
+
+
+def write_card_pdf(
+    decklist: list[dict],
+    image_cache: ImageCache,
+    constants: LayoutConstants,
+    config: Config,
+    output_name: str,
+    cache_ready: Optional[Future] = None
+) -> str:
+    """
+    Write a PDF that embeds each unique card image once and places it on its pages.
     
-    # Determine page ordering pattern
-    if config.two_sided and config.stagger:
-        pattern = PAGE_PATTERNS['two_sided_stagger']
-    elif config.two_sided:
-        pattern = PAGE_PATTERNS['two_sided_normal']
-    else:
-        pattern = PAGE_PATTERNS['one_sided']
+    Instead of rasterizing whole pages, every card image becomes one image
+    XObject, drawn at its card position by the content stream of each page
+    it is on. The background box and reference markers are vector
+    rectangles. JPEG cache files are copied into the PDF without decoding;
+    other formats are decoded and compressed as pdf_compression sets, on
+    worker_threads. Time, memory and file size grow with the unique cards
+    of the deck, not its length. Each image is embedded as soon as it is
+    in the cache, and each page is written once its images are.
     
-    # Add pages in correct order
-    page_index = 0
-    while page_index < constants.total_pages:
-        for offset in pattern:
-            page_num = page_index + offset[0]
-            side = offset[1]
-            
-            # Skip if page doesn't exist
-            if page_num >= constants.total_pages:
-                continue
-            
-            key = f"{page_num},{side}"
-            if key in pages:
-                merger.append(pages[key])
+    Args:
+        decklist: List of decklist entries
+        image_cache: Card images; each is dropped from memory once embedded
+        constants: Layout constants, with deck_size and total_pages set
+        config: Configuration object
+        output_name: Name for the output file (without extension)
+        cache_ready: create_cache running in the background, None if the
+            cache is complete
         
-        page_index += 2
+    Returns:
+        Path to the generated PDF file
+        
+    Raises:
+        KeyError: If a card has no image in the cache
+    """
+    output_path = f"output/{output_name}.pdf"
+    order = page_order(config, constants.total_pages)
+    
+    # Image names in order of first use, so pages are written as their images arrive
+    names: dict[str, str] = {}
+    for page_index, side in order:
+        for key, _, _ in card_placements(page_index, side, decklist, constants):
+            if cache_ready is None and key not in image_cache:
+                logging.error(f"Image not found in cache for key: {key}")
+                raise image_cache.missing(key)
+            names.setdefault(key, f"C{len(names)}")
     
-    # Write output file
+    logging.info(f"Writing {len(order)} pages with {len(names)} unique card images into {output_name} PDF...")
+    start = perf_counter()
     try:
-        with open(output_path, "wb") as f:
-            merger.write(f)
-        logging.info(f"PDF created successfully at {output_path}")
+        with open(output_path, 'wb') as f, ThreadPoolExecutor(max_workers=config.worker_threads) as executor:
+            writer = PdfWriter(f, PAGE_SIZE_PT)
+            pages = deque(_card_page(page_index, side, decklist, constants, config, names) for page_index, side in order)
+            tasks = [([key], partial(_card_image, key, image_cache, config)) for key in names]
+            window = PAGES_AHEAD_PER_WORKER * config.worker_threads
+            numbers = {}
+            for key, image in zip(names, run_when_ready(tasks, executor, window, image_cache, cache_ready)):
+                numbers[names[key]] = writer.add_image(image)
+                # Pages whose images are all embedded
+                while pages and all(name in numbers for name in pages[0][1]):
+                    content, used = pages.popleft()
+                    writer.add_page(content, {name: numbers[name] for name in used})
+            
+            for content, used in pages:
+                writer.add_page(content, {name: numbers[name] for name in used})
+            writer.close()
+        logging.info(f"PDF created successfully at {output_path} in {(perf_counter() - start) * 1000:.0f}ms")
         return output_path
         
     except Exception as e:
-        logging.error(f"Error merging pages: {e}")
+        logging.error(f"Error writing PDF: {e}")
         raise
+
+
+def _card_image(key: str, image_cache: ImageCache, config: Config) -> PdfImage:
+    """Encode the processed image of a card for the PDF, copying JPEG files as they are."""
+    try:
+        path = image_cache.paths.get(key)
+        if path is None:
+            raise image_cache.missing(key)
+        if path.endswith(CACHE_EXTENSIONS['jpg']):
+            with image_cache.store.open(path) as f:
+                image = jpeg_image(f.read())
+            if image is not None:
+                return image
+        return encode_image(image_cache[key], config)
     finally:
-        merger.close()
+        image_cache.release(key)
+
+
+def _card_page(
+    page_index: int,
+    side: int,
+    decklist: list[dict],
+    constants: LayoutConstants,
+    config: Config,
+    names: dict[str, str]
+) -> tuple[bytes, list[str]]:
+    """
+    Build the content stream of one page, placing cards as render_page does.
+    
+    Returns:
+        Content stream and the image names it draws
+    """
+    content = [background_content(constants) if config.background_box else b'']
+    used = []
+    for key, x, y in card_placements(page_index, side, decklist, constants):
+        box = pdf_box(constants, x, y, x + constants.card_width_px, y + constants.card_height_px)
+        content.append(place_image(names[key], *box))
+        used.append(names[key])
+    
+    if config.reference_points:
+        content.append(reference_points_content(constants))
+    return b''.join(content), used
@@ -0,0 +1,269 @@
+"""
+Decklist to PDF - PDF Writer
+
+Writes a PDF file object by object straight to its output file. Images
+are added once as image XObjects and drawn by the content streams of any
+number of pages, so a card printed on several pages is stored once. JPEG
+files are embedded as they are, without decoding them.
+"""
+import io
+import struct
+import zlib
+from concurrent.futures import Executor
+from typing import BinaryIO, Optional
+
+from PIL import Image, ImageChops
+
+from .models import PdfImage
+
+
+# PDF colour space per Pillow mode; other modes are converted to RGB
+_COLOR_SPACES = {
+    'L': 'DeviceGray',
+    'RGB': 'DeviceRGB',
+}
+
+# Bytes of pixel rows deflated per task when compressing in parallel
+DEFLATE_BAND_BYTES = 1 << 21
+
+# Deflate window; each band is primed with this much of the data before it
+_DEFLATE_WINDOW = 32768
+_ADLER_BASE = 65521
+
+
+class PdfWriter:
+    """A PDF written in one pass: images and pages as they come, the page tree and cross-reference table on close."""
+    
+    def __init__(self, file: BinaryIO, page_size: tuple[float, float]):
+        """
+        Args:
+            file: Binary file to write to, at its start
+            page_size: Width and height of every page in points
+        """
+        self._file = file
+        self._page_size = page_size
+        self._position = 0
+        # Byte offset of each object, by object number - 1
+        self._offsets: list[Optional[int]] = []
+        self._pages: list[int] = []
+        # Pages refer to the page tree, which is only written on close
+        self._page_tree = self._reserve()
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    
+    @property
+    def page_count(self) -> int:
+        """Pages added so far."""
+        return len(self._pages)
+    
+    def add_image(self, image: PdfImage) -> int:
+        """
+        Write an image XObject.
+        
+        Args:
+            image: Encoded image, from jpeg_image or flate_image
+        
+        Returns:
+            Object number to pass to add_page
+        """
+        entries = (
+            f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+            f"/ColorSpace /{image.color_space} /BitsPerComponent 8 /Filter /{image.filter}"
+        )
+        if image.decode_parms:
+            entries += f" /DecodeParms << {image.decode_parms} >>"
+        if image.mask:
+            mask_number = self._add_stream(
+                f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                f"/ImageMask true /BitsPerComponent 1 /Filter /FlateDecode",
+                image.mask
+            )
+            entries += f" /Mask {mask_number} 0 R"
+        return self._add_stream(entries, image.data)
+    
+    def add_page(self, content: bytes, images: dict[str, int]) -> int:
+        """
+        Write a page after the pages already added.
+        
+        Args:
+            content: Page content stream, e.g. from fill_rectangles and place_image
+            images: Object numbers of the images the content draws, by the name it uses
+        
+        Returns:
+            Object number of the page
+        """
+        content_number = self._add_stream('', content)
+        resources = ' '.join(f"/{name} {number} 0 R" for name, number in images.items())
+        width, height = self._page_size
+        number = self._add_object(
+            f"<< /Type /Page /Parent {self._page_tree} 0 R /MediaBox [0 0 {_number(width)} {_number(height)}] "
+            f"/Resources << /XObject << {resources} >> >> /Contents {content_number} 0 R >>".encode('ascii')
+        )
+        self._pages.append(number)
+        return number
+    
+    def close(self) -> None:
+        """Write the page tree, catalog and cross-reference table; the file itself is left open."""
+        kids = ' '.join(f"{number} 0 R" for number in self._pages)
+        self._add_object(
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode('ascii'),
+            self._page_tree
+        )
+        catalog = self._add_object(f"<< /Type /Catalog /Pages {self._page_tree} 0 R >>".encode('ascii'))
+        
+        xref_position = self._position
+        entries = [b'0000000000 65535 f \n']
+        entries.extend(f"{offset:010d} 00000 n \n".encode('ascii') for offset in self._offsets)
+        self._write(f"xref\n0 {len(entries)}\n".encode('ascii') + b''.join(entries))
+        self._write(
+            f"trailer\n<< /Size {len(entries)} /Root {catalog} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n".encode('ascii')
+        )
+    
+    def _reserve(self) -> int:
+        """Allocate an object number to write later."""
+        self._offsets.append(None)
+        return len(self._offsets)
+    
+    def _add_object(self, body: bytes, number: Optional[int] = None) -> int:
+        if number is None:
+            number = self._reserve()
+        self._offsets[number - 1] = self._position
+        self._write(f"{number} 0 obj\n".encode('ascii') + body + b'\nendobj\n')
+        return number
+    
+    def _add_stream(self, entries: str, data: bytes) -> int:
+        number = self._reserve()
+        self._offsets[number - 1] = self._position
+        self._write(f"{number} 0 obj\n<< {entries} /Length {len(data)} >>\nstream\n".encode('ascii'))
+        self._write(data)
+        self._write(b'\nendstream\nendobj\n')
+        return number
+    
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._position += len(data)
+
+
+def jpeg_image(data: bytes) -> Optional[PdfImage]:
+    """
+    Wrap a JPEG file as an image XObject without decoding it.
+    
+    Returns:
+        The image, or None if data is not a greyscale or RGB JPEG
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        if img.format != 'JPEG' or img.mode not in _COLOR_SPACES:
+            return None
+        return PdfImage(img.width, img.height, _COLOR_SPACES[img.mode], 'DCTDecode', data)
+
+
+def flate_image(img: Image.Image, level: int = 6, executor: Optional[Executor] = None) -> PdfImage:
+    """
+    Deflate the pixels of a decoded image into an image XObject.
+    
+    Each row is stored as its difference to the row above (the PNG Up
+    predictor), which compresses scans and flat borders better than the
+    pixels themselves. The image is split into bands of rows that are
+    deflated separately and joined into one zlib stream, each primed with
+    the end of the band before it, as pigz does. With an executor the bands
+    are deflated in parallel; the stream is the same either way.
+    
+    Args:
+        img: Image in any mode; other than greyscale is stored as RGB
+        level: zlib compression level, 0 (fastest) to 9
+        executor: Pool to deflate bands on, None to deflate them in this thread
+    """
+    if img.mode not in _COLOR_SPACES:
+        img = img.convert('RGB')
+    colors = len(img.getbands())
+    rows_per_band = max(1, DEFLATE_BAND_BYTES // (img.width * colors))
+    bands = [(top, min(top + rows_per_band, img.height)) for top in range(0, img.height, rows_per_band)]
+    
+    def deflate(band: tuple[int, int]) -> tuple[bytes, int, int]:
+        return _deflate_band(img, band[0], band[1], level, band[1] == img.height)
+    
+    if executor is None or len(bands) == 1:
+        segments = [deflate(band) for band in bands]
+    else:
+        segments = list(executor.map(deflate, bands))
+    
+    checksum = 1
+    for _, band_checksum, length in segments:
+        checksum = _adler32_combine(checksum, band_checksum, length)
+    data = b''.join([b'\x78\x9c', *(segment for segment, _, _ in segments), struct.pack('>I', checksum)])
+    return PdfImage(
+        img.width, img.height, _COLOR_SPACES[img.mode], 'FlateDecode', data,
+        f"/Predictor 15 /Colors {colors} /BitsPerComponent 8 /Columns {img.width}"
+    )
+
+
+def _deflate_band(img: Image.Image, top: int, bottom: int, level: int, final: bool) -> tuple[bytes, int, int]:
+    """
+    Filter and deflate rows top to bottom of an image.
+    
+    Returns:
+        Raw deflate data ending on a byte boundary, the Adler-32 checksum
+        of the filtered rows and their length
+    """
+    rows = _up_filtered(img, top, bottom)
+    options = {}
+    if top > 0:
+        # The rows just above, filtered the same way, as the preset dictionary
+        window_rows = -(-_DEFLATE_WINDOW // (len(rows) // (bottom - top)))
+        options['zdict'] = _up_filtered(img, max(0, top - window_rows), top)[-_DEFLATE_WINDOW:]
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, **options)
+    segment = compressor.compress(rows) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+    return segment, zlib.adler32(rows), len(rows)
+
+
+def _up_filtered(img: Image.Image, top: int, bottom: int) -> bytes:
+    """Rows top to bottom in PNG Up filtered form: a filter type byte, then each byte minus the one above."""
+    band = img.crop((0, top, img.width, bottom))
+    above = Image.new(img.mode, band.size)
+    # Above the first row of the image there are zeros
+    if bottom - 1 > max(0, top - 1):
+        above.paste(img.crop((0, max(0, top - 1), img.width, bottom - 1)), (0, 1 if top == 0 else 0))
+    difference = ImageChops.subtract_modulo(band, above).tobytes()
+    stride = len(difference) // (bottom - top)
+    return b''.join(b'\x02' + difference[start:start + stride] for start in range(0, len(difference), stride))
+
+
+def _adler32_combine(first: int, second: int, second_length: int) -> int:
+    """Adler-32 checksum of two pieces of data from the checksums of each, as zlib's adler32_combine."""
+    remainder = second_length % _ADLER_BASE
+    sum1 = first & 0xffff
+    sum2 = remainder * sum1 % _ADLER_BASE
+    sum1 += (second & 0xffff) + _ADLER_BASE - 1
+    sum2 += (first >> 16) + (second >> 16) + _ADLER_BASE - remainder
+    sum1 %= _ADLER_BASE
+    sum2 %= _ADLER_BASE
+    return sum1 | sum2 << 16
+
+
+def stencil_mask(mask: Image.Image) -> bytes:
+    """
+    Deflate the mask of an image XObject, for PdfImage.mask.
+    
+    Args:
+        mask: Image the size of the masked one; black pixels are painted,
+            the others are left out and show what is drawn under them
+    """
+    return zlib.compress(mask.convert('1').tobytes())
+
+
+def fill_rectangles(rects: list[tuple[float, float, float, float]]) -> bytes:
+    """Content stream operators filling rectangles, given as (x, y, width, height) in points, in black."""
+    if not rects:
+        return b''
+    paths = ''.join(f"{_number(x)} {_number(y)} {_number(w)} {_number(h)} re\n" for x, y, w, h in rects)
+    return f"0 g\n{paths}f\n".encode('ascii')
+
+
+def place_image(name: str, x: float, y: float, width: float, height: float) -> bytes:
+    """Content stream operators drawing an image over the box with lower left corner (x, y), in points."""
+    return f"q {_number(width)} 0 0 {_number(height)} {_number(x)} {_number(y)} cm /{name} Do Q\n".encode('ascii')
+
+
+def _number(value: float) -> str:
+    """Format a coordinate compactly, as PDF has no exponent notation."""
+    text = f"{value:.4f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
@@ -3,16 +3,41 @@
 Decklist to PDF - Main Entry Point
 
 Converts Magic: The Gathering decklists into printable PDF files.
+
+Usage:
+    python main.py                          interactive, one decklist
+    python main.py --batch "input/*.txt"    every matching decklist, no prompts
+    python main.py --migrate-cache pack     move the image cache to pack files
+    python main.py --compact-cache          reclaim dead space in pack files
+    python main.py --warm-sets mh3 blb      download and process whole sets ahead of printing
 """
+import argparse
+import glob
 import logging
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
 from time import perf_counter
+from typing import TYPE_CHECKING, Optional
 
 from decklist_to_pdf.config import load_config, write_config
-from decklist_to_pdf.card_data import fetch_bulk_json, load_card_dictionary, read_decklist
-from decklist_to_pdf.image_processor import ImageProcessor
-from decklist_to_pdf.page_renderer import generate_layout_constants, render_all_pages
-from decklist_to_pdf.pdf_generator import merge_pages
+from decklist_to_pdf.card_data import (
+    fetch_bulk_json,
+    prepare_card_data,
+    collect_decklist_keys,
+    load_card_records,
+    check_card_records,
+    read_decklist,
+    decklist_from_keys,
+    load_set_keys,
+)
+from decklist_to_pdf.models import Config, LayoutConstants
+
+# The imaging and PDF modules (PIL, img2pdf, requests) are imported
+# inside the functions that use them, so --help and argument errors return
+# without loading them.
+if TYPE_CHECKING:
+    from decklist_to_pdf.image_cache import ImageCache
 
 
 # Sample decklist for first-time setup
@@ -57,6 +82,9 @@ def setup_directories() -> None:
 
 def main():
     """Main entry point for the decklist to PDF converter."""
+    from decklist_to_pdf.image_processor import ImageProcessor
+    from decklist_to_pdf.page_renderer import generate_layout_constants, print_order_decklist
+    
     # Set up logging
     logging.basicConfig(level=logging.INFO)
     
@@ -69,17 +97,19 @@ def main():
     # Load configuration
     config = load_config()
     
-    # Fetch bulk JSON (prompts user)
+    # Fetch bulk JSON, then prepare the card index in the background while
+    # the prompts are open. One worker, so a second bulk file is indexed
+    # after (and incrementally from) the first.
     config.bulk_json_path = fetch_bulk_json(config, ask=False)
     write_config(config, ['bulk_json_path'])
+    index_loader = ThreadPoolExecutor(1, thread_name_prefix='card-index')
+    index_ready = index_loader.submit(prepare_card_data, replace(config))
+    
+    bulk_json_path = config.bulk_json_path
     config.bulk_json_path = fetch_bulk_json(config, ask=True)
     write_config(config, ['bulk_json_path'])
-    
-    # Load Scryfall card data
-    load_start = perf_counter()
-    logging.info(f"Loading Scryfall bulk json from {config.bulk_json_path}")
-    card_data = load_card_dictionary(config)
-    logging.info(f"Loaded in {perf_counter() - load_start:.2f} seconds")
+    if config.bulk_json_path != bulk_json_path:
+        index_ready = index_loader.submit(prepare_card_data, replace(config))
     
     # Generate layout constants
     constants = generate_layout_constants(config)
@@ -94,15 +124,28 @@ def main():
         # Extract name from default path
         decklist_name = config.decklist_path.split('/')[-1].split('.')[0]
     
+    # Load only the Scryfall card data the decklist needs
+    load_start = perf_counter()
+    logging.info(f"Scanning decklist {config.decklist_path} for cards")
+    card_keys = collect_decklist_keys(config.decklist_path)
+    if not index_ready.done():
+        logging.info("Waiting for the card index")
+    try:
+        index_ready.result()
+    except OSError as e:
+        # load_card_records falls back to scanning the bulk JSON
+        logging.warning(f"Could not prepare card index: {e}")
+    index_loader.shutdown()
+    logging.info(f"Loading {len(card_keys)} cards from {config.bulk_json_path}")
+    card_data = load_card_records(config, card_keys)
+    check_card_records(card_keys, card_data, config.decklist_path)
+    logging.info(f"Card data ready {perf_counter() - load_start:.2f} seconds after the decklist prompt")
+    
     # Read decklist
     logging.info(f"Reading decklist from {config.decklist_path}")
     decklist = read_decklist(config.decklist_path, card_data, config)
     logging.info(f"Found {len(decklist)} cards to print")
     
-    # Update constants with deck info
-    constants.deck_size = len(decklist)
-    constants.total_pages = (len(decklist) + 8) // 9  # Ceiling division by 9
-    
     # Ensure output directory exists
     os.makedirs("output", exist_ok=True)
     
@@ -118,16 +161,17 @@ def main():
         constants.card_height_px,
         constants.image_format
     )
-    image_cache = processor.create_cache(decklist)
-    
-    # Render all pages
-    pages = render_all_pages(decklist, image_cache, constants, config)
-    
-    # Merge pages into final PDF
-    merge_start = perf_counter()
-    logging.info("Merging pages into PDF")
-    output_path = merge_pages(pages, config, constants, decklist_name)
-    logging.info(f"PDF merged in {(perf_counter() - merge_start) * 1000:.0f} milliseconds")
+    # Images are fetched in print order, and each page renders as soon as
+    # its cards are cached while later images still download. Fetching
+    # only starts once the whole decklist is read: its entries resolve
+    # from the card records, which are all loaded before the first one,
+    # and reading the decklist from them takes milliseconds, so starting
+    # on the first entries would gain nothing; print order also needs the
+    # page count for two-sided decks
+    with processor, ThreadPoolExecutor(1, thread_name_prefix='image-cache') as image_loader:
+        cache_ready = image_loader.submit(processor.create_cache, print_order_decklist(decklist, config))
+        output_path = render_decklist(decklist, decklist_name, processor.image_cache, constants, config, cache_ready)
+        cache_ready.result()
     
     # Summary
     pdf_end = perf_counter()
@@ -136,5 +180,315 @@ def main():
     logging.info(f"Output: {output_path}")
 
 
+def render_decklist(
+    decklist: list[dict],
+    decklist_name: str,
+    image_cache: 'ImageCache',
+    constants: LayoutConstants,
+    config: Config,
+    cache_ready: Optional[Future] = None
+) -> str:
+    """
+    Render one decklist from cached images and write its PDF.
+    
+    Args:
+        decklist: Decklist entries from read_decklist
+        decklist_name: Output file name without extension
+        image_cache: Images for every key in the decklist, decoded on demand
+        constants: Layout constants, deck info is filled in per decklist
+        config: Configuration object
+        cache_ready: create_cache still filling image_cache in the
+            background; pages wait only for their own images
+        
+    Returns:
+        Path to the generated PDF file
+    """
+    from decklist_to_pdf.page_renderer import PDF_COMPRESSIONS, render_all_pages
+    from decklist_to_pdf.pdf_generator import PDF_COMPOSITIONS, write_card_pdf, write_pages
+    
+    if config.pdf_composition not in PDF_COMPOSITIONS:
+        raise ValueError(f"Unknown pdf_composition '{config.pdf_composition}', expected {' or '.join(PDF_COMPOSITIONS)}")
+    if config.pdf_compression not in PDF_COMPRESSIONS:
+        raise ValueError(f"Unknown pdf_compression '{config.pdf_compression}', expected {' or '.join(PDF_COMPRESSIONS)}")
+    
+    # Update constants with deck info
+    constants = replace(
+        constants,
+        deck_size=len(decklist),
+        total_pages=(len(decklist) + 8) // 9  # Ceiling division by 9
+    )
+    
+    # Place card images on pages without rasterizing them
+    if config.pdf_composition == 'card':
+        return write_card_pdf(decklist, image_cache, constants, config, decklist_name, cache_ready)
+    
+    # Render pages and write each to the PDF as soon as its turn comes
+    write_start = perf_counter()
+    pages = render_all_pages(decklist, image_cache, constants, config, cache_ready)
+    output_path = write_pages(pages, decklist_name)
+    logging.info(f"Pages rendered and written in {(perf_counter() - write_start) * 1000:.0f} milliseconds")
+    return output_path
+
+
+def run_batch(patterns: list[str]) -> int:
+    """
+    Convert every decklist matching the given globs without prompting.
+    
+    Card data is loaded once for the union of all decklists, and one image
+    processor fetches each image once for the whole batch. Every decklist
+    still gets its own PDF in output/.
+    
+    Args:
+        patterns: Decklist paths or glob patterns, e.g. "input/*.txt"
+        
+    Returns:
+        Number of decklists that failed
+    """
+    from decklist_to_pdf.image_processor import ImageProcessor
+    from decklist_to_pdf.page_renderer import generate_layout_constants, print_order_decklist
+    
+    full_start_time = perf_counter()
+    logging.info("Starting decklist_to_pdf batch")
+    
+    setup_directories()
+    config = load_config()
+    
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    if not paths:
+        logging.error(f"No decklists match {' '.join(patterns)}")
+        return 1
+    logging.info(f"Found {len(paths)} decklists")
+    
+    update_bulk_json(config)
+    constants = generate_layout_constants(config)
+    
+    # Load the card data of every decklist in one pass over the index
+    load_start = perf_counter()
+    deck_keys = {path: collect_decklist_keys(path) for path in paths}
+    all_keys = set().union(*deck_keys.values())
+    logging.info(f"Loading {len(all_keys)} cards from {config.bulk_json_path}")
+    card_data = load_card_records(config, all_keys)
+    logging.info(f"Loaded in {perf_counter() - load_start:.2f} seconds")
+    
+    decklists = {}
+    failed = []
+    for path in paths:
+        try:
+            check_card_records(deck_keys[path], card_data, path)
+            decklists[path] = read_decklist(path, card_data, config)
+        except (KeyError, ValueError) as e:
+            logging.error(f"Skipping {path}: {e}")
+            failed.append(path)
+    
+    # One image processor and worker pool for the whole batch; images shared
+    # between decklists are fetched once
+    os.makedirs("output", exist_ok=True)
+    processor = ImageProcessor(
+        config,
+        constants.card_width_px,
+        constants.card_height_px,
+        constants.image_format
+    )
+    # Images are fetched decklist by decklist in print order, and the
+    # decklists render while later images still download
+    summary = []
+    with processor, ThreadPoolExecutor(1, thread_name_prefix='image-cache') as image_loader:
+        cache_ready = image_loader.submit(
+            processor.create_cache,
+            [entry for decklist in decklists.values() for entry in print_order_decklist(decklist, config)]
+        )
+        for path, decklist in decklists.items():
+            decklist_name = os.path.splitext(os.path.basename(path))[0]
+            deck_start = perf_counter()
+            try:
+                output_path = render_decklist(decklist, decklist_name, processor.image_cache, constants, config, cache_ready)
+            except Exception as e:
+                logging.error(f"Failed to render {path}: {e}")
+                failed.append(path)
+                continue
+            summary.append((decklist_name, len(decklist), perf_counter() - deck_start, output_path))
+        # A failed image only fails the decklists showing it; if the cache
+        # fill as a whole failed, still log the summary below
+        try:
+            cache_ready.result()
+        except Exception as e:
+            logging.error(f"Image caching failed: {e}")
+    
+    logging.info(f"{'decklist':<30} {'cards':>6} {'seconds':>8}  output")
+    for decklist_name, card_count, elapsed, output_path in summary:
+        logging.info(f"{decklist_name:<30} {card_count:>6} {elapsed:>8.2f}  {output_path}")
+    if failed:
+        logging.error(f"{len(failed)} decklists failed: {', '.join(failed)}")
+    logging.info(f"Batch finished in {perf_counter() - full_start_time:.2f} seconds")
+    return len(failed)
+
+
+def update_bulk_json(config: Config) -> None:
+    """
+    Fetch new Scryfall bulk data without prompting.
+    
+    Unattended runs keep going on the bulk file they already have when
+    Scryfall cannot be reached.
+    
+    Args:
+        config: Configuration object, bulk_json_path is updated
+    """
+    import requests
+    
+    try:
+        config.bulk_json_path = fetch_bulk_json(config, ask=False)
+        write_config(config, ['bulk_json_path'])
+    except requests.RequestException as e:
+        if not os.path.exists(config.bulk_json_path):
+            raise
+        logging.warning(f"Could not check for new Scryfall bulk data ({e}), using {config.bulk_json_path}")
+
+
+def run_warm_cache(set_codes: list[str], patterns: list[str], keys: list[str]) -> int:
+    """
+    Download and process card images ahead of printing, without prompting.
+    
+    Cards come from whole sets, decklists and card keys, resolved through
+    the card index, and are prepared for every profile in warm_profiles.
+    The command runs at low CPU priority, and can be interrupted and run
+    again to resume.
+    
+    Args:
+        set_codes: Scryfall set codes
+        patterns: Decklist paths or glob patterns
+        keys: Card keys such as m11-149, or files listing one key per line
+        
+    Returns:
+        Number of sets, decklists and keys that could not be warmed
+    """
+    from decklist_to_pdf.cache_warmer import profile_name, warm_cache, warm_profiles
+    
+    start = perf_counter()
+    logging.info("Starting decklist_to_pdf cache warming")
+    if hasattr(os, 'nice'):
+        # Print runs on the same host come first
+        os.nice(10)
+    
+    setup_directories()
+    config = load_config()
+    try:
+        profiles = warm_profiles(config)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    update_bulk_json(config)
+    
+    failed = []
+    card_keys = []
+    for code, set_keys in load_set_keys(config, set_codes).items():
+        if not set_keys:
+            logging.error(f"No cards found in set {code}")
+            failed.append(code)
+        logging.info(f"Set {code}: {len(set_keys)} cards")
+        card_keys.extend(set_keys)
+    for key in keys:
+        if os.path.isfile(key):
+            with open(key, 'r', encoding='utf-8') as f:
+                card_keys.extend(line.strip().lower() for line in f if line.strip() and not line.startswith('#'))
+        else:
+            card_keys.append(key.lower())
+    
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    if patterns and not paths:
+        logging.error(f"No decklists match {' '.join(patterns)}")
+        failed.extend(patterns)
+    deck_keys = {path: collect_decklist_keys(path) for path in paths}
+    
+    card_data = load_card_records(config, set(card_keys).union(*deck_keys.values()))
+    missing = sorted(set(key for key in card_keys if key not in card_data))
+    if missing:
+        logging.error(f"Cards not found: {', '.join(missing)}")
+        failed.extend(missing)
+    decklist = decklist_from_keys([key for key in card_keys if key in card_data], card_data, config)
+    for path in paths:
+        try:
+            check_card_records(deck_keys[path], card_data, path)
+            decklist.extend(read_decklist(path, card_data, config))
+        except (KeyError, ValueError) as e:
+            logging.error(f"Skipping {path}: {e}")
+            failed.append(path)
+    
+    logging.info(f"Warming the image cache for {', '.join(profile_name(profile) for profile in profiles)}")
+    for profile, stats in zip(profiles, warm_cache(decklist, profiles)):
+        logging.info(
+            f"{profile_name(profile)}: {stats.downloaded} downloaded, {stats.processed} processed, "
+            f"{stats.reused} already cached, {stats.bytes_written / 1e6:.1f} MB written"
+        )
+    if failed:
+        logging.error(f"{len(failed)} could not be warmed: {', '.join(failed)}")
+    logging.info(f"Cache warmed in {perf_counter() - start:.2f} seconds")
+    return len(failed)
+
+
+def manage_cache(storage: Optional[str], compact: bool) -> None:
+    """
+    Move the image cache to another storage, compact its packs, or both.
+    
+    Args:
+        storage: 'directory' or 'pack' to migrate to, None to keep the current one
+        compact: Rewrite the pack files without dead space
+    """
+    from decklist_to_pdf.image_store import PACK_DIRECTORY, PackStore, migrate_cache
+    
+    config = load_config()
+    if storage is not None:
+        start = perf_counter()
+        moved = migrate_cache(storage)
+        config.cache_storage = storage
+        write_config(config, ['cache_storage'])
+        logging.info(f"Moved {moved} images to {storage} storage in {perf_counter() - start:.2f} seconds")
+    
+    if compact:
+        if not os.path.exists(PACK_DIRECTORY):
+            logging.info("No pack files to compact")
+            return
+        store = PackStore()
+        reclaimed = store.compact()
+        store.close()
+        logging.info(f"Reclaimed {reclaimed / 1e6:.1f} MB")
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert Magic: The Gathering decklists into printable PDF files.')
+    parser.add_argument(
+        '--batch', nargs='+', metavar='PATTERN',
+        help='convert every decklist matching the paths or glob patterns without prompting'
+    )
+    parser.add_argument(
+        '--migrate-cache', choices=['directory', 'pack'], metavar='STORAGE',
+        help='move cached images to directory or pack storage and set cache_storage to match'
+    )
+    parser.add_argument(
+        '--compact-cache', action='store_true',
+        help='rewrite the image cache pack files without replaced and removed images'
+    )
+    parser.add_argument(
+        '--warm-sets', nargs='+', default=[], metavar='SET',
+        help='download and process the images of every card in these sets for the warm_profiles settings'
+    )
+    parser.add_argument(
+        '--warm-decklists', nargs='+', default=[], metavar='PATTERN',
+        help='download and process the images of the decklists matching the paths or glob patterns'
+    )
+    parser.add_argument(
+        '--warm-keys', nargs='+', default=[], metavar='KEY',
+        help='download and process the images of card keys such as m11-149, or of files listing one key per line'
+    )
+    args = parser.parse_args()
+    
+    if args.warm_sets or args.warm_decklists or args.warm_keys:
+        logging.basicConfig(level=logging.INFO)
+        raise SystemExit(1 if run_warm_cache(args.warm_sets, args.warm_decklists, args.warm_keys) else 0)
+    if args.migrate_cache or args.compact_cache:
+        logging.basicConfig(level=logging.INFO)
+        manage_cache(args.migrate_cache, args.compact_cache)
+        raise SystemExit(0)
+    if args.batch:
+        logging.basicConfig(level=logging.INFO)
+        raise SystemExit(1 if run_batch(args.batch) else 0)
     main()